@@ -1,319 +1,176 @@
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
 from config import RANK_EXP
 
+# Every achievement track: the stat it follows, its category on the achievements page, and its tiers
+# in increasing target_value order. Tiers of a track are completed strictly in order.
+ACHIEVEMENTS = {
+    'earnings': {
+        'stat': 'total_earnings',
+        'category': 'special',
+        'tiers': [
+            {'id': 'earnings_1', 'title': 'Starting Out', 'description': 'Earn your first $1,000',
+             'target_value': 1000, 'reward': 100, 'exp_reward': 1000, 'icon': '💵'},
+            {'id': 'earnings_2', 'title': 'Making Moves', 'description': 'Earn your first $10,000',
+             'target_value': 10000, 'reward': 1000, 'exp_reward': 5000, 'icon': '💰'},
+            {'id': 'earnings_3', 'title': 'Known Mogul', 'description': 'Earn your first $50,000',
+             'target_value': 50000, 'reward': 5000, 'exp_reward': 10000, 'icon': '🏦'},
+            {'id': 'earnings_4', 'title': 'Expert Trader', 'description': 'Earn your first $100,000',
+             'target_value': 100000, 'reward': 10000, 'exp_reward': 20000, 'icon': '💎'},
+            {'id': 'earnings_5', 'title': 'Millionaire', 'description': 'Earn your first $1,000,000',
+             'target_value': 1000000, 'reward': 100000, 'exp_reward': 50000, 'icon': '🏆'}
+        ]
+    },
+    'cases': {
+        'stat': 'total_cases_opened',
+        'category': 'cases',
+        'tiers': [
+            {'id': 'cases_1', 'title': 'Case Opener', 'description': 'Open 10 cases',
+             'target_value': 10, 'reward': 100, 'exp_reward': 0, 'icon': '📦'},
+            {'id': 'cases_2', 'title': 'Case Enthusiast', 'description': 'Open 100 cases',
+             'target_value': 100, 'reward': 500, 'exp_reward': 0, 'icon': '📦'},
+            {'id': 'cases_3', 'title': 'Case Veteran', 'description': 'Open 1,000 cases',
+             'target_value': 1000, 'reward': 1000, 'exp_reward': 0, 'icon': '📦'},
+            {'id': 'cases_4', 'title': 'Case Master', 'description': 'Open 10,000 cases',
+             'target_value': 10000, 'reward': 2000, 'exp_reward': 0, 'icon': '📦'},
+            {'id': 'cases_5', 'title': 'Case God', 'description': 'Open 100,000 cases',
+             'target_value': 100000, 'reward': 5000, 'exp_reward': 0, 'icon': '📦'}
+        ]
+    },
+    'clicks': {
+        'stat': 'total_clicks',
+        'category': 'clicker',
+        'tiers': [
+            {'id': 'clicks_1', 'title': 'Dedicated Clicker', 'description': 'Click 1,000 times',
+             'target_value': 1000, 'reward': 100, 'exp_reward': 50, 'icon': '🖱️'},
+            {'id': 'clicks_2', 'title': 'Click Enthusiast', 'description': 'Click 5,000 times',
+             'target_value': 5000, 'reward': 200, 'exp_reward': 100, 'icon': '🖱️'},
+            {'id': 'clicks_3', 'title': 'Click Master', 'description': 'Click 10,000 times',
+             'target_value': 10000, 'reward': 400, 'exp_reward': 200, 'icon': '🖱️'},
+            {'id': 'clicks_4', 'title': 'Click Expert', 'description': 'Click 20,000 times',
+             'target_value': 20000, 'reward': 800, 'exp_reward': 400, 'icon': '🖱️'},
+            {'id': 'clicks_5', 'title': 'Click God', 'description': 'Click 50,000 times',
+             'target_value': 50000, 'reward': 2000, 'exp_reward': 1000, 'icon': '🖱️'}
+        ]
+    }
+}
 
-def update_earnings_achievements(user_data: dict, amount_earned):
-    """Update earnings-related achievements when user earns money"""
-    
-    # Initialize achievements if needed
+# Built once from the registry: sorted targets per track, and every tier by id
+THRESHOLDS = {track: [tier['target_value'] for tier in spec['tiers']] for track, spec in ACHIEVEMENTS.items()}
+TIERS_BY_ID = {tier['id']: dict(tier, track=track, category=spec['category'])
+               for track, spec in ACHIEVEMENTS.items() for tier in spec['tiers']}
+TOTAL_TIERS = len(TIERS_BY_ID)
+
+
+def _ensure_achievements(user_data: dict) -> dict:
     if 'achievements' not in user_data:
         user_data['achievements'] = {
             'completed': [],
             'in_progress': {}
         }
-    
-    # Initialize stats if needed
-    if 'stats' not in user_data:
-        user_data['stats'] = {
-            'total_earnings': 0
-        }
-    
-    # Update total earnings
-    user_data['stats']['total_earnings'] += amount_earned
-    total_earnings = user_data['stats']['total_earnings']
-    
-    # Define achievement tiers
-    tiers = [
-        {
-            'id': 'earnings_1',
-            'title': 'Starting Out',
-            'description': 'Earn your first $1,000',
-            'target_value': 1000,
-            'reward': 100,
-            'exp_reward': 1000,
-            'icon': '💵'
-        },
-        {
-            'id': 'earnings_2',
-            'title': 'Making Moves',
-            'description': 'Earn your first $10,000',
-            'target_value': 10000,
-            'reward': 1000,
-            'exp_reward': 5000,  # Add EXP reward
-            'icon': '💰'
-        },
-        {
-            'id': 'earnings_3',
-            'title': 'Known Mogul',
-            'description': 'Earn your first $50,000',
-            'target_value': 50000,
-            'reward': 5000,
-            'exp_reward': 10000,  # Add EXP reward
-            'icon': '🏦'
-        },
-        {
-            'id': 'earnings_4',
-            'title': 'Expert Trader',
-            'description': 'Earn your first $100,000',
-            'target_value': 100000,
-            'reward': 10000,
-            'exp_reward': 20000,  # Add EXP reward
-            'icon': '💎'
-        },
-        {
-            'id': 'earnings_5',
-            'title': 'Millionaire',
-            'description': 'Earn your first $1,000,000',
-            'target_value': 1000000,
-            'reward': 100000,
-            'exp_reward': 50000,  # Add EXP reward
-            'icon': '🏆'
-        }
-    ]
-    
-    # Find current tier
-    current_tier = None
-    for tier in tiers:
-        if tier['id'] not in user_data['achievements']['completed']:
-            current_tier = tier
-            break
-    
-    if current_tier:
-        if current_tier['id'] not in user_data['achievements']['in_progress']:
-            current_tier['current_value'] = total_earnings
-            current_tier['category'] = 'special'
-            current_tier['progress'] = min(100, (total_earnings / current_tier['target_value']) * 100)
-            user_data['achievements']['in_progress'].update({
-                current_tier['id']: current_tier
-            })
-        else:
-            # Update progress
-            if total_earnings >= current_tier['target_value']:
-                # Complete current tier
-                user_data['achievements']['completed'].append(current_tier['id'])
-                user_data['balance'] += current_tier['reward']
-                
-                # Add EXP reward
-                current_exp = float(user_data.get('exp', 0))
-                current_rank = int(user_data.get('rank', 0))
-                new_exp = current_exp + current_tier['exp_reward']
-                
-                # Check for rank up
-                while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
-                    new_exp -= RANK_EXP[current_rank]
-                    current_rank += 1
-                
-                user_data['exp'] = new_exp
-                user_data['rank'] = current_rank
-                
-                # Remove only this achievement from in_progress
-                del user_data['achievements']['in_progress'][current_tier['id']]
-                # Recursively call to set up next tier
-                update_earnings_achievements(user_data, 0)
-            else:
-                # Update progress
-                user_data['achievements']['in_progress'][current_tier['id']]['current_value'] = total_earnings
-                user_data['achievements']['in_progress'][current_tier['id']]['progress'] = \
-                    (total_earnings / current_tier['target_value']) * 100
+    return user_data['achievements']
+
+
+def add_exp(user_data: dict, exp: float):
+    """Add EXP and rank up as many times as it covers"""
+    new_exp = float(user_data.get('exp', 0)) + exp
+    current_rank = int(user_data.get('rank', 0))
+    while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
+        new_exp -= RANK_EXP[current_rank]
+        current_rank += 1
+    user_data['exp'] = new_exp
+    user_data['rank'] = current_rank
+
+
+def achievement_info(achievement_id: str) -> Optional[dict]:
+    """What a completion popup shows for this achievement"""
+    tier = TIERS_BY_ID.get(achievement_id)
+    if tier is None:
+        return None
+    return {key: tier[key] for key in ('id', 'title', 'description', 'icon', 'reward', 'exp_reward')}
+
+
+def update_achievements(user_data: dict, track: str) -> List[dict]:
+    """Complete every tier of the track the stat has reached and pay out its rewards.
+
+    Returns the newly completed achievements (see achievement_info), and keeps the next pending tier
+    in in_progress with its current progress.
+    """
+    spec = ACHIEVEMENTS[track]
+    achievements = _ensure_achievements(user_data)
+    completed = achievements['completed']
+    in_progress = achievements['in_progress']
+    tiers = spec['tiers']
+    value = user_data.get('stats', {}).get(spec['stat'], 0)
+
+    # Tiers complete in order, so the completed ones are always a prefix of the track
+    completed_ids = set(completed)
+    pending = 0
+    while pending < len(tiers) and tiers[pending]['id'] in completed_ids:
+        pending += 1
+    reached = bisect_right(THRESHOLDS[track], value)
+
+    newly_completed = []
+    for tier in tiers[pending:reached]:
+        completed.append(tier['id'])
+        in_progress.pop(tier['id'], None)
+        user_data['balance'] += tier['reward']
+        if tier['exp_reward']:
+            add_exp(user_data, tier['exp_reward'])
+        newly_completed.append(achievement_info(tier['id']))
+
+    next_index = max(pending, reached)
+    if next_index < len(tiers):
+        tier = tiers[next_index]
+        in_progress[tier['id']] = dict(tier, current_value=value, category=spec['category'],
+                                       progress=min(100, (value / tier['target_value']) * 100))
+    return newly_completed
+
+
+def update_all_achievements(user_data: dict) -> List[dict]:
+    """Bring every track up to date, e.g. for new or older save files"""
+    newly_completed = []
+    for track in ACHIEVEMENTS:
+        newly_completed.extend(update_achievements(user_data, track))
+    return newly_completed
+
 
-def update_case_achievements(user_data: dict):
+def update_earnings_achievements(user_data: dict, amount_earned) -> List[dict]:
+    """Update earnings-related achievements when user earns money"""
+    stats = user_data.setdefault('stats', {})
+    stats['total_earnings'] = stats.get('total_earnings', 0) + amount_earned
+    return update_achievements(user_data, 'earnings')
+
+
+def update_case_achievements(user_data: dict) -> List[dict]:
     """Update case opening related achievements"""
-    
-    # Initialize achievements if needed
-    if 'achievements' not in user_data:
-        user_data['achievements'] = {
-            'completed': [],
-            'in_progress': {}
-        }
-    
-    # Get current total cases opened
-    total_cases = user_data['stats']['total_cases_opened']
-    
-    # Define case achievement tiers
-    tiers = [
-        {
-            'id': 'cases_1',
-            'title': 'Case Opener',
-            'description': 'Open 10 cases',
-            'target_value': 10,
-            'reward': 100,
-            'exp_reward': 0,
-            'icon': '📦'
-        },
-        {
-            'id': 'cases_2',
-            'title': 'Case Enthusiast',
-            'description': 'Open 100 cases',
-            'target_value': 100,
-            'reward': 500,
-            'exp_reward': 0,
-            'icon': '📦'
-        },
-        {
-            'id': 'cases_3',
-            'title': 'Case Veteran',
-            'description': 'Open 1,000 cases',
-            'target_value': 1000,
-            'reward': 1000,
-            'exp_reward': 0,
-            'icon': '📦'
-        },
-        {
-            'id': 'cases_4',
-            'title': 'Case Master',
-            'description': 'Open 10,000 cases',
-            'target_value': 10000,
-            'reward': 2000,
-            'exp_reward': 0,
-            'icon': '📦'
-        },
-        {
-            'id': 'cases_5',
-            'title': 'Case God',
-            'description': 'Open 100,000 cases',
-            'target_value': 100000,
-            'reward': 5000,
-            'exp_reward': 0,
-            'icon': '📦'
-        }
-    ]
-    
-    # Find current tier
-    current_tier = None
-    for tier in tiers:
-        if tier['id'] not in user_data['achievements']['completed']:
-            current_tier = tier
-            break
-    
-    if current_tier:
-        # Update or add current tier achievement
-        if current_tier['id'] not in user_data['achievements']['in_progress']:
-            current_tier['current_value'] = total_cases
-            current_tier['category'] = 'cases'
-            current_tier['progress'] = min(100, (total_cases / current_tier['target_value']) * 100)
-            user_data['achievements']['in_progress'].update({
-                current_tier['id']: current_tier
-            })
-        else:
-            # Update progress
-            if total_cases >= current_tier['target_value']:
-                # Complete current tier
-                user_data['achievements']['completed'].append(current_tier['id'])
-                user_data['balance'] += current_tier['reward']
-                
-                # Remove only this achievement from in_progress
-                del user_data['achievements']['in_progress'][current_tier['id']]
-                # Recursively call to set up next tier
-                update_case_achievements(user_data)
-            else:
-                # Update progress
-                user_data['achievements']['in_progress'][current_tier['id']]['current_value'] = total_cases
-                user_data['achievements']['in_progress'][current_tier['id']]['progress'] = \
-                    (total_cases / current_tier['target_value']) * 100
+    return update_achievements(user_data, 'cases')
+
 
-def update_click_achievements(user_data: dict):
+def update_click_achievements(user_data: dict) -> List[dict]:
     """Update click-related achievements"""
-    
-    # Initialize achievements if needed
-    if 'achievements' not in user_data:
-        user_data['achievements'] = {
-            'completed': [],
-            'in_progress': {}
-        }
-    
-    # Get current total clicks
-    total_clicks = user_data['stats']['total_clicks']
-    
-    # Define click achievement tiers
-    tiers = [
-        {
-            'id': 'clicks_1',
-            'title': 'Dedicated Clicker',
-            'description': 'Click 1,000 times',
-            'target_value': 1000,
-            'reward': 100,
-            'exp_reward': 50,
-            'icon': '🖱️'
-        },
-        {
-            'id': 'clicks_2',
-            'title': 'Click Enthusiast',
-            'description': 'Click 5,000 times',
-            'target_value': 5000,
-            'reward': 200,
-            'exp_reward': 100,
-            'icon': '🖱️'
-        },
-        {
-            'id': 'clicks_3',
-            'title': 'Click Master',
-            'description': 'Click 10,000 times',
-            'target_value': 10000,
-            'reward': 400,
-            'exp_reward': 200,
-            'icon': '🖱️'
-        },
-        {
-            'id': 'clicks_4',
-            'title': 'Click Expert',
-            'description': 'Click 20,000 times',
-            'target_value': 20000,
-            'reward': 800,
-            'exp_reward': 400,
-            'icon': '🖱️'
-        },
-        {
-            'id': 'clicks_5',
-            'title': 'Click God',
-            'description': 'Click 50,000 times',
-            'target_value': 50000,
-            'reward': 2000,
-            'exp_reward': 1000,
-            'icon': '🖱️'
-        }
-    ]
-    
-    # Find current tier
-    current_tier = None
-    for tier in tiers:
-        if tier['id'] not in user_data['achievements']['completed']:
-            current_tier = tier
-            break
-    
-    if current_tier:
-        # Update or add current tier achievement
-        if current_tier['id'] not in user_data['achievements']['in_progress']:
-            current_tier['current_value'] = total_clicks
-            current_tier['category'] = 'clicks'
-            current_tier['progress'] = min(100, (total_clicks / current_tier['target_value']) * 100)
-            user_data['achievements']['in_progress'].update({
-                current_tier['id']: current_tier
-            })
-        else:
-            # Update progress
-            if total_clicks >= current_tier['target_value']:
-                # Complete current tier
-                user_data['achievements']['completed'].append(current_tier['id'])
-                user_data['balance'] += current_tier['reward']
-                
-                # Add EXP reward
-                current_exp = float(user_data.get('exp', 0))
-                current_rank = int(user_data.get('rank', 0))
-                new_exp = current_exp + current_tier['exp_reward']
-                
-                # Check for rank up
-                while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
-                    new_exp -= RANK_EXP[current_rank]
-                    current_rank += 1
-                
-                user_data['exp'] = new_exp
-                user_data['rank'] = current_rank
-                
-                # Remove only this achievement from in_progress
-                del user_data['achievements']['in_progress'][current_tier['id']]
-                # Recursively call to set up next tier
-                update_click_achievements(user_data)
-            else:
-                # Update progress
-                user_data['achievements']['in_progress'][current_tier['id']]['current_value'] = total_clicks
-                user_data['achievements']['in_progress'][current_tier['id']]['progress'] = \
-                    (total_clicks / current_tier['target_value']) * 100
\ No newline at end of file
+    return update_achievements(user_data, 'clicks')
+
+
+def achievement_summary(user_data: dict) -> Dict[str, object]:
+    """Completed and in-progress achievements plus totals, as the achievements pages show them"""
+    achievements = _ensure_achievements(user_data)
+    completed = []
+    for achievement_id in achievements['completed']:
+        tier = TIERS_BY_ID.get(achievement_id)
+        if tier is None:
+            continue
+        completed.append(dict(achievement_info(achievement_id), completed=True, progress=100,
+                              current_value=tier['target_value'], target_value=tier['target_value'],
+                              category=tier['category']))
+    in_progress = [dict(achievement, completed=False) for achievement in achievements['in_progress'].values()]
+
+    all_achievements = sorted(completed + in_progress, key=lambda achievement: achievement['id'])
+    return {
+        'achievements': all_achievements,
+        'completed_count': len(completed),
+        'total_count': TOTAL_TIERS,
+        'completion_rate': round(len(completed) / TOTAL_TIERS * 100),
+        'total_rewards': sum(achievement['reward'] for achievement in completed)
+    }
@@ -7,34 +7,50 @@ import traceback
 from dataclasses import asdict
 from datetime import datetime, timedelta
 from functools import wraps
-from threading import Thread, Lock, Timer
 import atexit
+import hashlib
+import hmac
+import socket
 from werkzeug.utils import safe_join
 import uuid
 
 # Third-party imports
 from dotenv import load_dotenv
-from flask import (Flask, jsonify, redirect, render_template, request, send_from_directory,
+from flask import (Flask, Response, jsonify, redirect, render_template, request, send_from_directory,
                   session, url_for)
 
 # Local imports
-from achievements import (update_case_achievements, update_click_achievements,
+from achievements import (achievement_summary, update_all_achievements, update_case_achievements,
                         update_earnings_achievements)
 from bots import generate_bot_players
+from catalog import get_catalog, load_catalog
 
-from casino import find_best_skin_combination, handle_blackjack_end
+from case_ev import get_case_ev_report
+from clicker import get_click_accumulator, rank_info
+from casino import handle_blackjack_end, roulette_payout
 from cases_prices_and_floats import (adjust_price_by_float, generate_float_for_wear,
-                                   get_case_prices, load_case, load_skin_price)
-from config import (BLACK_NUMBERS, CASE_DATA, CASE_FILE_MAPPING,
-                   CASE_TYPES, RANK_EXP, RANKS, RED_NUMBERS, REFRESH_INTERVAL, 
-                   STICKER_CAPSULE_DATA, STICKER_CAPSULE_FILE_MAPPING,
-                   SOUVENIR_CASE_DATA, SOUVENIR_CASE_FILE_MAPPING, SOUVENIR_CASE_TYPES)
+                                   get_case_prices, load_case, load_skin_price, open_many)
+from config import (CASE_DATA, CASE_FILE_MAPPING,
+                   LEADER_LEASE_SECONDS, LOCAL_USER, MINES_MAX_SESSIONS, MINES_SESSION_TTL,
+                   MULTI_USER, RANK_EXP, RANKS, REFRESH_INTERVAL, SECRET_KEY, 
+                   STICKER_CAPSULE_DATA,
+                   SOUVENIR_CASE_DATA, SOUVENIR_CASE_FILE_MAPPING, SOUVENIR_CASE_TYPES,
+                   SOUVENIR_CHANCE, SOUVENIR_PACKAGE_RARITY_WEIGHTS, SOUVENIR_WEAR_THRESHOLDS,
+                   UPGRADE_CHANCES)
 from daily_trades import generate_daily_trades, load_daily_trades, save_daily_trades
-from user_data import create_user_from_dict, load_user_data, save_user_data
+from user_data import (create_user_from_dict, find_inventory_item, get_inventory_index,
+                       get_inventory_summary, get_load_stats, get_user_fields, load_user_data,
+                       match_inventory_item, partition_sellable, save_user_data, set_current_user,
+                       current_user, UserDataConflict)
 from blackjack import BlackjackGame
 from sticker_capsules import load_sticker_capsule, get_sticker_capsule_prices, open_sticker_capsule
-from auction import load_auction_data, save_auction_data, generate_bot_budgets, generate_auction_item
-from mines import MinesGame
+from auction import get_auction_data, save_auction_data, generate_bot_budgets, generate_auction_item
+from auction_events import format_sse, get_auction_events
+from mines import MinesGame, expected_rtp, multiplier_table
+from scheduler import EventScheduler
+from shared_state import get_shared_state
+from storage import get_storage
+from upgrade import get_upgrade_pool
 
 # Load environment variables
 load_dotenv('config.env')
@@ -46,29 +62,35 @@ app = Flask(__name__,
     template_folder='frontend/dist'
 )
 
-app.secret_key = 'your-secret-key-here'
+# The session's player id is a player's whole identity, so with real players the key can't be a known one
+if MULTI_USER and not SECRET_KEY:
+    raise RuntimeError("MULTI_USER=1 needs SECRET_KEY set in the environment")
+app.secret_key = SECRET_KEY or 'your-secret-key-here'
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = timedelta(days=7)
 
-# Auction-related globals
-FEATURED_SKINS = None
-LAST_REFRESH_TIME = None
+# Featured skins, mines games and the auction version live here; in this process's memory, or in
+# a database every worker process shares when SHARED_STATE is on
+shared_state = get_shared_state()
+
+# Auction-related globals, this worker's copy of the stored auction (see sync_auction_state)
 CURRENT_AUCTION = None
 AUCTION_BIDS = []
 AUCTION_END_TIME = None
 AUCTION_BOT_BUDGETS = {}
 LAST_BID_TIME = None
-LAST_BIDDER = None
 MIN_BID_INCREMENT = 10  # Minimum bid increment in dollars
 
-auction_timer = None
-last_auction_check = None
-
 # Add these globals
-auction_lock = Lock()
-auction_thread = None
+auction_lock = shared_state.lock('auction')
+# Bot bids, the auction close and the next auction all run from here, on the worker holding the lease
+auction_scheduler = EventScheduler()
+WORKER_ID = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+is_auction_leader = False
 
-# Store active mines games in memory
-active_mines_games = {}
+# In-flight mines games by player, dropped when abandoned; one reveal or cashout at a time, so a
+# game can't be paid out twice
+mines_sessions = shared_state.sessions('mines_sessions', MINES_SESSION_TTL, MINES_MAX_SESSIONS)
+mines_lock = shared_state.lock('mines')
 
 def login_required(f):
     @wraps(f)
@@ -119,7 +141,7 @@ def open_case(case_type):
     if count > multi_open_level:
         return jsonify({'error': f'You can only open up to {multi_open_level} cases at once. Upgrade Multi Open to open more!'})
     
-    if count not in [1, 2, 3, 4, 5]:
+    if count < 1:
         return jsonify({'error': 'Invalid case count'})
         
     inventory = user_data.get('inventory', [])
@@ -150,75 +172,56 @@ def open_case(case_type):
         return jsonify({'error': 'Invalid case type'})
 
     # Get case price and add exp
+    catalog = get_catalog()
     try:
-        file_name = CASE_FILE_MAPPING.get(case_type)
-        if not file_name:
+        case_data = catalog.get_case(case_type)
+        if not case_data:
             return jsonify({'error': 'Invalid case type'})
             
-        with open(f'cases/{file_name}.json', 'r') as f:
-            case_data = json.load(f)
-            case_price = float(case_data.get('price', 0))
-            
-            # Add exp based on case price (for all cases opened)
-            new_exp = current_exp + (case_price * count)
-            
-            # Check for rank up
-            while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
-                new_exp -= RANK_EXP[current_rank]
-                current_rank += 1
-            
-            # Update user data with new exp and rank
-            user_data['exp'] = new_exp
-            user_data['rank'] = current_rank
+        case_price = case_data['price']
+        
+        # Add exp based on case price (for all cases opened)
+        new_exp = current_exp + (case_price * count)
+        
+        # Check for rank up
+        while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
+            new_exp -= RANK_EXP[current_rank]
+            current_rank += 1
+        
+        # Update user data with new exp and rank
+        user_data['exp'] = new_exp
+        user_data['rank'] = current_rank
             
     except Exception as e:
         print(f"Error getting case price: {e}")
         new_exp = current_exp
         current_rank = user_data.get('rank', 0)
     
-    # Open cases and get items
+    # Open all cases in one batch
+    opened = open_many(case_type, count)
+    if opened is None:
+        return jsonify({'error': 'Failed to open case'})
+    
     items = []
-    for _ in range(count):
-        skin = case.open()
-        if not skin:
-            return jsonify({'error': 'Failed to open case'})
-        
-        # Get the price from case data
-        try:
-            # Find the item's price in the case data
-            price = 0
-            image = None
-            for grade, skins in case_data['skins'].items():
-                for case_skin in skins:
-                    if case_skin['weapon'] == skin.weapon and case_skin['name'] == skin.name:
-                        prices = case_skin['prices']
-                        wear_key = 'NO' if 'NO' in prices else skin.wear.name
-                        price = prices[f"ST_{wear_key}"] if skin.stattrak else prices[wear_key]
-                        image = case_skin['image']
-                        break
-                if price > 0:
-                    break
-        except Exception as e:
-            print(f"Error getting price: {e}")
-            price = 0
-            image = None
-        
-        # Generate float value for the new skin
-        float_value = generate_float_for_wear(skin.wear.name)
-        adjusted_price = adjust_price_by_float(float(price), skin.wear.name, float_value)
+    timestamp = time.time()
+    for weapon, name, rarity, wear, stattrak, float_value, price in zip(
+            opened['weapon'].tolist(), opened['name'].tolist(), opened['rarity'].tolist(),
+            opened['wear'].tolist(), opened['stattrak'].tolist(),
+            opened['float_value'].tolist(), opened['price'].tolist()):
+        case_skin = catalog.get_skin(case_type, weapon, name)
         
         skin_dict = {
-            'weapon': skin.weapon,
-            'name': skin.name,
-            'rarity': skin.rarity.name,
-            'wear': skin.wear.name,
-            'stattrak': skin.stattrak,
-            'price': adjusted_price,
-            'timestamp': time.time(),
+            'weapon': weapon,
+            'name': name,
+            'rarity': rarity,
+            'wear': wear,
+            'stattrak': stattrak,
+            'price': price,
+            'timestamp': timestamp,
             'case_type': case_type,
             'float_value': float_value,  # Add float_value here
             'is_case': False,
-            'image': image  # Add image field
+            'image': case_skin['image'] if case_skin else None  # Add image field
         }
         items.append(skin_dict)
         
@@ -229,40 +232,12 @@ def open_case(case_type):
     user_data['inventory'] = inventory
     save_user_data(user_data)
     
-    # Store initial achievements state
-    initial_achievements = set(user_data['achievements']['completed'])
-    
     # Update total cases opened stat
     user_data['stats']['total_cases_opened'] += count
     
-    # Update case achievements
-    update_case_achievements(user_data)
-    
-    # Check if any new achievements were completed
-    new_achievements = set(user_data['achievements']['completed']) - initial_achievements
-    completed_achievement = None
-    if new_achievements:
-        achievement_id = list(new_achievements)[0]  # Get the first new achievement
-        level = int(achievement_id.split('_')[1])
-        completed_achievement = {
-            'title': {
-                1: 'Case Opener',
-                2: 'Case Enthusiast',
-                3: 'Case Veteran',
-                4: 'Case Master',
-                5: 'Case God'
-            }[level],
-            'icon': '📦',
-            'reward': {
-                1: 100,
-                2: 500,
-                3: 1000,
-                4: 2000,
-                5: 5000
-            }[level],
-            'exp_reward': 0,
-            'description': f'Open {"{:,.0f}".format({1: 10, 2: 100, 3: 1000, 4: 10000, 5: 100000}[level])} cases'
-        }
+    # Update case achievements and show the first one completed
+    new_achievements = update_case_achievements(user_data)
+    completed_achievement = new_achievements[0] if new_achievements else None
     
     # Save updated user data
     save_user_data(user_data)
@@ -313,9 +288,7 @@ def reset_session():
     }
     
     # Initialize all achievement types
-    update_earnings_achievements(user_data, 0)
-    update_case_achievements(user_data)
-    update_click_achievements(user_data)  # Add this line
+    update_all_achievements(user_data)
     
     save_user_data(user_data)
     return redirect(url_for('shop'))
@@ -329,6 +302,13 @@ def sell_item(item_index=None):
         user_data = load_user_data()
         inventory = user_data['inventory']
         
+        # Clients that know the item id skip the visual index mapping below
+        if data.get('id'):
+            actual_index = find_inventory_item(inventory, data['id'])
+            if actual_index is None:
+                return jsonify({'error': 'Item not found'})
+            return _sell_inventory_item(user_data, actual_index, quantity)
+        
         # Get only visible non-case items in display order
         visible_items = []
         visible_indices = []
@@ -379,89 +359,57 @@ def sell_item(item_index=None):
         
         # Get the actual inventory index using our mapping
         actual_index = visible_indices[item_index]
-        item_to_sell = inventory[actual_index]
-        
         print(f"Selling item at visual index {item_index}, actual index {actual_index}")
-        print(f"Item details: {item_to_sell}")
-        
-        if quantity > item_to_sell.get('count', 1):
-            return jsonify({'error': 'Invalid quantity'})
-        
-        # Calculate sale value
-        sale_price = float(item_to_sell.get('price', 0)) * quantity
-        
-        # Store initial rank for level up check
-        initial_rank = user_data.get('rank', 0)
-        
-        # Remove the item from the actual inventory
-        inventory.pop(actual_index)
-        
-        # Update user's balance
-        user_data['balance'] = float(user_data['balance']) + sale_price
-        
-        # Store initial achievements state
-        initial_achievements = set(user_data['achievements']['completed'])
-        
-        # Update achievements with the earned amount
-        update_earnings_achievements(user_data, sale_price)
-        
-        # Save updated user data
-        save_user_data(user_data)
-        
-        # Check if any new achievements were completed
-        new_achievements = set(user_data['achievements']['completed']) - initial_achievements
-        completed_achievement = None
-        if new_achievements:
-            achievement_id = list(new_achievements)[0]
-            level = int(achievement_id.split('_')[1])
-            completed_achievement = {
-                'title': {
-                    1: 'Starting Out',
-                    2: 'Making Moves',
-                    3: 'Known Mogul',
-                    4: 'Expert Trader',
-                    5: 'Millionaire'
-                }[level],
-                'icon': {
-                    1: '💵',
-                    2: '💰',
-                    3: '🏦',
-                    4: '💎',
-                    5: '🏆'
-                }[level],
-                'reward': {
-                    1: 100,
-                    2: 1000,
-                    3: 5000,
-                    4: 10000,
-                    5: 100000
-                }[level],
-                'exp_reward': {
-                    1: 1000,
-                    2: 5000,
-                    3: 10000,
-                    4: 20000,
-                    5: 50000
-                }[level]
-            }
-        
-        return jsonify({
-            'success': True,
-            'balance': user_data['balance'],
-            'exp': user_data['exp'],
-            'rank': user_data['rank'],
-            'rankName': RANKS[user_data['rank']],
-            'nextRankExp': RANK_EXP[user_data['rank']] if user_data['rank'] < len(RANK_EXP) else None,
-            'levelUp': user_data['rank'] > initial_rank,
-            'sold_price': sale_price,
-            'achievement': completed_achievement
-        })
+        return _sell_inventory_item(user_data, actual_index, quantity)
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in sell_item: {e}")
         traceback.print_exc()
         return jsonify({'error': 'Failed to sell item'})
 
+def _sell_inventory_item(user_data, actual_index, quantity):
+    """Sell the item at actual_index in user_data['inventory'] and build the /sell response"""
+    inventory = user_data['inventory']
+    item_to_sell = inventory[actual_index]
+    print(f"Item details: {item_to_sell}")
+    
+    if quantity > item_to_sell.get('count', 1):
+        return jsonify({'error': 'Invalid quantity'})
+    
+    # Calculate sale value
+    sale_price = float(item_to_sell.get('price', 0)) * quantity
+    
+    # Store initial rank for level up check
+    initial_rank = user_data.get('rank', 0)
+    
+    # Remove the item from the actual inventory
+    inventory.pop(actual_index)
+    
+    # Update user's balance
+    user_data['balance'] = float(user_data['balance']) + sale_price
+    
+    # Update achievements with the earned amount
+    new_achievements = update_earnings_achievements(user_data, sale_price)
+    completed_achievement = new_achievements[0] if new_achievements else None
+    
+    # Save updated user data
+    save_user_data(user_data)
+    
+    return jsonify({
+        'success': True,
+        'balance': user_data['balance'],
+        'exp': user_data['exp'],
+        'rank': user_data['rank'],
+        'rankName': RANKS[user_data['rank']],
+        'nextRankExp': RANK_EXP[user_data['rank']] if user_data['rank'] < len(RANK_EXP) else None,
+        'levelUp': user_data['rank'] > initial_rank,
+        'sold_price': sale_price,
+        'achievement': completed_achievement
+    })
+    
+
 @app.route('/sell/last', methods=['POST'])
 def sell_last_item():
     user_data = load_user_data()
@@ -525,6 +473,8 @@ def sell_last_item():
             'sold_price': total_price
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in sell_last_item: {e}")
         return jsonify({
@@ -537,80 +487,49 @@ def sell_last_item():
 def click():
     try:
         data = request.get_json()
-        current_multiplier = data.get('multiplier', 1)
         is_crit = data.get('is_crit', False)
         
-        user_data = load_user_data()
-        
-        # Store initial achievements state
-        initial_achievements = set(user_data['achievements']['completed'])
-        initial_rank = user_data.get('rank', 0)
-        
-        # Update total clicks stat (only for manual clicks)
-        user_data['stats']['total_clicks'] += 1
-        
-        # Update click achievements
-        update_click_achievements(user_data)
-        
-        # Calculate click value
-        # Base value starts at 0.01 at level 1 and increases by 50% per level
-        base_value = 0.01 * (1.5 ** (user_data['upgrades']['click_value'] - 1))
-        click_value = base_value * current_multiplier
-        
-        if is_crit:
-            click_value *= 4  # Critical hits do 4x damage
-        
-        user_data['balance'] += click_value
-        
-        # Check if any new achievements were completed
-        new_achievements = set(user_data['achievements']['completed']) - initial_achievements
-        completed_achievement = None
-        if new_achievements:
-            achievement_id = list(new_achievements)[0]
-            level = int(achievement_id.split('_')[1])
-            completed_achievement = {
-                'title': {
-                    1: 'Dedicated Clicker',
-                    2: 'Click Enthusiast',
-                    3: 'Click Master',
-                    4: 'Click Expert',
-                    5: 'Click God'
-                }[level],
-                'icon': '🖱️',
-                'reward': {
-                    1: 100,
-                    2: 200,
-                    3: 400,
-                    4: 800,
-                    5: 2000
-                }[level],
-                'exp_reward': {
-                    1: 50,
-                    2: 100,
-                    3: 200,
-                    4: 400,
-                    5: 1000
-                }[level]
-            }
-        
-        save_user_data(user_data)
+        # Counted in memory; the accumulator adds it to the balance on its next flush
+        result = get_click_accumulator().add(normal=0 if is_crit else 1, critical=1 if is_crit else 0,
+                                             multiplier=data.get('multiplier', 1))
+        user_data = get_user_fields('balance', 'exp', 'rank')
         
         return jsonify({
             'success': True,
-            'balance': user_data['balance'],
-            'click_value': click_value,
-            'achievement': completed_achievement,
-            'exp': user_data['exp'],
-            'rank': user_data['rank'],
-            'rankName': RANKS[user_data['rank']],
-            'nextRankExp': RANK_EXP[user_data['rank']] if user_data['rank'] < len(RANK_EXP) else None,
-            'levelUp': user_data['rank'] > initial_rank
+            'balance': user_data['balance'] + result['pending_value'],
+            'click_value': result['value'],
+            'achievement': result['achievement'],
+            'levelUp': result['level_up'],
+            **rank_info(user_data)
         })
         
     except Exception as e:
         print(f"Error in click: {e}")
         return jsonify({'error': str(e)})
 
+@app.errorhandler(UserDataConflict)
+def user_data_conflict(e):
+    # Nothing was saved; the client should reload and try again
+    print(f"User data conflict: {e}")
+    return jsonify({'error': str(e), 'conflict': True, 'field': e.field}), 409
+
+@app.before_request
+def bind_current_user():
+    # Every browser session is its own player in multi-user mode; otherwise everyone is LOCAL_USER
+    if MULTI_USER:
+        if 'user_id' not in session:
+            session['user_id'] = uuid.uuid4().hex
+        set_current_user(session['user_id'])
+    else:
+        set_current_user(LOCAL_USER)
+
+@app.before_request
+def flush_clicks():
+    # Anything other than a click may read or spend the balance, so settle counted clicks first
+    user = current_user()
+    if request.endpoint not in ('click', 'batch_click') and get_click_accumulator().has_pending(user):
+        get_click_accumulator().flush(user)
+
 @app.route('/update_session', methods=['POST'])
 def update_session():
     user_data = load_user_data()
@@ -685,6 +604,8 @@ def purchase_upgrade():
             'nextCost': next_cost
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in purchase_upgrade: {e}")
         return jsonify({'error': 'Failed to purchase upgrade'})
@@ -782,8 +703,7 @@ def buy_case():
 def get_inventory():
     try:
         # Load user inventory
-        with open('data/user_inventory.json', 'r') as f:
-            user_data = json.load(f)
+        user_data = load_user_data()
         
         # Ensure each item has a favorite field (even if false)
         for item in user_data['inventory']:
@@ -811,11 +731,93 @@ def get_user_data():
         'rankName': RANKS[user.rank],
         'nextRankExp': RANK_EXP[user.rank] if user.rank < len(RANK_EXP) else None,
         'balance': user.balance,
-        'inventory': user.inventory,
+        # ?inventory=0 skips the inventory for callers that page through /api/inventory instead
+        'inventory': user.inventory if _bool_arg('inventory') is not False else None,
         'upgrades': user_data.get('upgrades', {}),  # Add upgrades to response
         'case_progress': user_data.get('case_progress', 0)  # Add case progress too
     })
 
+def _bool_arg(name):
+    # Query string flag: 'true'/'1' -> True, 'false'/'0' -> False, missing -> None
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    return value.lower() in ('1', 'true', 'yes')
+
+@app.route('/api/inventory')
+def get_inventory_page():
+    # Filtered, sorted and paginated inventory. Pass the returned next_cursor back
+    # with the same filters and sort to get the following page
+    try:
+        filters = {
+            'rarity': request.args.get('rarity') or None,
+            'case_type': request.args.get('case_type') or None,
+            'stattrak': _bool_arg('stattrak'),
+            'sticker': _bool_arg('sticker'),
+            'favorite': _bool_arg('favorite'),
+            'min_price': request.args.get('min_price', type=float),
+            'max_price': request.args.get('max_price', type=float)
+        }
+        sort = request.args.get('sort', 'timestamp')
+        descending = request.args.get('order', 'desc') != 'asc'
+        limit = request.args.get('limit', 50, type=int)
+        if limit < 1 or limit > 500:
+            return jsonify({'error': 'limit must be between 1 and 500'}), 400
+        
+        inventory_index = get_inventory_index()
+        
+        if _bool_arg('summary'):
+            if not any(value is not None for value in filters.values()):
+                totals = inventory_index.summary()['all']
+                return jsonify({'count': totals['count'], 'total_value': totals['value']})
+            items, _ = inventory_index.query(sort=sort, descending=descending, limit=None, **filters)
+            return jsonify({
+                'count': len(items),
+                'total_value': round(sum(float(item.get('price') or 0) for item in items), 2)
+            })
+        
+        items, next_cursor = inventory_index.query(sort=sort, descending=descending,
+                                                   cursor=request.args.get('cursor'),
+                                                   limit=limit, **filters)
+        return jsonify({
+            'items': [dict(item, favorite=bool(item.get('favorite'))) for item in items],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error in get_inventory_page: {str(e)}")
+        return jsonify({'error': 'Failed to get inventory'}), 500
+
+@app.route('/api/inventory/summary')
+def get_inventory_summary_route():
+    # Running totals kept by the inventory index: overall, sellable/favorites/cases, per rarity and case type
+    try:
+        return jsonify(get_inventory_summary())
+    except Exception as e:
+        print(f"Error in get_inventory_summary: {str(e)}")
+        return jsonify({'error': 'Failed to get inventory summary'}), 500
+
+@app.route('/debug/user_data_stats')
+def user_data_stats():
+    # How many user data loads came from memory vs. disk
+    return jsonify(get_load_stats())
+
+@app.route('/api/cases/ev')
+def get_cases_ev():
+    # Exact expected value, spread and percentiles of opening one case; ?case_type= for a single case
+    try:
+        report = get_case_ev_report()
+        case_type = request.args.get('case_type')
+        if case_type:
+            if case_type not in report:
+                return jsonify({'error': 'Invalid case type'}), 404
+            return jsonify(report[case_type])
+        return jsonify({'cases': list(report.values())})
+    except Exception as e:
+        print(f"Error in get_cases_ev: {str(e)}")
+        return jsonify({'error': 'Failed to compute case EV'}), 500
+
 @app.route('/api/data/case_contents/<case_type>')
 def get_case_contents(case_type):
     # Use CASE_FILE_MAPPING from config.py
@@ -921,6 +923,8 @@ def play_coinflip():
             'current_balance': user_data['balance']
         })
 
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in play_coinflip: {e}")
         return jsonify({'error': 'Failed to play coinflip'})
@@ -946,6 +950,8 @@ def update_coinflip_balance():
             'balance': result['final_balance']
         })
 
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error updating balance: {e}")
         return jsonify({'error': 'Failed to update balance'})
@@ -1000,37 +1006,11 @@ def play_roulette():
         
         for bet_type, amount in bets.items():
             amount = float(amount)
-            if bet_type.isdigit():  # Single number bet
-                if int(bet_type) == result:
-                    win_amount = amount * 36
-                    winnings += win_amount
-                    update_earnings_achievements(user_data, win_amount - amount)
-            elif bet_type in ['red', 'black']:
-                if (bet_type == 'red' and result in RED_NUMBERS) or \
-                   (bet_type == 'black' and result in BLACK_NUMBERS):
-                    win_amount = amount * 2
-                    winnings += win_amount
-                    update_earnings_achievements(user_data, win_amount - amount)
-            elif bet_type in ['even', 'odd']:
-                if result != 0 and \
-                   ((bet_type == 'even' and result % 2 == 0) or \
-                    (bet_type == 'odd' and result % 2 == 1)):
-                    win_amount = amount * 2
-                    winnings += win_amount
-                    update_earnings_achievements(user_data, win_amount - amount)
-            elif bet_type in ['1-18', '19-36']:
-                if (bet_type == '1-18' and 1 <= result <= 18) or \
-                   (bet_type == '19-36' and 19 <= result <= 36):
-                    win_amount = amount * 2
-                    winnings += win_amount
-                    update_earnings_achievements(user_data, win_amount - amount)
-            elif bet_type in ['1st12', '2nd12', '3rd12']:
-                if (bet_type == '1st12' and 1 <= result <= 12) or \
-                   (bet_type == '2nd12' and 13 <= result <= 24) or \
-                   (bet_type == '3rd12' and 25 <= result <= 36):
-                    win_amount = amount * 3
-                    winnings += win_amount
-                    update_earnings_achievements(user_data, win_amount - amount)
+            payout = roulette_payout(bet_type, result)
+            if payout:
+                win_amount = amount * payout
+                winnings += win_amount
+                update_earnings_achievements(user_data, win_amount - amount)
         
         # Store the result and winnings in session for the update_roulette_balance endpoint
         session['roulette_result'] = {
@@ -1078,6 +1058,8 @@ def update_roulette_balance():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error updating roulette balance: {e}")
         return jsonify({'error': 'Failed to update balance'})
@@ -1120,6 +1102,8 @@ def play_crash():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in play_crash: {e}")
         return jsonify({'error': 'Failed to place bet'})
@@ -1159,6 +1143,8 @@ def crash_cashout():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in crash_cashout: {e}")
         return jsonify({'error': 'Failed to process cashout'})
@@ -1186,66 +1172,30 @@ def sell_all():
         user_data = load_user_data()
         inventory = user_data.get('inventory', [])
         
-        # Get only non-case, non-favorited items
-        skins = [item for item in inventory if not item.get('is_case') and not item.get('favorite', False)]
-        cases = [item for item in inventory if item.get('is_case')]
-        favorited = [item for item in inventory if not item.get('is_case') and item.get('favorite', False)]
+        # The index already knows which items are kept (cases and favorites) and what the rest is worth
+        partition = partition_sellable(inventory)
+        if partition is None:
+            skins = [item for item in inventory if not item.get('is_case') and not item.get('favorite', False)]
+            cases = [item for item in inventory if item.get('is_case')]
+            favorited = [item for item in inventory if not item.get('is_case') and item.get('favorite', False)]
+            partition = (cases + favorited, len(skins), sum(float(item.get('price') or 0) for item in skins))
+        kept_items, sold_count, total_value = partition
         
-        if not skins:
+        if not sold_count:
             return jsonify({'error': 'No items to sell'})
-            
-        # Calculate total value
-        total_value = sum(float(item.get('price', 0)) for item in skins)
         
-        # Store initial rank and achievements state
+        # Store initial rank for level up check
         initial_rank = user_data.get('rank', 0)
-        initial_achievements = set(user_data['achievements']['completed'])
         
         # Update user's balance
         user_data['balance'] = float(user_data['balance']) + total_value
         
         # Keep cases and favorited items in inventory
-        user_data['inventory'] = cases + favorited
+        user_data['inventory'] = kept_items
         
         # Update achievements with the total earned amount
-        update_earnings_achievements(user_data, total_value)
-        
-        # Check if any new achievements were completed
-        new_achievements = set(user_data['achievements']['completed']) - initial_achievements
-        completed_achievement = None
-        if new_achievements:
-            achievement_id = list(new_achievements)[0]
-            level = int(achievement_id.split('_')[1])
-            completed_achievement = {
-                'title': {
-                    1: 'Starting Out',
-                    2: 'Making Moves',
-                    3: 'Known Mogul',
-                    4: 'Expert Trader',
-                    5: 'Millionaire'
-                }[level],
-                'icon': {
-                    1: '💵',
-                    2: '💰',
-                    3: '🏦',
-                    4: '💎',
-                    5: '🏆'
-                }[level],
-                'reward': {
-                    1: 100,
-                    2: 1000,
-                    3: 5000,
-                    4: 10000,
-                    5: 100000
-                }[level],
-                'exp_reward': {
-                    1: 1000,
-                    2: 5000,
-                    3: 10000,
-                    4: 20000,
-                    5: 50000
-                }[level]
-            }
+        new_achievements = update_earnings_achievements(user_data, total_value)
+        completed_achievement = new_achievements[0] if new_achievements else None
         
         # Save updated user data
         save_user_data(user_data)
@@ -1254,7 +1204,7 @@ def sell_all():
             'success': True,
             'balance': user_data['balance'],
             'sold_price': total_value,
-            'remaining_cases': cases,
+            'remaining_cases': [item for item in kept_items if item.get('is_case')],
             'exp': user_data['exp'],
             'rank': user_data['rank'],
             'rankName': RANKS[user_data['rank']],
@@ -1263,6 +1213,8 @@ def sell_all():
             'achievement': completed_achievement
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in sell_all: {e}")
         return jsonify({'error': 'Failed to sell items'})
@@ -1324,38 +1276,14 @@ def start_jackpot():
         user_data = load_user_data()
         inventory = user_data.get('inventory', [])
         
-        # Create a copy of inventory to remove items as we find them
-        remaining_inventory = inventory.copy()
-        found_items = []  # Keep track of found items
+        found_items = set()  # Positions already claimed by an earlier selected item
         
         # For each selected item
         for selected_item in user_items:
-            item_found = False
-            
-            # Look through remaining inventory
-            for i, inv_item in enumerate(remaining_inventory):
-                if selected_item.get('is_sticker'):
-                    # Match sticker items
-                    if (inv_item.get('is_sticker') and
-                        inv_item.get('name') == selected_item['name'] and
-                        inv_item.get('case_type') == selected_item['case_type'] and
-                        i not in found_items):
-                        item_found = True
-                        found_items.append(i)
-                        break
-                else:
-                    # Match weapon skin items
-                    if (inv_item.get('weapon') == selected_item['weapon'] and 
-                        inv_item.get('name') == selected_item['name'] and
-                        inv_item.get('wear') == selected_item['wear'] and
-                        inv_item.get('stattrak') == selected_item['stattrak'] and
-                        i not in found_items):
-                        item_found = True
-                        found_items.append(i)
-                        break
-            
-            if not item_found:
-                return jsonify({'error': f'Item not found in inventory or already selected: {selected_item["weapon"]} | {selected_item["name"]}'})
+            position = match_inventory_item(inventory, selected_item, exclude=found_items)
+            if position is None:
+                return jsonify({'error': f'Item not found in inventory or already selected: {selected_item.get("weapon", "")} | {selected_item["name"]}'})
+            found_items.add(position)
         
         # Remove the selected items from inventory
         new_inventory = [item for i, item in enumerate(inventory) if i not in found_items]
@@ -1437,6 +1365,8 @@ def start_jackpot():
             }
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in start_jackpot: {str(e)}")
         print(f"Error traceback: {traceback.format_exc()}")
@@ -1495,84 +1425,84 @@ def buy_skin():
             'success': True,
             'balance': user_data['balance']
         })
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in buy_skin: {e}")
         return jsonify({'error': 'Failed to purchase skin'})
 
 @app.route('/get_featured_skins')
 def get_featured_skins():
-    global FEATURED_SKINS, LAST_REFRESH_TIME
+    featured = shared_state.get('featured_skins') or {}
     
+    if not featured.get('skins') or time.time() - featured['refresh_time'] >= REFRESH_INTERVAL:
+        with shared_state.lock('featured_skins'):
+            featured = refresh_featured_skins()
+        if featured is None:
+            return jsonify({'error': 'Failed to generate featured skins'})
+    
+    return jsonify({
+        'skins': featured['skins'],
+        'refreshTime': featured['refresh_time'],
+        'nextRefresh': featured['refresh_time'] + REFRESH_INTERVAL
+    })
+
+def refresh_featured_skins():
+    """Roll new featured skins if they're due; another worker may just have done it"""
+    featured = shared_state.get('featured_skins') or {}
     current_time = time.time()
     
-    if not FEATURED_SKINS or not LAST_REFRESH_TIME or (current_time - LAST_REFRESH_TIME) >= REFRESH_INTERVAL:
+    if not featured.get('skins') or (current_time - featured['refresh_time']) >= REFRESH_INTERVAL:
         try:
-            # Load all case contents
-            all_skins = []
-            
-            # Load skins from each case
-            for case_type in CASE_TYPES:
-                try:
-                    file_name = CASE_FILE_MAPPING.get(case_type)
-                    if not file_name:
-                        continue
-                    with open(f'cases/{file_name}.json', 'r') as f:
-                        case_data = json.load(f)
-                        
-                        # Add all skins to the pool
-                        for grade, items in case_data['skins'].items():
-                            for item in items:
-                                wear_options = [w for w in item['prices'].keys() 
-                                              if not w.startswith('ST_') and w != 'NO']
-                                if wear_options:
-                                    wear = random.choice(wear_options)
-                                    float_value = generate_float_for_wear(wear)
-                                    base_price = float(item['prices'][wear])
-                                    adjusted_price = adjust_price_by_float(base_price, wear, float_value)
-                                    
-                                    # Apply 10% shop markup
-                                    shop_price = adjusted_price * 1.1
-                                    
-                                    all_skins.append({
-                                        'weapon': item['weapon'],
-                                        'name': item['name'],
-                                        'prices': item['prices'],
-                                        'case_type': case_type,
-                                        'case_file': file_name,
-                                        'image': item.get('image', f"{item['weapon'].lower().replace(' ', '')}_{item['name'].lower().replace(' ', '_')}.png"),
-                                        'rarity': grade.upper(),
-                                        'wear': wear,
-                                        'float_value': float_value,
-                                        'base_price': base_price,
-                                        'adjusted_price': adjusted_price,  # Store original adjusted price
-                                        'price': shop_price,  # Display price with markup
-                                        'stattrak': random.random() < 0.1  # 10% chance for StatTrak
-                                    })
-                except Exception as e:
-                    print(f"Error loading case {case_type}: {e}")
-                    continue
+            catalog = get_catalog()
             
             # Select one random skin from each rarity
-            FEATURED_SKINS = {}
+            featured_skins = {}
             rarities = ['GOLD', 'RED', 'PINK', 'PURPLE', 'BLUE']
             
             for rarity in rarities:
-                rarity_skins = [skin for skin in all_skins if skin['rarity'] == rarity]
-                if rarity_skins:
-                    FEATURED_SKINS[rarity] = random.choice(rarity_skins)
+                rarity_skins = [item for item in catalog.rarity_buckets.get(rarity, [])
+                                if any(not w.startswith('ST_') and w != 'NO' for w in item['prices'])]
+                if not rarity_skins:
+                    continue
+                
+                # Only roll wear and float for the skin that actually gets featured
+                item = random.choice(rarity_skins)
+                wear_options = [w for w in item['prices'].keys() 
+                              if not w.startswith('ST_') and w != 'NO']
+                wear = random.choice(wear_options)
+                float_value = generate_float_for_wear(wear)
+                base_price = float(item['prices'][wear])
+                adjusted_price = adjust_price_by_float(base_price, wear, float_value)
+                
+                # Apply 10% shop markup
+                shop_price = adjusted_price * 1.1
+                
+                featured_skins[rarity] = {
+                    'weapon': item['weapon'],
+                    'name': item['name'],
+                    'prices': item['prices'],
+                    'case_type': item['case_type'],
+                    'case_file': item['case_file'],
+                    'image': item['image'],
+                    'rarity': rarity,
+                    'wear': wear,
+                    'float_value': float_value,
+                    'base_price': base_price,
+                    'adjusted_price': adjusted_price,  # Store original adjusted price
+                    'price': shop_price,  # Display price with markup
+                    'stattrak': random.random() < 0.1  # 10% chance for StatTrak
+                }
             
-            LAST_REFRESH_TIME = current_time
+            featured = {'skins': featured_skins, 'refresh_time': current_time}
+            shared_state.set('featured_skins', featured)
             
         except Exception as e:
             print(f"Error generating featured skins: {e}")
             traceback.print_exc()
-            return jsonify({'error': str(e)})
+            return None
     
-    return jsonify({
-        'skins': FEATURED_SKINS,
-        'refreshTime': LAST_REFRESH_TIME,
-        'nextRefresh': LAST_REFRESH_TIME + REFRESH_INTERVAL if LAST_REFRESH_TIME else None
-    })
+    return featured
 
 @app.route('/upgrade')
 @login_required
@@ -1599,133 +1529,28 @@ def play_upgrade():
         total_value = sum(float(item['price']) for item in items)
         target_value = total_value * multiplier
         
-        # Load all possible skins first
-        available_skins = []
-        
-        # Load weapon skins
-        for case_type, file_name in CASE_FILE_MAPPING.items():
-            try:
-                with open(f'cases/{file_name}.json', 'r') as f:
-                    case_data = json.load(f)
-                    for grade, skins in case_data['skins'].items():
-                        for skin in skins:
-                            # First get the base wear prices
-                            for wear, base_price in skin['prices'].items():
-                                if wear != 'NO' and not wear.startswith('ST_'):
-                                    float_value = generate_float_for_wear(wear)
-                                    
-                                    # Handle normal version
-                                    normal_price = float(base_price)
-                                    adjusted_normal_price = adjust_price_by_float(normal_price, wear, float_value)
-                                    
-                                    # Add normal version
-                                    available_skins.append({
-                                        'weapon': skin['weapon'],
-                                        'name': skin['name'],
-                                        'wear': wear,
-                                        'price': adjusted_normal_price,
-                                        'base_price': normal_price,
-                                        'rarity': grade.upper(),
-                                        'case_type': case_type,
-                                        'case_file': file_name,
-                                        'stattrak': False,
-                                        'timestamp': time.time(),
-                                        'float_value': float_value,
-                                        'image': skin['image'],
-                                        'is_sticker': False
-                                    })
-                                    
-                                    # Handle StatTrak version if available
-                                    st_key = f'ST_{wear}'
-                                    if st_key in skin['prices']:
-                                        st_base_price = float(skin['prices'][st_key])
-                                        # Use StatTrak base price for adjustment
-                                        adjusted_st_price = adjust_price_by_float(st_base_price, wear, float_value)
-                                        
-                                        available_skins.append({
-                                            'weapon': skin['weapon'],
-                                            'name': skin['name'],
-                                            'wear': wear,
-                                            'price': adjusted_st_price,
-                                            'base_price': st_base_price,
-                                            'rarity': grade.upper(),
-                                            'case_type': case_type,
-                                            'case_file': file_name,
-                                            'stattrak': True,
-                                            'timestamp': time.time(),
-                                            'float_value': float_value,
-                                            'image': skin['image'],
-                                            'is_sticker': False
-                                        })
-            except Exception as e:
-                print(f"Error loading case {case_type}: {e}")
-                continue
-                
-        # Load stickers
-        for capsule_type, file_name in STICKER_CAPSULE_FILE_MAPPING.items():
-            try:
-                with open(f'stickers/{file_name}.json', 'r') as f:
-                    capsule_data = json.load(f)
-                    for grade, stickers in capsule_data['stickers'].items():
-                        for sticker in stickers:
-                            available_skins.append({
-                                'name': sticker['name'],
-                                'price': float(sticker['price']),
-                                'rarity': grade.upper(),
-                                'case_type': capsule_type,
-                                'case_file': file_name,  # Add case_file field
-                                'image': sticker['image'],
-                                'is_sticker': True,
-                                'timestamp': time.time()
-                            })
-            except Exception as e:
-                print(f"Error loading sticker capsule {capsule_type}: {e}")
-                continue
-        
-        # Find potential winning skins before determining outcome
-        won_skins = find_best_skin_combination(available_skins, target_value)
-        
-        # Success probabilities for each multiplier
-        probabilities = {
-            2: 46,
-            3: 30.67,
-            5: 18.4,
-            10: 9.2,
-            100: 0.92
-        }
+        # Find potential winning rows before determining outcome; the pool is cached per catalog
+        upgrade_pool = get_upgrade_pool()
+        won_rows = upgrade_pool.find_combination(target_value)
         
         # Determine if upgrade succeeds
-        success_probability = probabilities.get(multiplier, 0) / 100
+        success_probability = UPGRADE_CHANCES.get(multiplier, 0) / 100
         success = random.random() < success_probability
         
         # Remove selected items from inventory
-        selected_indices = []
+        selected_indices = set()
         for selected_item in items:
-            for i, inv_item in enumerate(inventory):
-                if i not in selected_indices:
-                    if selected_item.get('is_sticker'):
-                        # Match stickers by name and case_type
-                        if (inv_item.get('is_sticker') and
-                            inv_item.get('name') == selected_item['name'] and
-                            inv_item.get('case_type') == selected_item['case_type']):
-                            selected_indices.append(i)
-                            break
-                    else:
-                        # Match skins by weapon, name, wear and stattrak
-                        if (not inv_item.get('is_sticker') and
-                            inv_item.get('weapon') == selected_item['weapon'] and
-                            inv_item.get('name') == selected_item['name'] and
-                            inv_item.get('wear') == selected_item['wear'] and
-                            inv_item.get('stattrak') == selected_item['stattrak']):
-                            selected_indices.append(i)
-                            break
+            position = match_inventory_item(inventory, selected_item, exclude=selected_indices)
+            if position is not None:
+                selected_indices.add(position)
         
         # Create new inventory without selected items
         new_inventory = [item for i, item in enumerate(inventory) 
                        if i not in selected_indices]
         
         if success:
-            # Add won skins to inventory
+            # Floats (and the prices that depend on them) are only rolled for the skins actually won
+            won_skins = [upgrade_pool.make_item(row) for row in won_rows]
             new_inventory.extend(won_skins)
             
             # Update user data
@@ -1753,6 +1578,8 @@ def play_upgrade():
                 'won': False
             })
             
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in play_upgrade: {e}")
         return jsonify({'error': 'Failed to process upgrade'})
@@ -1798,17 +1625,7 @@ def case_click():
             min_price, max_price = price_ranges.get(case_quality, (0, 2))
             
             # Get available cases within price range
-            available_cases = []
-            for case_type, file_name in CASE_FILE_MAPPING.items():
-                try:
-                    with open(f'cases/{file_name}.json', 'r') as f:
-                        case_data = json.load(f)
-                        price = float(case_data.get('price', 0))
-                        if min_price <= price <= max_price:
-                            available_cases.append((case_type, case_data))
-                except Exception as e:
-                    print(f"Error checking case price for {case_type}: {e}")
-                    continue
+            available_cases = get_catalog().cases_in_price_range(min_price, max_price)
             
             if available_cases:
                 earned_case, case_data = random.choice(available_cases)
@@ -1851,6 +1668,8 @@ def case_click():
             'progress_per_click': progress_per_click
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in case_click: {e}")
         return jsonify({'error': str(e)})
@@ -1865,7 +1684,7 @@ def trading():
 @login_required
 def get_trades():
     try:
-        trades_data = load_daily_trades()
+        trades_data = load_daily_trades(current_user())
         current_date = datetime.now().strftime('%Y-%m-%d')
         
         # Check if trades need to be regenerated
@@ -1874,7 +1693,7 @@ def get_trades():
             trades_data['trades'] = generate_daily_trades()
             trades_data['date'] = current_date
             trades_data['completed_trades'] = []  # Reset completed trades
-            save_daily_trades(trades_data)
+            save_daily_trades(trades_data, current_user())
         
         # Filter out completed trades
         active_trades = [trade for trade in trades_data['trades'] 
@@ -1896,7 +1715,7 @@ def complete_trade():
             return jsonify({'error': 'Invalid trade data'})
             
         # Load trades data and user data
-        trades_data = load_daily_trades()
+        trades_data = load_daily_trades(current_user())
         user_data = load_user_data()
         
         # Get current user state
@@ -1915,51 +1734,13 @@ def complete_trade():
             if required_money > current_balance:
                 return jsonify({'error': 'Insufficient funds'})
         
-        # Check for required items (skins and stickers)
-        if any(item['type'] == 'skin' for item in trade['requesting']):
-            required_items = [item for item in trade['requesting'] if item['type'] == 'skin']
-            for required_item in required_items:
-                item_found = False
-                for inv_item in inventory:
-                    if required_item.get('is_sticker'):
-                        if (inv_item.get('is_sticker') and
-                            inv_item['name'] == required_item['name'] and
-                            inv_item['case_type'] == required_item['case_type']):
-                            item_found = True
-                            break
-                    else:
-                        if (not inv_item.get('is_case') and not inv_item.get('is_sticker') and
-                            inv_item['weapon'] == required_item['weapon'] and
-                            inv_item['name'] == required_item['name'] and
-                            inv_item['wear'] == required_item['wear'] and
-                            inv_item['stattrak'] == required_item['stattrak']):
-                            item_found = True
-                            break
-                if not item_found:
-                    return jsonify({'error': f"Missing item: {required_item.get('weapon', '')} {required_item['name']}"})
-        
-        # Process inventory changes
-        new_inventory = []
+        # Check for required items (skins and stickers), claiming one inventory item for each
         used_indices = set()
-        
-        # Remove requested items
         for required_item in (item for item in trade['requesting'] if item['type'] == 'skin'):
-            for i, inv_item in enumerate(inventory):
-                if i not in used_indices:
-                    if required_item.get('is_sticker'):
-                        if (inv_item.get('is_sticker') and
-                            inv_item['name'] == required_item['name'] and
-                            inv_item['case_type'] == required_item['case_type']):
-                            used_indices.add(i)
-                            break
-                    else:
-                        if (not inv_item.get('is_case') and not inv_item.get('is_sticker') and
-                            inv_item['weapon'] == required_item['weapon'] and
-                            inv_item['name'] == required_item['name'] and
-                            inv_item['wear'] == required_item['wear'] and
-                            inv_item['stattrak'] == required_item['stattrak']):
-                            used_indices.add(i)
-                            break
+            position = match_inventory_item(inventory, required_item, exclude=used_indices)
+            if position is None:
+                return jsonify({'error': f"Missing item: {required_item.get('weapon', '')} {required_item['name']}"})
+            used_indices.add(position)
         
         # Keep items that weren't traded
         new_inventory = [item for i, item in enumerate(inventory) if i not in used_indices]
@@ -2040,7 +1821,7 @@ def complete_trade():
         if 'completed_trades' not in trades_data:
             trades_data['completed_trades'] = []
         trades_data['completed_trades'].append(trade)
-        save_daily_trades(trades_data)
+        save_daily_trades(trades_data, current_user())
         
         return jsonify({
             'success': True,
@@ -2052,6 +1833,8 @@ def complete_trade():
             'expGained': exp_reward
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error completing trade: {e}")
         traceback.print_exc()  # Add this to get more detailed error info
@@ -2065,142 +1848,32 @@ def achievements():
     
     # Initialize achievements if needed
     if 'achievements' not in user_data:
-        user_data['achievements'] = {
-            'completed': [],
-            'in_progress': {}
-        }
-        update_earnings_achievements(user_data, 0)
-        update_case_achievements(user_data)
+        update_all_achievements(user_data)
         save_user_data(user_data)
     
-    # Get completed achievements data
-    completed_achievements = []
-    for achievement_id in user_data['achievements']['completed']:
-        # Handle earnings achievements
-        if achievement_id.startswith('earnings_'):
-            level = int(achievement_id.split('_')[1])
-            achievement_data = {
-                'id': achievement_id,
-                'completed': True,
-                'progress': 100,
-                'current_value': {
-                    1: 1000,
-                    2: 10000,
-                    3: 50000,
-                    4: 100000,
-                    5: 1000000
-                }[level],
-                'target_value': {
-                    1: 1000,
-                    2: 10000,
-                    3: 50000,
-                    4: 100000,
-                    5: 1000000
-                }[level],
-                'category': 'special',
-                'title': {
-                    1: 'Starting Out',
-                    2: 'Making Moves',
-                    3: 'Known Mogul',
-                    4: 'Expert Trader',
-                    5: 'Millionaire'
-                }[level],
-                'description': f'Earned ${"{:,.0f}".format({1: 1000, 2: 10000, 3: 50000, 4: 100000, 5: 1000000}[level])}',
-                'icon': {
-                    1: '💵',
-                    2: '💰',
-                    3: '🏦',
-                    4: '💎',
-                    5: '🏆'
-                }[level],
-                'reward': {
-                    1: 100,
-                    2: 1000,
-                    3: 5000,
-                    4: 10000,
-                    5: 100000
-                }[level],
-                'exp_reward': {  # Add this block
-                    1: 1000,
-                    2: 5000,
-                    3: 10000,
-                    4: 20000,
-                    5: 50000
-                }[level]
-            }
-            completed_achievements.append(achievement_data)
-        # Handle case achievements
-        elif achievement_id.startswith('cases_'):
-            level = int(achievement_id.split('_')[1])
-            achievement_data = {
-                'id': achievement_id,
-                'completed': True,
-                'progress': 100,
-                'current_value': {
-                    1: 10,
-                    2: 100,
-                    3: 1000,
-                    4: 10000,
-                    5: 100000
-                }[level],
-                'target_value': {
-                    1: 10,
-                    2: 100,
-                    3: 1000,
-                    4: 10000,
-                    5: 100000
-                }[level],
-                'category': 'cases',
-                'title': {
-                    1: 'Case Opener',
-                    2: 'Case Enthusiast',
-                    3: 'Case Veteran',
-                    4: 'Case Master',
-                    5: 'Case God'
-                }[level],
-                'description': f'Open {"{:,.0f}".format({1: 10, 2: 100, 3: 1000, 4: 10000, 5: 100000}[level])} cases',
-                'icon': '📦',
-                'reward': {
-                    1: 100,
-                    2: 500,
-                    3: 1000,
-                    4: 2000,
-                    5: 5000
-                }[level],
-                'exp_reward': 0
-            }
-            completed_achievements.append(achievement_data)
-    
-    # Get all in-progress achievements
-    in_progress_achievements = []
-    for achievement in user_data['achievements']['in_progress'].values():
-        in_progress_achievements.append(achievement)
-    
-    # Combine achievements - completed ones first, then the current in-progress one
-    all_achievements = completed_achievements + in_progress_achievements
-    
-    # Sort achievements by ID to maintain order
-    all_achievements.sort(key=lambda x: x['id'])
-    
-    # Calculate summary statistics
-    total_tiers = 15  # 5 earnings + 5 case + 5 click achievements
-    completion_rate = round((len(completed_achievements) / total_tiers * 100))
-
-    # Calculate total rewards earned from completed achievements
-    total_rewards = sum(achievement['reward'] for achievement in completed_achievements)
-    
     return render_template('achievements.html',
-                         achievements=all_achievements,
-                         completed_count=len(completed_achievements),
-                         total_count=total_tiers,  # Show out of 15 total tiers
-                         completion_rate=completion_rate,
-                         total_rewards=total_rewards,
+                         **achievement_summary(user_data),
                          balance=user_data['balance'],
                          rank=user_data['rank'],
                          exp=user_data['exp'],
                          RANKS=RANKS,
                          RANK_EXP=RANK_EXP)
 
+@app.route('/api/achievements')
+@login_required
+def get_achievements():
+    try:
+        user_data = load_user_data()
+        if 'achievements' not in user_data:
+            update_all_achievements(user_data)
+            save_user_data(user_data)
+        return jsonify(achievement_summary(user_data))
+    except UserDataConflict:
+        raise
+    except Exception as e:
+        print(f"Error getting achievements: {e}")
+        return jsonify({'error': 'Failed to get achievements'})
+
 @app.route('/clicker')
 @login_required
 def clicker():
@@ -2271,6 +1944,8 @@ def complete_achievement():
         
         return jsonify(response_data)
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error completing achievement: {e}")
         return jsonify({'error': str(e)})
@@ -2288,35 +1963,36 @@ def sell_specific_item():
         user_data = load_user_data()
         inventory = user_data['inventory']
         
-        # Find the specific item in inventory
-        item_index = None
-        for i, inv_item in enumerate(inventory):
-            if inv_item.get('is_case') or inv_item.get('is_capsule'):
-                continue
+        # Find the specific item in inventory, by id when the client sent one
+        item_index = find_inventory_item(inventory, item_data.get('id'))
+        if item_index is None:
+            for i, inv_item in enumerate(inventory):
+                if inv_item.get('is_case') or inv_item.get('is_capsule'):
+                    continue
                 
-            # First check if either item is a sticker
-            is_sticker_inv = inv_item.get('is_sticker', False)
-            is_sticker_data = item_data.get('is_sticker', False)
+                # First check if either item is a sticker
+                is_sticker_inv = inv_item.get('is_sticker', False)
+                is_sticker_data = item_data.get('is_sticker', False)
             
-            # If one is a sticker and the other isn't, skip
-            if is_sticker_inv != is_sticker_data:
-                continue
+                # If one is a sticker and the other isn't, skip
+                if is_sticker_inv != is_sticker_data:
+                    continue
                 
-            if is_sticker_inv:
-                # For sticker items, compare name and case_type
-                if (inv_item['name'] == item_data['name'] and
-                    inv_item['case_type'] == item_data['case_type']):
-                    item_index = i
-                    break
-            else:
-                # For weapon skins, compare all attributes
-                if (inv_item['weapon'] == item_data['weapon'] and
-                    inv_item['name'] == item_data['name'] and
-                    inv_item['wear'] == item_data['wear'] and
-                    inv_item.get('stattrak', False) == item_data.get('stattrak', False) and
-                    abs(float(inv_item['float_value']) - float(item_data['float_value'])) < 0.0001):
-                    item_index = i
-                    break
+                if is_sticker_inv:
+                    # For sticker items, compare name and case_type
+                    if (inv_item['name'] == item_data['name'] and
+                        inv_item['case_type'] == item_data['case_type']):
+                        item_index = i
+                        break
+                else:
+                    # For weapon skins, compare all attributes
+                    if (inv_item['weapon'] == item_data['weapon'] and
+                        inv_item['name'] == item_data['name'] and
+                        inv_item['wear'] == item_data['wear'] and
+                        inv_item.get('stattrak', False) == item_data.get('stattrak', False) and
+                        abs(float(inv_item['float_value']) - float(item_data['float_value'])) < 0.0001):
+                        item_index = i
+                        break
         
         if item_index is None:
             return jsonify({'error': 'Item not found in inventory'})
@@ -2336,7 +2012,6 @@ def sell_specific_item():
         user_data['balance'] = float(user_data['balance']) + sale_price
         
         # Update achievements
-        initial_achievements = set(user_data['achievements']['completed'])
         update_earnings_achievements(user_data, sale_price)
         
         # Save updated user data
@@ -2353,54 +2028,73 @@ def sell_specific_item():
             'sold_price': sale_price
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in sell_specific_item: {e}")
         traceback.print_exc()
         return jsonify({'error': 'Failed to sell item'})
 
-def start_auction_thread():
-    """Start the background thread for auction processing"""
-    global auction_thread
-    if auction_thread is None or not auction_thread.is_alive():
-        auction_thread = Thread(target=process_auction_background, daemon=True)
-        auction_thread.start()
+def auction_now():
+    """Current time on the auction scheduler's clock"""
+    return datetime.fromtimestamp(auction_scheduler.clock())
 
-def process_auction_background():
-    """Background thread to process bot bids"""
-    global CURRENT_AUCTION, AUCTION_END_TIME, AUCTION_BIDS, last_auction_check
-    
-    while True:
+def bot_bid_delay(time_remaining):
+    """Seconds until the bots next consider bidding; they get busier towards the end"""
+    if time_remaining < 60:  # Last minute
+        return random.uniform(1, 3)
+    elif time_remaining < 300:  # Last 5 minutes
+        return random.uniform(3, 8)
+    elif time_remaining < 600:  # Last 10 minutes
+        return random.uniform(5, 15)
+    else:  # Earlier in auction
+        return random.uniform(15, 30)
+
+def sync_auction_state(auction_data):
+    """Point the auction globals at the stored auction, which another worker may have changed"""
+    global CURRENT_AUCTION, AUCTION_BIDS, AUCTION_END_TIME, AUCTION_BOT_BUDGETS
+    CURRENT_AUCTION = auction_data['item']
+    AUCTION_BIDS = auction_data.get('bids', [])
+    AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
+    AUCTION_BOT_BUDGETS = auction_data.get('bot_budgets', {})
+
+def schedule_auction_events():
+    """Schedule the current auction's close (moving it if the end time changed) and the bots' next look"""
+    if not CURRENT_AUCTION or not is_auction_leader:
+        return
+    auction_scheduler.schedule_at(AUCTION_END_TIME.timestamp(), 'auction_close', close_auction_event)
+    if auction_scheduler.next_time('bot_bids') is None:
+        schedule_bot_bids()
+
+def schedule_bot_bids():
+    time_remaining = (AUCTION_END_TIME - auction_now()).total_seconds()
+    auction_scheduler.schedule_in(bot_bid_delay(time_remaining), 'bot_bids', bot_bids_event)
+
+def bot_bids_event():
+    with auction_lock:
+        if not is_auction_leader:
+            return
         try:
-            current_time = datetime.now()
-            
-            with auction_lock:
-                # Check if auction has ended
-                if CURRENT_AUCTION and current_time >= AUCTION_END_TIME:
-                    complete_auction()
-                    break
-                
-                # Only process bids if auction is active
-                if CURRENT_AUCTION and current_time < AUCTION_END_TIME:
-                    # Update last check time
-                    last_auction_check = current_time
-                    process_bot_bids()
-            
-            # Sleep for a random interval
-            time_remaining = (AUCTION_END_TIME - current_time).total_seconds()
-            if time_remaining < 60:  # Last minute
-                sleep_time = random.uniform(1, 3)
-            elif time_remaining < 300:  # Last 5 minutes
-                sleep_time = random.uniform(3, 8)
-            elif time_remaining < 600:  # Last 10 minutes
-                sleep_time = random.uniform(5, 15)
-            else:  # Earlier in auction
-                sleep_time = random.uniform(15, 30)
-            
-            time.sleep(sleep_time)
-            
-        except Exception as e:
-            print(f"Error in auction background thread: {e}")
-            time.sleep(5)  # Sleep on error to prevent rapid retries
+            auction_data = get_auction_data()
+            if auction_data:
+                sync_auction_state(auction_data)
+            if CURRENT_AUCTION and auction_now() < AUCTION_END_TIME:
+                process_bot_bids()
+        finally:
+            # Keep the bots going even if this round failed
+            schedule_bot_bids()
+
+def close_auction_event():
+    with auction_lock:
+        auction_data = get_auction_data()
+        if not auction_data or not is_auction_leader:
+            return
+        sync_auction_state(auction_data)
+        if auction_now() >= AUCTION_END_TIME:
+            complete_auction()
+        else:
+            # A late bid pushed the end back
+            schedule_auction_events()
 
 @app.route('/auction')
 @login_required
@@ -2414,12 +2108,55 @@ def get_current_bid():
         return CURRENT_AUCTION['base_price'] * 0.1  # Start at 10% of base price
     return AUCTION_BIDS[-1]['amount']
 
+def bid_owner(bid):
+    """The player who placed a bid, or None for a bot's. Players all show up as 'You'"""
+    if not bid or bid.get('bidder') != 'You':
+        return None
+    return bid.get('user', LOCAL_USER)
+
+def owner_token(user):
+    """Stands in for a player in what every client is sent; each client learns its own from the status"""
+    return hmac.new(app.secret_key.encode(), user.encode(), hashlib.sha256).hexdigest()[:16]
+
+def public_bid(bid, viewer=None):
+    """A bid as a client sees it: players' bids say 'You' only to the viewer who placed them, and
+    never carry the player id (knowing it is enough to take over their save).
+
+    Broadcasts have no viewer; clients match the owner token against their own instead.
+    """
+    owner = bid_owner(bid)
+    if owner is None:
+        return bid
+    public = {key: value for key, value in bid.items() if key != 'user'}
+    public.update(bidder='You' if owner == viewer else 'Player', owner=owner_token(owner))
+    return public
+
+def public_history_entry(entry, viewer=None):
+    """Same as public_bid, for a finished auction's winner"""
+    token = entry.get('winner_owner')
+    if token is None:
+        return entry
+    return dict(entry, winner='You' if viewer is not None and token == owner_token(viewer) else 'Player')
+
+def refund_bid(bid):
+    """Give an outbid player their money back"""
+    owner = bid_owner(bid)
+    if owner is None:
+        return
+    try:
+        user_data = load_user_data(owner)
+        user_data['balance'] += bid['amount']
+        save_user_data(user_data, owner)
+    except Exception as e:
+        print(f"Error refunding outbid: {e}")
+
 @app.route('/place_bid', methods=['POST'])
 @login_required
 def place_bid():
     try:
         data = request.get_json()
         bid_amount = float(data.get('amount', 0))
+        user = current_user()
         
         user_data = load_user_data()
         current_balance = float(user_data['balance'])
@@ -2428,8 +2165,7 @@ def place_bid():
             return jsonify({'error': 'Insufficient funds'})
         
         with auction_lock:
-            # Load current auction state from file
-            auction_data = load_auction_data()
+            auction_data = get_auction_data()
             if not auction_data:
                 return jsonify({'error': 'No active auction'})
             
@@ -2438,9 +2174,9 @@ def place_bid():
                 return jsonify({'error': f'Bid must be higher than ${current_bid:.2f}'})
             
             # If user had a previous bid, refund it
-            if auction_data['bids'] and auction_data['bids'][-1]['bidder'] == 'You':
-                previous_bid = auction_data['bids'][-1]['amount']
-                current_balance += previous_bid
+            previous_bid = auction_data['bids'][-1] if auction_data['bids'] else None
+            if bid_owner(previous_bid) == user:
+                current_balance += previous_bid['amount']
             
             # Deduct new bid amount
             current_balance -= bid_amount
@@ -2449,18 +2185,23 @@ def place_bid():
             user_data['balance'] = current_balance
             save_user_data(user_data)
             
+            # Another player was outbid
+            if bid_owner(previous_bid) not in (None, user):
+                refund_bid(previous_bid)
+            
             # Add bid to auction data
             new_bid = {
                 'bidder': 'You',
+                'user': user,
                 'amount': bid_amount,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': auction_now().isoformat()
             }
             auction_data['bids'].append(new_bid)
             auction_data['current_bid'] = bid_amount
             
             # Extend timer by 15 seconds only if time remaining is less than 1 minute
             current_end_time = datetime.fromisoformat(auction_data['end_time'])
-            time_remaining = (current_end_time - datetime.now()).total_seconds()
+            time_remaining = (current_end_time - auction_now()).total_seconds()
             if time_remaining < 60:
                 new_end_time = current_end_time + timedelta(seconds=15)
                 auction_data['end_time'] = new_end_time.isoformat()
@@ -2468,35 +2209,35 @@ def place_bid():
             
             # Save updated auction data
             save_auction_data(auction_data)
+            publish_bid(auction_data, new_bid, extended=time_remaining < 60)
             
             # Update global state to match file
-            global CURRENT_AUCTION, AUCTION_BIDS, AUCTION_END_TIME, LAST_BIDDER
-            AUCTION_BIDS = auction_data['bids']
-            AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
-            LAST_BIDDER = 'You'
+            sync_auction_state(auction_data)
+            schedule_auction_events()
         
         return jsonify({
             'success': True,
             'current_bid': bid_amount,
             'end_time': auction_data['end_time'],
-            'bids': auction_data['bids'],
+            'bids': [public_bid(bid, user) for bid in auction_data['bids']],
             'balance': current_balance
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error placing bid: {e}")
         return jsonify({'error': 'Failed to place bid'})
 
 def process_bot_bids(trigger_bid=None):
     """Process automatic bot bidding responses"""
-    global LAST_BIDDER, AUCTION_END_TIME
-    
-    # Load current auction state from file
-    auction_data = load_auction_data()
+    auction_data = get_auction_data()
     if not auction_data:
         return
+    # Bots don't outbid themselves
+    last_bidder = auction_data['bids'][-1]['bidder'] if auction_data['bids'] else None
         
-    time_remaining = (datetime.fromisoformat(auction_data['end_time']) - datetime.now()).total_seconds()
+    time_remaining = (datetime.fromisoformat(auction_data['end_time']) - auction_now()).total_seconds()
     
     # Calculate base response chance based on time remaining
     if time_remaining < 60:  # Last minute
@@ -2505,7 +2246,7 @@ def process_bot_bids(trigger_bid=None):
         base_chance = 0.25
     elif time_remaining < 600:  # Last 10 minutes
         base_chance = 0.15
-    elif time_remaining < 1800:  # Last 30 minutes
+    else:  # Last 30 minutes (auctions start at exactly 30)
         base_chance = 0.08
     
     # Increase chance if there was a recent bid
@@ -2515,7 +2256,7 @@ def process_bot_bids(trigger_bid=None):
     # Process bot responses - only consider online bots with budgets
     active_bots = [(name, data['budget']) 
                    for name, data in auction_data['bot_budgets'].items() 
-                   if data['status'] == 'online' and name != LAST_BIDDER]
+                   if data['status'] == 'online' and name != last_bidder]
     
     random.shuffle(active_bots)  # Randomize bot order
     
@@ -2535,25 +2276,21 @@ def process_bot_bids(trigger_bid=None):
                 new_bid = min(current_bid + increment, max_budget)
                 if new_bid > current_bid:
                     # If player was outbid, refund their bid
-                    if auction_data['bids'] and auction_data['bids'][-1]['bidder'] == 'You':
-                        try:
-                            user_data = load_user_data()
-                            user_data['balance'] += auction_data['bids'][-1]['amount']
-                            save_user_data(user_data)
-                        except Exception as e:
-                            print(f"Error refunding outbid: {e}")
+                    if auction_data['bids']:
+                        refund_bid(auction_data['bids'][-1])
                     
                     # Update auction data
-                    auction_data['bids'].append({
+                    bot_bid = {
                         'bidder': bot_name,
                         'amount': new_bid,
-                        'timestamp': datetime.now().isoformat()
-                    })
+                        'timestamp': auction_now().isoformat()
+                    }
+                    auction_data['bids'].append(bot_bid)
                     auction_data['current_bid'] = new_bid
                     
                     # Extend timer by 15 seconds only if time remaining is less than 1 minute
                     current_end_time = datetime.fromisoformat(auction_data['end_time'])
-                    time_remaining = (current_end_time - datetime.now()).total_seconds()
+                    time_remaining = (current_end_time - auction_now()).total_seconds()
                     if time_remaining < 60:
                         new_end_time = current_end_time + timedelta(seconds=15)
                         auction_data['end_time'] = new_end_time.isoformat()
@@ -2561,11 +2298,11 @@ def process_bot_bids(trigger_bid=None):
                     
                     # Save updated auction data
                     save_auction_data(auction_data)
+                    publish_bid(auction_data, bot_bid, extended=time_remaining < 60)
                     
                     # Update global state
-                    global AUCTION_BIDS
-                    AUCTION_BIDS = auction_data['bids']
-                    LAST_BIDDER = bot_name
+                    sync_auction_state(auction_data)
+                    schedule_auction_events()
                     
                     # Small chance for immediate response from another bot
                     if random.random() < 0.3:
@@ -2580,8 +2317,7 @@ def decrease_timer():
         return jsonify({'error': 'Debug mode not enabled'})
     
     with auction_lock:
-        # Load current auction data
-        auction_data = load_auction_data()
+        auction_data = get_auction_data()
         if not auction_data:
             return jsonify({'error': 'No active auction'})
         
@@ -2595,10 +2331,11 @@ def decrease_timer():
         
         # Save updated auction data
         save_auction_data(auction_data)
+        get_auction_events().publish('timer', {'end_time': auction_data['end_time']})
         
         # Update global state
-        global AUCTION_END_TIME
-        AUCTION_END_TIME = new_end_time
+        sync_auction_state(auction_data)
+        schedule_auction_events()
         
         return jsonify({
             'success': True,
@@ -2607,67 +2344,65 @@ def decrease_timer():
 
 # Add this function to handle auction completion
 def complete_auction():
-    """Handle auction completion and award item to winner"""
-    global CURRENT_AUCTION, AUCTION_BIDS, AUCTION_END_TIME
-    
-    if not AUCTION_BIDS:
-        return
-        
-    # Get winning bid
-    winning_bid = AUCTION_BIDS[-1]
-    print(f"\nAuction completed! Winner: {winning_bid['bidder']} with ${winning_bid['amount']:,.2f}")
-    
-    # Load current auction data
-    auction_data = load_auction_data()
-    
-    # Create history entry
-    print("\nCreating history entry from current auction:", CURRENT_AUCTION)
-    history_entry = {
-        "weapon": CURRENT_AUCTION['weapon'],
-        "name": CURRENT_AUCTION['name'],
-        "wear": CURRENT_AUCTION['wear'],
-        "rarity": CURRENT_AUCTION['rarity'],
-        "stattrak": CURRENT_AUCTION.get('stattrak', False),
-        "image": CURRENT_AUCTION.get('image', ''),
-        "case_type": CURRENT_AUCTION.get('case_type', ''),
-        "final_price": winning_bid['amount'],
-        "winner": winning_bid['bidder'],
-        "timestamp": datetime.now().isoformat(),
-        "is_sticker": CURRENT_AUCTION.get('is_sticker', False)  # Add this line
-    }
-    print("Created history entry:", history_entry)
-    
-    # Add to history, keeping only last 10 entries
+    """Handle auction completion, award item to winner and start the next auction"""
+    auction_data = get_auction_data() or {}
     if 'history' not in auction_data:
         auction_data['history'] = []
-    auction_data['history'].insert(0, history_entry)  # Insert at beginning
-    auction_data['history'] = auction_data['history'][:10]  # Keep only last 10
     
-    # If player won
-    if winning_bid['bidder'] == 'You':
-        try:
-            user_data = load_user_data()
-            
-            # Add item to inventory immediately
-            won_item = CURRENT_AUCTION.copy()
-            won_item['price'] = won_item['adjusted_price']
-            won_item['timestamp'] = time.time()
-            won_item['is_case'] = False
-            if won_item.get('image') and won_item['image'].startswith('media/skins/'):
-                won_item['image'] = won_item['image'].split('/')[-1]
-            
-            user_data['inventory'].append(won_item)
-            save_user_data(user_data)
-            
-        except Exception as e:
-            print(f"Error completing auction: {e}")
-            traceback.print_exc()
+    # An auction nobody bid on just makes way for the next one
+    winning_bid = AUCTION_BIDS[-1] if AUCTION_BIDS and CURRENT_AUCTION else None
+    finished_auction = CURRENT_AUCTION
+    if winning_bid:
+        print(f"\nAuction completed! Winner: {winning_bid['bidder']} with ${winning_bid['amount']:,.2f}")
+        
+        # Create history entry
+        print("\nCreating history entry from current auction:", CURRENT_AUCTION)
+        history_entry = {
+            "weapon": CURRENT_AUCTION['weapon'],
+            "name": CURRENT_AUCTION['name'],
+            "wear": CURRENT_AUCTION['wear'],
+            "rarity": CURRENT_AUCTION['rarity'],
+            "stattrak": CURRENT_AUCTION.get('stattrak', False),
+            "image": CURRENT_AUCTION.get('image', ''),
+            "case_type": CURRENT_AUCTION.get('case_type', ''),
+            "final_price": winning_bid['amount'],
+            "winner": winning_bid['bidder'],
+            "winner_owner": owner_token(bid_owner(winning_bid)) if bid_owner(winning_bid) else None,
+            "timestamp": auction_now().isoformat(),
+            "is_sticker": CURRENT_AUCTION.get('is_sticker', False)  # Add this line
+        }
+        print("Created history entry:", history_entry)
+        
+        # Add to history, keeping only last 10 entries
+        auction_data['history'].insert(0, history_entry)  # Insert at beginning
+        auction_data['history'] = auction_data['history'][:10]  # Keep only last 10
+        
+        # If player won
+        winner = bid_owner(winning_bid)
+        if winner:
+            try:
+                user_data = load_user_data(winner)
+                
+                # Add item to inventory immediately
+                won_item = CURRENT_AUCTION.copy()
+                won_item['price'] = won_item['adjusted_price']
+                won_item['timestamp'] = time.time()
+                won_item['is_case'] = False
+                if won_item.get('image') and won_item['image'].startswith('media/skins/'):
+                    won_item['image'] = won_item['image'].split('/')[-1]
+                
+                user_data['inventory'].append(won_item)
+                save_user_data(user_data, winner)
+                
+            except Exception as e:
+                print(f"Error completing auction: {e}")
+                traceback.print_exc()
             
     # Generate and save new auction data
     new_auction = generate_auction_item()
     auction_data.update({
         'item': new_auction,
-        'end_time': (datetime.now() + timedelta(minutes=30)).isoformat(),
+        'end_time': (auction_now() + timedelta(minutes=30)).isoformat(),
         'current_bid': float(new_auction['base_price']) * 0.1,
         'bids': [],
         'bot_budgets': generate_bot_budgets(new_auction['base_price'])
@@ -2675,80 +2410,114 @@ def complete_auction():
     save_auction_data(auction_data)
     
     # Update current auction state
-    CURRENT_AUCTION = new_auction
-    AUCTION_BIDS = []
-    AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
-    global AUCTION_BOT_BUDGETS
-    AUCTION_BOT_BUDGETS = auction_data['bot_budgets']
+    sync_auction_state(auction_data)
+    schedule_auction_events()
+    
+    # Sent to everyone, so clients tell whether they won by winner_owner
+    events = get_auction_events()
+    public_winner = public_bid(winning_bid) if winning_bid else {}
+    events.publish('complete', {
+        'winner': public_winner.get('bidder'),
+        'winner_owner': public_winner.get('owner'),
+        'final_price': winning_bid['amount'] if winning_bid else None,
+        'won_item': finished_auction if bid_owner(winning_bid) else None,
+        'history': [public_history_entry(entry) for entry in auction_data['history']]
+    })
+    events.publish('state', auction_status(auction_data))
+
+def auction_status(auction_data, viewer=None):
+    """The auction as the auction page shows it, to viewer (or to everyone, for broadcasts)"""
+    current_bid = auction_data.get('current_bid', 0)
+    status = {
+        'auction_item': auction_data['item'],
+        'current_bid': current_bid,
+        'end_time': auction_data['end_time'],
+        'bids': [public_bid(bid, viewer) for bid in auction_data.get('bids', [])],
+        'bot_statuses': bot_statuses(auction_data),
+        'history': [public_history_entry(entry, viewer) for entry in auction_data.get('history', [])]
+    }
+    if viewer is not None:
+        # The viewer's own owner token, to recognise their bids and wins in broadcasts
+        status['you'] = owner_token(viewer)
+    return status
+
+def bot_statuses(auction_data):
+    """Active/inactive status for each bot"""
+    current_bid = auction_data.get('current_bid', 0)
+    return [{
+        'name': bot_name,
+        'active': data['budget'] > current_bid,
+        'status': data['status']
+    } for bot_name, data in auction_data.get('bot_budgets', {}).items()]
+
+def publish_bid(auction_data, bid, extended=False):
+    """Tell auction streams about a new bid, and the timer extension it caused"""
+    events = get_auction_events()
+    events.publish('bid', {
+        'bid': public_bid(bid),
+        'current_bid': auction_data['current_bid'],
+        'end_time': auction_data['end_time'],
+        'bot_statuses': bot_statuses(auction_data)
+    })
+    if extended:
+        events.publish('timer', {'end_time': auction_data['end_time'], 'extended_by': 15})
 
 @app.route('/get_auction_status')
 @login_required
 def get_auction_status():
     with auction_lock:
-        # Load auction data from file
-        auction_data = load_auction_data()
+        auction_data = get_auction_data()
         
         # If no auction data exists at all, start new one
         if not auction_data:
             complete_auction()
-            auction_data = load_auction_data()
+            auction_data = get_auction_data()
             if not auction_data:
                 return jsonify({'error': 'Failed to start auction'})
             
-        # Update global state from file
-        global CURRENT_AUCTION, AUCTION_BIDS, AUCTION_END_TIME, AUCTION_BOT_BUDGETS
-        CURRENT_AUCTION = auction_data['item']
-        AUCTION_BIDS = auction_data.get('bids', [])
-        AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
-        AUCTION_BOT_BUDGETS = auction_data.get('bot_budgets', {})
-        
-        current_bid = auction_data.get('current_bid', 0)
-        
-        # Get active/inactive status for each bot
-        bot_statuses = []
-        for bot_name, data in AUCTION_BOT_BUDGETS.items():
-            bot_statuses.append({
-                'name': bot_name,
-                'active': data['budget'] > current_bid,
-                'status': data['status']
-            })
+        # Update global state from the stored data
+        sync_auction_state(auction_data)
         
         # Check if auction has ended
-        auction_ended = datetime.now() >= AUCTION_END_TIME
+        auction_ended = auction_now() >= AUCTION_END_TIME
         winner = None
         won_item = None
         final_price = None
         
-        if auction_ended and AUCTION_BIDS:
-            winner = 'You' if AUCTION_BIDS[-1]['bidder'] == 'You' else AUCTION_BIDS[-1]['bidder']
-            if winner == 'You':
+        if auction_ended:
+            winner = public_bid(AUCTION_BIDS[-1], current_user())['bidder'] if AUCTION_BIDS else None
+            if AUCTION_BIDS and bid_owner(AUCTION_BIDS[-1]) == current_user():
                 won_item = CURRENT_AUCTION
                 final_price = AUCTION_BIDS[-1]['amount']
                 
             # Start new auction if current one ended
             complete_auction()
-            auction_data = load_auction_data()
-            CURRENT_AUCTION = auction_data['item']
-            AUCTION_BIDS = auction_data['bids']
-            AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
-            AUCTION_BOT_BUDGETS = auction_data['bot_budgets']
-            current_bid = auction_data['current_bid']
-        
-        # Include history in response
-        history = auction_data.get('history', [])
+            auction_data = get_auction_data()
         
-        return jsonify({
-            'auction_item': CURRENT_AUCTION,
-            'current_bid': current_bid,
-            'end_time': AUCTION_END_TIME.isoformat(),
-            'bids': AUCTION_BIDS,
-            'bot_statuses': bot_statuses,
+        status = auction_status(auction_data, current_user())
+        status.update({
             'ended': auction_ended,
             'winner': winner,
             'won_item': won_item,
-            'final_price': final_price,
-            'history': history
+            'final_price': final_price
         })
+        return jsonify(status)
+
+@app.route('/api/auction/stream')
+@login_required
+def auction_stream():
+    """Server-sent events: a 'state' snapshot, then 'bid', 'timer', 'complete' and 'state' as they happen"""
+    events = get_auction_events()
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    # Events are published under auction_lock, so nothing can slip in between the snapshot and the subscription
+    with auction_lock:
+        subscriber, missed = events.subscribe(last_event_id)
+        if missed is None:
+            auction_data = get_auction_data()
+            missed = ([format_sse('state', auction_status(auction_data, current_user()), events.last_id)]
+                      if auction_data else [])
+    return Response(events.stream(subscriber, missed), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/close_roulette_bets', methods=['POST'])
 @login_required
@@ -2785,89 +2554,72 @@ def close_roulette_bets():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error closing roulette bets: {e}")
         return jsonify({'error': 'Failed to close bets'})
 
-# Add this function to start a new auction
-def start_new_auction():
-    global CURRENT_AUCTION, AUCTION_END_TIME, AUCTION_BIDS, AUCTION_BOT_BUDGETS, LAST_BIDDER, last_auction_check
-    
-    with auction_lock:
-        CURRENT_AUCTION = generate_auction_item()
-        AUCTION_END_TIME = datetime.now() + timedelta(minutes=30)
-        AUCTION_BIDS = []
-        AUCTION_BOT_BUDGETS = generate_bot_budgets(CURRENT_AUCTION['base_price'])
-        LAST_BIDDER = None
-        last_auction_check = datetime.now()
-        
-        # Save the initial auction data
-        auction_data = {
-            'item': CURRENT_AUCTION,
-            'end_time': AUCTION_END_TIME.isoformat(),
-            'current_bid': 0,
-            'bids': [],
-            'bot_budgets': AUCTION_BOT_BUDGETS
-        }
-        save_auction_data(auction_data)
-    
-    # Start the auction processing thread
-    start_auction_thread()
-    
-    # Schedule the next auction
-    schedule_next_auction()
-
-# Add this function to schedule the next auction
-def schedule_next_auction():
-    global auction_timer
-    
-    # Cancel any existing timer
-    if auction_timer:
-        auction_timer.cancel()
-    
-    # Schedule new auction to start when current one ends
-    time_until_next = (AUCTION_END_TIME - datetime.now()).total_seconds()
-    auction_timer = Timer(time_until_next, start_new_auction)
-    auction_timer.daemon = True  # Make sure the timer doesn't prevent app shutdown
-    auction_timer.start()
-
 # Add this function to clean up on shutdown
 def cleanup_auction():
-    global auction_timer
-    if auction_timer:
-        auction_timer.cancel()
+    auction_scheduler.stop()
+    if is_auction_leader:
+        # Let another worker take over now rather than when the lease runs out
+        shared_state.release_lease('auction', WORKER_ID)
+
+def renew_auction_leadership():
+    """Take or keep the auction lease; only the worker holding it runs the bots and closes auctions"""
+    global is_auction_leader
+    try:
+        leader = shared_state.acquire_lease('auction', WORKER_ID, LEADER_LEASE_SECONDS)
+    except Exception as e:
+        print(f"Error renewing auction lease: {e}")
+        leader = False
+    
+    if leader and not is_auction_leader:
+        if shared_state.multi_process:
+            print(f"Worker {WORKER_ID} is running the auction")
+        with auction_lock:
+            is_auction_leader = True
+            auction_data = get_auction_data()
+            if auction_data:
+                sync_auction_state(auction_data)
+            if not auction_data or auction_now() >= AUCTION_END_TIME:
+                # Settle an auction that ended while nobody was running it (or start the first one)
+                complete_auction()
+            else:
+                schedule_auction_events()
+    elif not leader and is_auction_leader:
+        print(f"Worker {WORKER_ID} lost the auction lease")
+        with auction_lock:
+            is_auction_leader = False
+            auction_scheduler.cancel('auction_close')
+            auction_scheduler.cancel('bot_bids')
+    
+    if shared_state.multi_process:
+        auction_scheduler.schedule_in(LEADER_LEASE_SECONDS / 3, 'auction_lease', renew_auction_leadership)
 
 # Add this initialization code after app = Flask(__name__)
-def init_auction_system():
-    global CURRENT_AUCTION, last_auction_check
-    
-    # Load existing auction data if available
-    auction_data = load_auction_data()
-    
-    if auction_data:
-        # Update global state from existing data
-        global AUCTION_BIDS, AUCTION_END_TIME, AUCTION_BOT_BUDGETS
-        CURRENT_AUCTION = auction_data['item']
-        AUCTION_BIDS = auction_data.get('bids', [])
-        AUCTION_END_TIME = datetime.fromisoformat(auction_data['end_time'])
-        AUCTION_BOT_BUDGETS = auction_data.get('bot_budgets', {})
-        
-        # Check if the existing auction has ended
-        if datetime.now() >= AUCTION_END_TIME:
-            start_new_auction()
-        else:
-            # Existing auction is still valid, just schedule the next one
-            schedule_next_auction()
-            start_auction_thread()
+def init_auction_system(clock=None):
+    """Take the auction lease and start the scheduler. Given a clock (say a scheduler.FakeClock) there
+    is no thread: events only run when auction_scheduler.run_due() is called after advancing it"""
+    if clock is not None:
+        auction_scheduler.stop()
+        auction_scheduler.clock = clock
+    renew_auction_leadership()
+    if clock is None:
+        auction_scheduler.start()
     else:
-        # No existing auction, start a new one
-        start_new_auction()
+        with auction_lock:
+            # Already the leader, so renewing didn't reschedule anything against the new clock
+            schedule_auction_events()
 
 # Register the cleanup function
 atexit.register(cleanup_auction)
 
-# Initialize auction system when app starts
+# Load case/sticker data into memory and initialize auction system when app starts
 with app.app_context():
+    load_catalog()
     init_auction_system()
 
 @app.route('/api/data/case_contents/all')
@@ -2896,56 +2648,18 @@ def batch_click():
         if total_clicks <= 0:
             return jsonify({'error': 'No clicks provided'}), 400
 
-        # Load user data from file
-        user_data = load_user_data()
-        current_balance = float(user_data.get('balance', 0))
-        
-        # Get base click value from upgrades
-        upgrades = user_data.get('upgrades', {})
-        click_value_level = upgrades.get('click_value', 1)
-        base_click_value = 0.01 * (1.5 ** (click_value_level - 1))
-        
-        # Get current multiplier from session or default to 1
-        current_multiplier = session.get('multiplier', 1.0)
-        
-        # Calculate values for different click types
-        normal_value = base_click_value * current_multiplier * normal_clicks
-        critical_value = base_click_value * current_multiplier * 4 * critical_clicks  # 4x for critical hits
-        auto_normal_value = base_click_value * auto_normal_clicks  # Auto clicks don't use multiplier
-        auto_critical_value = base_click_value * 4 * auto_critical_clicks  # 4x for critical auto hits
-
-        # Calculate total value
-        total_value = round(normal_value + critical_value + auto_normal_value + auto_critical_value, 3)
-
-        # Update balance
-        new_balance = round(current_balance + total_value, 3)
-        
-        # Update user data
-        user_data['balance'] = new_balance
-        
-        # Update stats
-        if 'stats' not in user_data:
-            user_data['stats'] = {}
-        if 'total_clicks' not in user_data['stats']:
-            user_data['stats']['total_clicks'] = 0
-        if 'total_earnings' not in user_data['stats']:
-            user_data['stats']['total_earnings'] = 0
-            
-        user_data['stats']['total_clicks'] += total_clicks
-        user_data['stats']['total_earnings'] = round(user_data['stats'].get('total_earnings', 0) + total_value, 3)
-        
-        # Save to file
-        save_user_data(user_data)
-        
-        # Only store the multiplier in session if it's not 1.0
-        if current_multiplier != 1.0:
-            session['multiplier'] = current_multiplier
-        else:
-            session.pop('multiplier', None)
+        # Clicks beyond the auto clicker rate / a human clicking rate are dropped, and the
+        # multiplier is capped at what the combo upgrades allow
+        result = get_click_accumulator().add(normal_clicks, critical_clicks, auto_normal_clicks,
+                                             auto_critical_clicks, multiplier=data.get('multiplier', 1.0))
+        balance = get_user_fields('balance')['balance'] + result['pending_value']
 
         return jsonify({
-            'balance': new_balance,
-            'value_earned': total_value
+            'balance': round(balance, 3),
+            'value_earned': round(result['value'], 3),
+            'accepted_clicks': result['accepted_clicks'],
+            'multiplier': result['multiplier'],
+            'achievement': result['achievement']
         })
     except Exception as e:
         print('Error in batch_click:', str(e))
@@ -2985,17 +2699,7 @@ def batch_case_click():
             min_price, max_price = price_ranges.get(case_quality, (0, 2))
             
             # Get available cases within price range
-            available_cases = []
-            for case_type, file_name in CASE_FILE_MAPPING.items():
-                try:
-                    with open(f'cases/{file_name}.json', 'r') as f:
-                        case_data = json.load(f)
-                        price = float(case_data.get('price', 0))
-                        if min_price <= price <= max_price:
-                            available_cases.append((case_type, case_data))
-                except Exception as e:
-                    print(f"Error checking case price for {case_type}: {e}")
-                    continue
+            available_cases = get_catalog().cases_in_price_range(min_price, max_price)
             
             if available_cases:
                 earned_case, case_data = random.choice(available_cases)
@@ -3040,6 +2744,8 @@ def batch_case_click():
             'progress_per_click': progress_per_click
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in batch case click: {e}")
         return jsonify({'error': str(e)}), 500
@@ -3090,6 +2796,8 @@ def start_blackjack():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error starting blackjack: {e}")
         traceback.print_exc()  # Add traceback for debugging
@@ -3118,6 +2826,8 @@ def blackjack_hit():
             'state': game_states['display_state']  # Send display state to frontend
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in blackjack hit: {e}")
         traceback.print_exc()
@@ -3146,6 +2856,8 @@ def blackjack_stand():
             'state': game_states['display_state']  # Send display state to frontend
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in blackjack stand: {e}")
         traceback.print_exc()
@@ -3186,6 +2898,8 @@ def blackjack_double():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in blackjack double: {e}")
         traceback.print_exc()
@@ -3223,6 +2937,8 @@ def blackjack_split():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in blackjack split: {e}")
         traceback.print_exc()
@@ -3262,6 +2978,8 @@ def blackjack_insurance():
             'balance': user_data['balance']
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in blackjack insurance: {e}")
         traceback.print_exc()
@@ -3351,6 +3069,8 @@ def buy_sticker_capsule():
             'balance': user_data['balance']
         })
 
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error buying sticker capsule: {e}")
         return jsonify({'error': 'Failed to purchase sticker capsule'})
@@ -3439,6 +3159,8 @@ def open_capsule(capsule_type):
             'levelUp': current_rank > int(user_data.get('rank', 0))
         })
 
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in open_capsule: {e}")
         traceback.print_exc()
@@ -3457,7 +3179,7 @@ def reset_trades():
             'trades': new_trades,
             'completed_trades': []
         }
-        save_daily_trades(trades_data)
+        save_daily_trades(trades_data, current_user())
         
         return jsonify({
             'success': True,
@@ -3475,18 +3197,20 @@ def reset_trades():
 def toggle_favorite():
     try:
         data = request.get_json()
-        if not data or 'timestamp' not in data:
+        if not data or ('timestamp' not in data and not data.get('id')):
             return jsonify({'error': 'Invalid request data'}), 400
 
-        timestamp = data['timestamp']
+        timestamp = data.get('timestamp')
         
         # Load user inventory
-        with open('data/user_inventory.json', 'r') as f:
-            user_data = json.load(f)
+        user_data = load_user_data()
         
-        # Find the item with matching timestamp and other properties
+        # Find the item by id, or else by matching timestamp and other properties
         target_item = None
-        for item in user_data['inventory']:
+        position = find_inventory_item(user_data['inventory'], data.get('id'))
+        if position is not None:
+            target_item = user_data['inventory'][position]
+        for item in user_data['inventory'] if target_item is None else ():
             if item.get('timestamp') == timestamp:
                 # For weapon skins, match weapon, name, wear, and stattrak
                 if (not item.get('is_sticker') and not item.get('is_case') and 
@@ -3517,17 +3241,18 @@ def toggle_favorite():
                 target_item['favorite'] = True
 
             # Save updated inventory
-            with open('data/user_inventory.json', 'w') as f:
-                json.dump(user_data, f, indent=2)
+            save_user_data(user_data)
             
-            # Return the updated inventory data
+            # Only the toggled item changed, so don't send the whole inventory back
             return jsonify({
                 'success': True,
-                'inventory': user_data['inventory']
+                'item': target_item
             })
         else:
             return jsonify({'error': 'Item not found'}), 404
             
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in toggle_favorite: {str(e)}")
         return jsonify({'error': 'Internal server error'}), 500
@@ -3540,7 +3265,7 @@ def save_loadout():
         print("Received loadout data:", loadout_data)
         
         # Validate loadout data against inventory
-        inventory = get_user_inventory()
+        inventory_index = get_inventory_index()
         validated_loadout = {
             'CT': {},
             'T': {}
@@ -3562,16 +3287,7 @@ def save_loadout():
                         continue
                         
                     # Find matching item in inventory to get all fields
-                    matching_item = None
-                    for inv_item in inventory:
-                        if not inv_item.get('is_case') and not inv_item.get('is_sticker'):
-                            if (inv_item.get('name') == item['name'] and
-                                inv_item.get('wear') == item['wear'] and
-                                inv_item.get('stattrak', False) == item.get('stattrak', False) and
-                                inv_item.get('weapon') == item['weapon']):
-                                matching_item = inv_item
-                                print("Found matching item!")
-                                break
+                    matching_item = inventory_index.find(item)
                     
                     if matching_item:
                         print(f"Found matching item in inventory:", matching_item)
@@ -3583,9 +3299,7 @@ def save_loadout():
                         print(f"No matching item found in inventory for {item_id}")
 
         print("Final validated loadout:", validated_loadout)
-        # Save directly to user_loadouts.json
-        with open('data/user_loadouts.json', 'w') as f:
-            json.dump(validated_loadout, f, indent=2)
+        get_storage().save_document('loadouts', validated_loadout, current_user())
 
         return jsonify({'success': True, 'loadout': validated_loadout})
     except Exception as e:
@@ -3597,18 +3311,18 @@ def save_loadout():
 @login_required
 def load_loadout():
     try:
-        # Load directly from user_loadouts.json
         try:
-            with open('data/user_loadouts.json', 'r') as f:
-                user_loadout = json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
+            user_loadout = get_storage().load_document('loadouts', current_user())
+        except Exception:
+            user_loadout = None
+        if user_loadout is None:
             user_loadout = {
                 'CT': {},
                 'T': {}
             }
 
         # Validate against current inventory
-        inventory = get_user_inventory()
+        inventory_index = get_inventory_index()
         validated_loadout = {
             'CT': {},
             'T': {}
@@ -3618,14 +3332,7 @@ def load_loadout():
             for slot, item in user_loadout.get(team, {}).items():
                 if item:
                     # Find matching item in inventory to get all fields
-                    matching_item = next(
-                        (inv_item for inv_item in inventory
-                        if inv_item['name'] == item['name'] and
-                        inv_item['wear'] == item['wear'] and
-                        inv_item['stattrak'] == item['stattrak'] and
-                        inv_item['weapon'] == item['weapon']),  # Add weapon check
-                        None
-                    )
+                    matching_item = inventory_index.find(item)
                     if matching_item:
                         # Copy all fields from inventory item
                         validated_loadout[team][slot] = matching_item.copy()  # Make a copy to prevent reference issues
@@ -3635,20 +3342,22 @@ def load_loadout():
         print(f"Error in load_loadout: {str(e)}")
         return jsonify({'error': 'Failed to load loadout'}), 500
 
-def get_user_inventory():
-    try:
-        with open('data/user_inventory.json', 'r') as f:
-            user_data = json.load(f)
-            return user_data.get('inventory', [])
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
-
 @app.route('/loadout')
 @login_required
 def loadout():
     # For Vue routes, we need to serve the main Vue app
     return serve_vue_app('')
 
+def get_mines_game(user):
+    data = mines_sessions.get(user)
+    return MinesGame.from_dict(data) if data else None
+
+def store_mines_game(user, game):
+    mines_sessions.put(user, game.to_dict())
+
+def end_mines_game(user):
+    mines_sessions.delete(user)
+
 @app.route('/mines')
 @login_required
 def mines():
@@ -3659,10 +3368,6 @@ def mines():
 @login_required
 def start_mines():
     try:
-        # Ensure user_id exists in session
-        if 'user_id' not in session:
-            session['user_id'] = str(uuid.uuid4())
-
         data = request.get_json()
         grid_size = int(data.get('grid_size', 5))
         num_mines = int(data.get('num_mines', 3))
@@ -3684,7 +3389,8 @@ def start_mines():
         
         # Create new game
         game = MinesGame(grid_size, num_mines, bet_amount)
-        active_mines_games[session['user_id']] = game
+        with mines_lock:
+            store_mines_game(current_user(), game)
         
         return jsonify({
             "success": True,
@@ -3696,41 +3402,68 @@ def start_mines():
             "potential_win": bet_amount
         })
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         print(f"Error in start_mines: {str(e)}")  # Add debug logging
         return jsonify({"error": str(e)}), 400
 
+@app.route('/api/mines/multipliers')
+def get_mines_multipliers():
+    # Payout table for a board: multiplier and exact RTP after each number of safe reveals
+    try:
+        grid_size = int(request.args.get('grid_size', 5))
+        num_mines = int(request.args.get('num_mines', 3))
+        valid, message = MinesGame.validate_params(grid_size, num_mines, 1)
+        if not valid:
+            return jsonify({"error": message}), 400
+        
+        multipliers = multiplier_table(grid_size, num_mines)
+        return jsonify({
+            "grid_size": grid_size,
+            "num_mines": num_mines,
+            "multipliers": list(multipliers),
+            "rtp": [round(expected_rtp(grid_size, num_mines, k), 6) for k in range(1, len(multipliers) + 1)]
+        })
+    except Exception as e:
+        return jsonify({"error": str(e)}), 400
+
 @app.route('/api/mines/reveal', methods=['POST'])
 @login_required
 def reveal_mines_tile():
     try:
-        game = active_mines_games.get(session['user_id'])
-        if not game:
-            return jsonify({"error": "No active game"}), 400
-            
         data = request.get_json()
         x = int(data.get('x'))
         y = int(data.get('y'))
         
-        result = game.reveal(x, y)
-        
-        if "error" in result:
-            return jsonify(result), 400
+        with mines_lock:
+            game = get_mines_game(current_user())
+            if not game:
+                return jsonify({"error": "No active game"}), 400
             
-        if result["status"] in ["game_over", "win"]:
-            if result["status"] == "win":
-                # Award winnings
-                user_data = load_user_data()
-                win_amount = game.bet_amount * result["multiplier"]
-                user_data['balance'] += win_amount
-                save_user_data(user_data)
-                result["balance"] = user_data['balance']
+            result = game.reveal(x, y)
             
-            # Clear active game
-            del active_mines_games[session['user_id']]
+            if "error" in result:
+                return jsonify(result), 400
+            
+            if result["status"] in ["game_over", "win"]:
+                if result["status"] == "win":
+                    # Award winnings
+                    user_data = load_user_data()
+                    win_amount = game.bet_amount * result["multiplier"]
+                    user_data['balance'] += win_amount
+                    save_user_data(user_data)
+                    result["balance"] = user_data['balance']
+                
+                # Clear active game
+                end_mines_game(current_user())
+            else:
+                store_mines_game(current_user(), game)
             
         return jsonify(result)
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -3738,26 +3471,29 @@ def reveal_mines_tile():
 @login_required
 def cashout_mines():
     try:
-        game = active_mines_games.get(session['user_id'])
-        if not game:
-            return jsonify({"error": "No active game"}), 400
+        with mines_lock:
+            game = get_mines_game(current_user())
+            if not game:
+                return jsonify({"error": "No active game"}), 400
             
-        result = game.cash_out()
-        
-        if "error" in result:
-            return jsonify(result), 400
+            result = game.cash_out()
             
-        # Award winnings
-        user_data = load_user_data()
-        user_data['balance'] += result["win_amount"]
-        save_user_data(user_data)
-        
-        # Clear active game
-        del active_mines_games[session['user_id']]
+            if "error" in result:
+                return jsonify(result), 400
+            
+            # Award winnings
+            user_data = load_user_data()
+            user_data['balance'] += result["win_amount"]
+            save_user_data(user_data)
+            
+            # Clear active game
+            end_mines_game(current_user())
         
         result["balance"] = user_data['balance']
         return jsonify(result)
         
+    except UserDataConflict:
+        raise
     except Exception as e:
         return jsonify({"error": str(e)}), 400
 
@@ -3798,21 +3534,20 @@ def open_souvenir_case(case_type):
     
     # Load the appropriate case
     try:
-        with open(f'souvenir/{case_type}.json', 'r') as f:
-            case_data = json.load(f)
-            case_price = float(case_data.get('price', 0))
-            
-            # Add exp based on case price (for all cases opened)
-            new_exp = current_exp + (case_price * count)
-            
-            # Check for rank up
-            while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
-                new_exp -= RANK_EXP[current_rank]
-                current_rank += 1
-            
-            # Update user data with new exp and rank
-            user_data['exp'] = new_exp
-            user_data['rank'] = current_rank
+        case_data = get_catalog().get_case(case_type)
+        case_price = case_data['price']
+        
+        # Add exp based on case price (for all cases opened)
+        new_exp = current_exp + (case_price * count)
+        
+        # Check for rank up
+        while current_rank < len(RANK_EXP) and new_exp >= RANK_EXP[current_rank]:
+            new_exp -= RANK_EXP[current_rank]
+            current_rank += 1
+        
+        # Update user data with new exp and rank
+        user_data['exp'] = new_exp
+        user_data['rank'] = current_rank
             
     except Exception as e:
         print(f"Error getting souvenir case price: {e}")
@@ -3822,8 +3557,8 @@ def open_souvenir_case(case_type):
     items = []
     for _ in range(count):
         # Randomly select a rarity based on probabilities
-        rarities = ['purple', 'blue', 'light_blue']
-        weights = [5, 20, 75]  # Probabilities in percentage
+        rarities = list(SOUVENIR_PACKAGE_RARITY_WEIGHTS)
+        weights = list(SOUVENIR_PACKAGE_RARITY_WEIGHTS.values())
         rarity = random.choices(rarities, weights=weights)[0]
         
         # Get all skins of selected rarity
@@ -3836,13 +3571,13 @@ def open_souvenir_case(case_type):
         
         # Generate float value and determine wear
         float_value = generate_float_for_wear(random.choice(skin['valid_wears']))
-        wear = next((w for w in skin['valid_wears'] if float_value <= {'FN': 0.07, 'MW': 0.15, 'FT': 0.37, 'WW': 0.44, 'BS': 1.0}[w]), 'BS')
+        wear = next((w for w in skin['valid_wears'] if float_value <= SOUVENIR_WEAR_THRESHOLDS[w]), 'BS')
         
         # Get souvenir price
         price = skin['prices'].get(f'Souvenir_{wear}', 0)
         
         # Determine if item is souvenir (10% chance)
-        is_souvenir = random.random() < 0.1  # 10% chance
+        is_souvenir = random.random() < SOUVENIR_CHANCE / 100
         
         # Get appropriate price based on souvenir status
         if is_souvenir:
@@ -3874,31 +3609,13 @@ def open_souvenir_case(case_type):
     user_data['inventory'] = inventory
     save_user_data(user_data)
     
-    # Store initial achievements state
-    initial_achievements = set(user_data['achievements']['completed'])
-    
     # Update total cases opened stat
     user_data['stats']['total_cases_opened'] += count
     
-    # Update case achievements
-    update_case_achievements(user_data)
-    
-    # Check if any new achievements were completed
-    new_achievements = set(user_data['achievements']['completed']) - initial_achievements
-    completed_achievement = None
-    if new_achievements:
-        achievement_id = list(new_achievements)[0]  # Get the first new achievement
-        level = int(achievement_id.split('_')[1])
-        completed_achievement = {
-            'title': {
-                1: 'Case Opener',
-                2: 'Case Enthusiast',
-                3: 'Case Veteran',
-                4: 'Case Master',
-                5: 'Case God'
-            }.get(level, 'Unknown'),
-            'level': level
-        }
+    # Update case achievements and show the first one completed
+    new_achievements = update_case_achievements(user_data)
+    completed_achievement = new_achievements[0] if new_achievements else None
+    save_user_data(user_data)
     
     return jsonify({
         'items': items,
@@ -3924,9 +3641,7 @@ def buy_souvenir_case():
     
     # Get case price
     try:
-        with open(f'souvenir/{case_type}.json', 'r') as f:
-            case_data = json.load(f)
-            case_price = float(case_data.get('price', 0))
+        case_price = get_catalog().get_case(case_type)['price']
     except:
         return jsonify({'error': 'Failed to get souvenir case price'})
     
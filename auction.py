@@ -1,114 +1,58 @@
 from datetime import datetime
 import json
-from pathlib import Path
 from threading import Timer
+import shutil
 import traceback
 from cases_prices_and_floats import adjust_price_by_float
-from config import AUCTION_FILE, CASE_FILE_MAPPING, CASE_SKINS_FOLDER_NAMES, CASE_TYPES, STICKER_CAPSULE_FILE_MAPPING, SOUVENIR_CASE_FILE_MAPPING
+from catalog import get_catalog
+from config import AUCTION_FILE
+from shared_state import get_shared_state
+from storage import get_storage
 import random
-import os
-import time
-import shutil
-import msvcrt
+import copy
+
+# The last auction data loaded or saved, so status reads don't go to disk, and the shared
+# version it was at (other worker processes bump it when they save)
+_auction_cache = None
+_auction_version = None
+
+
+def get_auction_data():
+    """A copy of the current auction data; storage is only read the first time, or after another worker saved"""
+    if _auction_cache is None or _auction_version != get_shared_state().get('auction_version'):
+        load_auction_data()
+    return copy.deepcopy(_auction_cache)
 
 
 def save_auction_data(auction_data):
-    """Save auction data to JSON file using atomic write to prevent corruption"""
-    temp_file = AUCTION_FILE + '.tmp'
-    backup_file = AUCTION_FILE + '.bak'
-    max_retries = 3
-    retry_delay = 0.5  # seconds
-    
-    for attempt in range(max_retries):
-        try:
-            # First, create a backup of current file if it exists
-            if os.path.exists(AUCTION_FILE):
-                try:
-                    shutil.copy2(AUCTION_FILE, backup_file)
-                except Exception as e:
-                    print(f"Warning: Failed to create backup: {e}")
-            
-            # Clean up any existing temp file first
-            if os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except Exception:
-                    pass
-                    
-            # Write to temporary file with proper locking
-            with open(temp_file, 'w') as f:
-                # Try to get an exclusive lock using Windows file locking
-                try:
-                    handle = msvcrt.get_osfhandle(f.fileno())
-                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
-                    
-                    # Write data and ensure it's flushed to disk
-                    json.dump(auction_data, f, indent=2, default=str)
-                    f.flush()
-                    os.fsync(f.fileno())
-                    
-                finally:
-                    # Always release the lock
-                    try:
-                        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
-                    except:
-                        pass
-            
-            # Verify the temp file is valid JSON
-            with open(temp_file, 'r') as f:
-                json.load(f)  # This will raise an error if JSON is invalid
-            
-            # Now perform the atomic rename
-            if os.path.exists(AUCTION_FILE):
-                os.remove(AUCTION_FILE)  # Windows requires this for replace
-            os.rename(temp_file, AUCTION_FILE)
-            
-            # Success - clean up backup
-            if os.path.exists(backup_file):
-                try:
-                    os.remove(backup_file)
-                except Exception:
-                    pass
-                    
-            return  # Success - exit function
-                
-        except Exception as e:
-            print(f"Error saving auction data (attempt {attempt + 1}/{max_retries}): {e}")
-            if attempt == max_retries - 1:  # Last attempt
-                # Restore from backup if possible
-                if os.path.exists(backup_file):
-                    try:
-                        if os.path.exists(AUCTION_FILE):
-                            os.remove(AUCTION_FILE)
-                        shutil.copy2(backup_file, AUCTION_FILE)
-                        print("Restored auction data from backup")
-                    except Exception as restore_err:
-                        print(f"Failed to restore from backup: {restore_err}")
-            else:
-                time.sleep(retry_delay)  # Wait before retry
-                
-    # If we get here, all retries failed
-    # Final cleanup attempt
-    for file in [temp_file, backup_file]:
-        if os.path.exists(file):
-            try:
-                os.remove(file)
-            except Exception:
-                pass  # Already logged any important errors above
+    """Save auction data through the storage backend; the JSON file is replaced atomically"""
+    global _auction_cache, _auction_version
+    _auction_cache = copy.deepcopy(auction_data)
+    try:
+        get_storage().save_document('auction', auction_data)
+    except Exception as e:
+        # The in-memory copy stays current, so the next save writes everything anyway
+        print(f"Error saving auction data: {e}")
+    shared = get_shared_state()
+    _auction_version = (shared.get('auction_version') or 0) + 1
+    shared.set('auction_version', _auction_version)
 
 def load_auction_data():
-    """Load auction data from JSON file"""
+    """Load auction data from storage"""
+    global _auction_cache, _auction_version
+    # Read the version first, so a save that lands while we read makes the next get load again
+    _auction_version = get_shared_state().get('auction_version')
     try:
-        if not Path(AUCTION_FILE).exists():
+        auction_data = get_storage().load_document('auction')
+        if auction_data is None:
             return None
-        with open(AUCTION_FILE, 'r') as f:
-            return json.load(f)
+        _auction_cache = copy.deepcopy(auction_data)
+        return auction_data
     except json.JSONDecodeError as e:
         print(f"Error decoding auction data: {e}")
         # Backup corrupted file for debugging
         backup_file = AUCTION_FILE + '.corrupted'
         try:
-            import shutil
             shutil.copy2(AUCTION_FILE, backup_file)
             print(f"Corrupted file backed up to: {backup_file}")
         except Exception as backup_err:
@@ -174,40 +118,28 @@ def generate_auction_item():
         
         print("\nGenerating auction item...")
         
+        catalog = get_catalog()
+        
         # First load valuable stickers
-        for capsule_type, file_name in STICKER_CAPSULE_FILE_MAPPING.items():
-            try:
-                with open(f'stickers/{file_name}.json', 'r') as f:
-                    capsule_data = json.load(f)
-                    
-                    # Look through all sticker rarities
-                    for rarity, stickers in capsule_data['stickers'].items():
-                        for sticker in stickers:
-                            try:
-                                price = float(sticker['price'])
-                                # Only include very valuable stickers (over $800)
-                                if price >= 800:
-                                    print(f"Found valuable sticker: {sticker['name']} - ${price}")
-                                    sticker_item = {
-                                        'name': sticker['name'],
-                                        'image': sticker['image'],
-                                        'rarity': rarity.upper(),
-                                        'case_type': capsule_type,
-                                        'base_price': price,
-                                        'adjusted_price': price,  # Stickers don't have float adjustment
-                                        'is_sticker': True,
-                                        'stattrak': False,  # Stickers don't have StatTrak
-                                        'wear': None,  # Stickers don't have wear
-                                        'float_value': None,  # Stickers don't have float
-                                        'weapon': None  # Stickers don't have weapon type
-                                    }
-                                    sticker_items.append(sticker_item)
-                            except (ValueError, KeyError) as e:
-                                print(f"Error processing sticker price: {e}")
-                                continue
-            except Exception as e:
-                print(f"Error loading sticker capsule {file_name}: {e}")
-                continue
+        for sticker in catalog.iter_stickers():
+            price = sticker['price']
+            # Only include very valuable stickers (over $800)
+            if price >= 800:
+                print(f"Found valuable sticker: {sticker['name']} - ${price}")
+                sticker_item = {
+                    'name': sticker['name'],
+                    'image': sticker['image'],
+                    'rarity': sticker['rarity'],
+                    'case_type': sticker['case_type'],
+                    'base_price': price,
+                    'adjusted_price': price,  # Stickers don't have float adjustment
+                    'is_sticker': True,
+                    'stattrak': False,  # Stickers don't have StatTrak
+                    'wear': None,  # Stickers don't have wear
+                    'float_value': None,  # Stickers don't have float
+                    'weapon': None  # Stickers don't have weapon type
+                }
+                sticker_items.append(sticker_item)
         
         print(f"\nFound {len(sticker_items)} valuable stickers")
         
@@ -221,185 +153,168 @@ def generate_auction_item():
         }
         
         # Then load weapon/knife/glove skins
-        for case_type in CASE_TYPES:
-            file_name = CASE_FILE_MAPPING.get(case_type)
-            folder_name = CASE_SKINS_FOLDER_NAMES.get(case_type)
-            if not file_name:
-                continue
-                
-            with open(f'cases/{file_name}.json', 'r') as f:
-                case_data = json.load(f)
-                
-                # Look through all skins
-                for grade, skins in case_data['skins'].items():
-                    for skin in skins:
-                        # Just use the image filename without the path
-                        image_path = skin['image']
+        for skin in catalog.iter_skins():
+            grade = skin['grade']
+            case_type = skin['case_type']
+            # Just use the image filename without the path
+            image_path = skin['image']
+            
+            # Check prices for valuable items
+            for wear, price in skin['prices'].items():
+                if wear != 'NO' and not wear.startswith('ST_'):
+                    try:
+                        price_value = float(price)
                         
-                        # Check prices for valuable items
-                        for wear, price in skin['prices'].items():
-                            if wear != 'NO' and not wear.startswith('ST_'):
-                                try:
-                                    price_value = float(price)
-                                    
-                                    # Categorize items by their rarity grade
-                                    is_knife = grade.upper() in ['GOLD', 'GOLD_KNIFE'] and not ('Gloves' in skin['weapon'] or 'Hand Wraps' in skin['weapon'])
-                                    is_glove = 'Gloves' in skin['weapon'] or 'Hand Wraps' in skin['weapon']
-                                    
-                                    # Handle souvenir items
-                                    is_souvenir = wear.startswith('Souvenir_')
-                                    base_wear = wear[9:] if is_souvenir else wear  # Strip 'Souvenir_' prefix
+                        # Categorize items by their rarity grade
+                        is_knife = grade.upper() in ['GOLD', 'GOLD_KNIFE'] and not ('Gloves' in skin['weapon'] or 'Hand Wraps' in skin['weapon'])
+                        is_glove = 'Gloves' in skin['weapon'] or 'Hand Wraps' in skin['weapon']
+                        
+                        # Handle souvenir items
+                        is_souvenir = wear.startswith('Souvenir_')
+                        base_wear = wear[9:] if is_souvenir else wear  # Strip 'Souvenir_' prefix
+                        
+                        # Log souvenir items if they meet value threshold
+                        if is_souvenir and price_value >= 150:
+                            print(f"Found valuable souvenir: {skin['weapon']} | {skin['name']} ({wear}) - ${price_value}")
+                        
+                        # Adjust thresholds to better balance with stickers
+                        if is_knife:
+                            # Knives: Only FN/ST FN over $2500 (increased from $2000)
+                            if base_wear != 'FN':
+                                continue
+                            threshold = 2500  # Further increased threshold to reduce knife count
+                        elif is_glove:
+                            # Gloves: Include FN/MW/FT over $1000
+                            if base_wear not in ['FN', 'MW', 'FT']:  # Added FT for gloves
+                                continue
+                            threshold = 1000  # Increased threshold but allowing more wear conditions
+                        else:
+                            # For souvenirs, we'll be more lenient with wear conditions
+                            if not is_souvenir and base_wear != 'FN':
+                                continue
+                            threshold = 100  # Further reduced threshold to include more weapons
+                        
+                        if price_value >= threshold:                                        
+                            # Generate float based on wear range
+                            wear_range = wear_ranges.get(wear)
+                            if not wear_range:
+                                continue
+                            
+                            # Generate a very good float for the wear range
+                            min_float, max_float = wear_range
+                            float_range = max_float - min_float
+                            max_special = min_float + (float_range * 0.2)
+                            float_value = random.uniform(min_float, max_special)
+                            
+                            # Adjust price based on special float
+                            adjusted_price = adjust_price_by_float(
+                                price_value,
+                                wear,
+                                float_value
+                            )
+                            
+                            item_data = {
+                                'weapon': skin['weapon'],
+                                'name': skin['name'],
+                                'wear': wear,
+                                'float_value': float_value,
+                                'rarity': grade.upper(),
+                                'case_type': case_type,
+                                'base_price': price_value,
+                                'adjusted_price': adjusted_price,
+                                'stattrak': False,
+                                'image': image_path,
+                                'is_sticker': False
+                            }
+                            
+                            # Categorize the item based on rarity grade
+                            if is_knife:
+                                knife_skins.append(item_data)
+                            elif is_glove:
+                                glove_skins.append(item_data)
+                            else:
+                                weapon_skins.append(item_data)
+                            
+                            # Also add StatTrak version if available (only for weapons and knives)
+                            st_key = f'ST_{wear}'
+                            if st_key in skin['prices'] and not is_glove:
+                                st_price = float(skin['prices'][st_key])
+                                if st_price >= threshold:  # Use same threshold for StatTrak
+                                    print(f"Found StatTrak version: {skin['weapon']} | {skin['name']} ({wear}) - ${st_price}")
+                                    # Calculate StatTrak adjusted price
+                                    st_adjusted_price = adjust_price_by_float(
+                                        st_price,
+                                        wear,
+                                        float_value
+                                    )
                                     
-                                    # Log souvenir items if they meet value threshold
-                                    if is_souvenir and price_value >= 150:
-                                        print(f"Found valuable souvenir: {skin['weapon']} | {skin['name']} ({wear}) - ${price_value}")
+                                    st_item_data = {
+                                        'weapon': skin['weapon'],
+                                        'name': skin['name'],
+                                        'wear': wear,
+                                        'float_value': float_value,
+                                        'rarity': grade.upper(),
+                                        'case_type': case_type,
+                                        'base_price': st_price,
+                                        'adjusted_price': st_adjusted_price,
+                                        'stattrak': True,
+                                        'image': image_path,
+                                        'is_sticker': False
+                                    }
                                     
-                                    # Adjust thresholds to better balance with stickers
                                     if is_knife:
-                                        # Knives: Only FN/ST FN over $2500 (increased from $2000)
-                                        if base_wear != 'FN':
-                                            continue
-                                        threshold = 2500  # Further increased threshold to reduce knife count
-                                    elif is_glove:
-                                        # Gloves: Include FN/MW/FT over $1000
-                                        if base_wear not in ['FN', 'MW', 'FT']:  # Added FT for gloves
-                                            continue
-                                        threshold = 1000  # Increased threshold but allowing more wear conditions
+                                        knife_skins.append(st_item_data)
                                     else:
-                                        # For souvenirs, we'll be more lenient with wear conditions
-                                        if not is_souvenir and base_wear != 'FN':
-                                            continue
-                                        threshold = 100  # Further reduced threshold to include more weapons
-                                    
-                                    if price_value >= threshold:                                        
-                                        # Generate float based on wear range
-                                        wear_range = wear_ranges.get(wear)
-                                        if not wear_range:
-                                            continue
-                                        
-                                        # Generate a very good float for the wear range
-                                        min_float, max_float = wear_range
-                                        float_range = max_float - min_float
-                                        max_special = min_float + (float_range * 0.2)
-                                        float_value = random.uniform(min_float, max_special)
-                                        
-                                        # Adjust price based on special float
-                                        adjusted_price = adjust_price_by_float(
-                                            price_value,
-                                            wear,
-                                            float_value
-                                        )
-                                        
-                                        item_data = {
-                                            'weapon': skin['weapon'],
-                                            'name': skin['name'],
-                                            'wear': wear,
-                                            'float_value': float_value,
-                                            'rarity': grade.upper(),
-                                            'case_type': case_type,
-                                            'base_price': price_value,
-                                            'adjusted_price': adjusted_price,
-                                            'stattrak': False,
-                                            'image': image_path,
-                                            'is_sticker': False
-                                        }
-                                        
-                                        # Categorize the item based on rarity grade
-                                        if is_knife:
-                                            knife_skins.append(item_data)
-                                        elif is_glove:
-                                            glove_skins.append(item_data)
-                                        else:
-                                            weapon_skins.append(item_data)
-                                        
-                                        # Also add StatTrak version if available (only for weapons and knives)
-                                        st_key = f'ST_{wear}'
-                                        if st_key in skin['prices'] and not is_glove:
-                                            st_price = float(skin['prices'][st_key])
-                                            if st_price >= threshold:  # Use same threshold for StatTrak
-                                                print(f"Found StatTrak version: {skin['weapon']} | {skin['name']} ({wear}) - ${st_price}")
-                                                # Calculate StatTrak adjusted price
-                                                st_adjusted_price = adjust_price_by_float(
-                                                    st_price,
-                                                    wear,
-                                                    float_value
-                                                )
-                                                
-                                                st_item_data = {
-                                                    'weapon': skin['weapon'],
-                                                    'name': skin['name'],
-                                                    'wear': wear,
-                                                    'float_value': float_value,
-                                                    'rarity': grade.upper(),
-                                                    'case_type': case_type,
-                                                    'base_price': st_price,
-                                                    'adjusted_price': st_adjusted_price,
-                                                    'stattrak': True,
-                                                    'image': image_path,
-                                                    'is_sticker': False
-                                                }
-                                                
-                                                if is_knife:
-                                                    knife_skins.append(st_item_data)
-                                                else:
-                                                    weapon_skins.append(st_item_data)
-                                except Exception as e:
-                                    print(f"Error processing price: {e}")
-                                    continue
+                                        weapon_skins.append(st_item_data)
+                    except Exception as e:
+                        print(f"Error processing price: {e}")
+                        continue
         
         # Load souvenir cases
         print("\nChecking souvenir cases...")
-        for case_type, file_name in SOUVENIR_CASE_FILE_MAPPING.items():
-            try:
-                with open(f'souvenir/{file_name}.json', 'r') as f:
-                    case_data = json.load(f)
-                    
-                    # Look through all skins
-                    for grade, skins in case_data['skins'].items():
-                        for skin in skins:
-                            # Just use the image filename without the path
-                            image_path = skin['image']
+        for skin in catalog.iter_skins(souvenir=True):
+            grade = skin['grade']
+            case_type = skin['case_type']
+            # Just use the image filename without the path
+            image_path = skin['image']
+            
+            # Check prices for valuable items
+            for wear, price in skin['prices'].items():
+                if wear.startswith('Souvenir_'):
+                    try:
+                        price_value = float(price)
+                        if price_value >= 250:
+                            print(f"Found valuable souvenir: {skin['weapon']} | {skin['name']} ({wear}) - ${price_value}")
+                            
+                            # Generate float based on wear range
+                            base_wear = wear[9:]  # Strip 'Souvenir_' prefix
+                            wear_range = wear_ranges.get(base_wear)
+                            if not wear_range:
+                                continue
+                            
+                            # Generate a very good float for the wear range
+                            min_float, max_float = wear_range
+                            float_range = max_float - min_float
+                            max_special = min_float + (float_range * 0.2)
+                            float_value = random.uniform(min_float, max_special)
                             
-                            # Check prices for valuable items
-                            for wear, price in skin['prices'].items():
-                                if wear.startswith('Souvenir_'):
-                                    try:
-                                        price_value = float(price)
-                                        if price_value >= 250:
-                                            print(f"Found valuable souvenir: {skin['weapon']} | {skin['name']} ({wear}) - ${price_value}")
-                                            
-                                            # Generate float based on wear range
-                                            base_wear = wear[9:]  # Strip 'Souvenir_' prefix
-                                            wear_range = wear_ranges.get(base_wear)
-                                            if not wear_range:
-                                                continue
-                                            
-                                            # Generate a very good float for the wear range
-                                            min_float, max_float = wear_range
-                                            float_range = max_float - min_float
-                                            max_special = min_float + (float_range * 0.2)
-                                            float_value = random.uniform(min_float, max_special)
-                                            
-                                            # Add to weapon skins pool
-                                            weapon_skins.append({
-                                                'weapon': skin['weapon'],
-                                                'name': skin['name'],
-                                                'wear': base_wear,
-                                                'float_value': float_value,
-                                                'rarity': grade.upper(),
-                                                'case_type': case_type,
-                                                'base_price': price_value,
-                                                'adjusted_price': adjust_price_by_float(price_value, base_wear, float_value),
-                                                'stattrak': False,
-                                                'is_souvenir': True,
-                                                'image': image_path
-                                            })
-                                    except Exception as e:
-                                        print(f"Error processing souvenir price: {e}")
-                                        continue
-            except Exception as e:
-                print(f"Error loading souvenir case {file_name}: {e}")
-                continue
+                            # Add to weapon skins pool
+                            weapon_skins.append({
+                                'weapon': skin['weapon'],
+                                'name': skin['name'],
+                                'wear': base_wear,
+                                'float_value': float_value,
+                                'rarity': grade.upper(),
+                                'case_type': case_type,
+                                'base_price': price_value,
+                                'adjusted_price': adjust_price_by_float(price_value, base_wear, float_value),
+                                'stattrak': False,
+                                'is_souvenir': True,
+                                'image': image_path
+                            })
+                    except Exception as e:
+                        print(f"Error processing souvenir price: {e}")
+                        continue
         
         print(f"\nFound items:")
         print(f"Weapons: {len(weapon_skins)}")
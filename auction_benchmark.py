@@ -0,0 +1,111 @@
+"""Micro-benchmark for saving the auction after each bid.
+
+    python auction_benchmark.py [--saves 500] [--backend json|sqlite|all]
+
+Runs in a temporary directory, so the real data/ files are never touched. The 'legacy' row repeats
+the steps the old Windows-only save_auction_data took (backup copy, write, re-read to verify,
+remove + rename, delete backup), minus the msvcrt locking and retry sleeps.
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import auction
+import storage
+from config import AUCTION_FILE
+
+
+def sample_auction() -> dict:
+    bots = ["_Astrid47", "Kai.Jayden_02", "Orion_Phoenix98", "ElaraB_23", "Theo.91", "Nova-Lyn",
+            "FelixHaven19", "Aria.Stella85", "Lucien_Kai", "Mira-Eclipse"]
+    return {
+        'item': {'weapon': 'Karambit', 'name': 'Fade', 'wear': 'FN', 'float_value': 0.0007, 'rarity': 'GOLD',
+                 'case_type': 'csgo', 'base_price': 1500.0, 'adjusted_price': 2000.0, 'stattrak': False,
+                 'image': 'karambit_fade.png', 'is_sticker': False},
+        'end_time': '2030-01-01T00:30:00',
+        'current_bid': 150.0,
+        'bids': [],
+        'bot_budgets': {name: {'budget': 1500.0, 'status': 'online'} for name in bots},
+        'history': [{'weapon': 'AK-47', 'name': 'Fire Serpent', 'wear': 'FN', 'rarity': 'RED',
+                     'final_price': 1000.0 + i, 'winner': bots[i], 'timestamp': '2030-01-01T00:00:00'}
+                    for i in range(10)]
+    }
+
+
+def legacy_save(auction_data: dict):
+    temp_file = AUCTION_FILE + '.tmp'
+    backup_file = AUCTION_FILE + '.bak'
+    if os.path.exists(AUCTION_FILE):
+        shutil.copy2(AUCTION_FILE, backup_file)
+    if os.path.exists(temp_file):
+        os.remove(temp_file)
+    with open(temp_file, 'w') as f:
+        json.dump(auction_data, f, indent=2, default=str)
+        f.flush()
+        os.fsync(f.fileno())
+    with open(temp_file, 'r') as f:
+        json.load(f)
+    if os.path.exists(AUCTION_FILE):
+        os.remove(AUCTION_FILE)
+    os.rename(temp_file, AUCTION_FILE)
+    if os.path.exists(backup_file):
+        os.remove(backup_file)
+
+
+def time_saves(save, saves: int) -> dict:
+    """Place `saves` bids one after another, saving after each like place_bid does"""
+    auction_data = sample_auction()
+    timings = []
+    for i in range(saves):
+        auction_data['bids'].append({'bidder': 'You', 'amount': 150.0 + i, 'timestamp': '2030-01-01T00:10:00'})
+        auction_data['current_bid'] = 150.0 + i
+        start = time.perf_counter()
+        save(auction_data)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'saves': saves,
+        'mean_ms': round(statistics.mean(timings), 3),
+        'p50_ms': round(timings[len(timings) // 2], 3),
+        'p99_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3),
+        'max_ms': round(timings[-1], 3)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time auction saves per bid.')
+    parser.add_argument('--saves', type=int, default=500)
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'all'], default='all')
+    args = parser.parse_args(argv)
+
+    backends = {'json': storage.JsonStorage, 'sqlite': storage.SqliteStorage}
+    names = list(backends) if args.backend == 'all' else [args.backend]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Data paths are relative to the working directory
+        os.chdir(workdir)
+        os.makedirs('data')
+        try:
+            rows = []
+            if 'json' in names:
+                rows.append(dict(backend='legacy', **time_saves(legacy_save, args.saves)))
+            for name in names:
+                # Point get_storage() at a fresh backend inside the temp directory
+                storage._storage = backends[name]()
+                rows.append(dict(backend=name, **time_saves(auction.save_auction_data, args.saves)))
+        finally:
+            storage._storage = None
+            os.chdir(cwd)
+
+    print(f"{'backend':<8} {'saves':>6} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for row in rows:
+        print(f"{row['backend']:<8} {row['saves']:>6} {row['mean_ms']:>9} {row['p50_ms']:>9} "
+              f"{row['p99_ms']:>9} {row['max_ms']:>9}")
+
+
+if __name__ == '__main__':
+    main()
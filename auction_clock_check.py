@@ -0,0 +1,86 @@
+"""Runs a whole auction on a FakeClock: bot bids, the close and the start of the next auction.
+
+    python auction_clock_check.py [--step 5] [--auctions 2]
+
+Runs in a temporary directory with a copy of the catalog, so the real data/ files are never touched.
+No scheduler thread is started; the clock is advanced by --step seconds and run_due() fires whatever
+became due. Exits non-zero if an auction went by without bot bids, didn't close, or wasn't replaced.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+from scheduler import FakeClock
+
+CATALOG_DIRS = ['cases', 'stickers', 'souvenir', 'collections']
+
+
+def run_auction(app, clock: FakeClock, step: float) -> list:
+    """Advance the clock until the current auction is replaced. Returns what went wrong, if anything"""
+    problems = []
+    # Compared by value, since every bot round reloads the auction
+    item = dict(app.CURRENT_AUCTION)
+    bids_seen = 0
+    # Late bids push the end back 15s at a time, and a bidding war between bots with deep budgets
+    # can run for hours, so give it well past the scheduled 30 minutes
+    deadline = clock() + 24 * 3600
+    while app.CURRENT_AUCTION == item and clock() < deadline:
+        bids_seen = max(bids_seen, len(app.AUCTION_BIDS))
+        clock.advance(step)
+        app.auction_scheduler.run_due()
+
+    if bids_seen == 0:
+        problems.append('no bot bids')
+    if app.CURRENT_AUCTION == item:
+        problems.append('auction never closed')
+        return problems
+    # (Bots may already have bid on it in the same run_due, so its bids aren't checked)
+    if app.AUCTION_END_TIME < app.auction_now() + timedelta(minutes=29):
+        problems.append('next auction does not run for 30 minutes')
+    if app.auction_scheduler.next_time('auction_close') != app.AUCTION_END_TIME.timestamp():
+        problems.append('next auction close not scheduled')
+    if app.auction_scheduler.next_time('bot_bids') is None:
+        problems.append('bot bids not scheduled for the next auction')
+    print(f"{item['weapon']} | {item['name']}: {bids_seen} bids, "
+          f"next up {app.CURRENT_AUCTION['weapon']} | {app.CURRENT_AUCTION['name']}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Drive the auction through a fake clock.')
+    parser.add_argument('--step', type=float, default=5.0)
+    parser.add_argument('--auctions', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    problems = []
+    with tempfile.TemporaryDirectory() as workdir:
+        # Data and catalog paths are relative to the working directory
+        for name in CATALOG_DIRS:
+            shutil.copytree(os.path.join(here, name), os.path.join(workdir, name))
+        os.makedirs(os.path.join(workdir, 'data'))
+        os.chdir(workdir)
+        try:
+            import app
+            clock = FakeClock(time.time())
+            app.init_auction_system(clock)
+            for _ in range(args.auctions):
+                problems += run_auction(app, clock, args.step)
+            app.cleanup_auction()
+        finally:
+            os.chdir(cwd)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
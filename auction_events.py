@@ -0,0 +1,142 @@
+import json
+import queue
+import threading
+import time
+from collections import deque
+from typing import Iterator, List, Optional, Tuple
+
+from config import SHARED_EVENT_POLL_INTERVAL
+from shared_state import get_shared_state
+
+# Sent as an SSE comment when nothing else happened, so proxies keep the connection open
+HEARTBEAT_INTERVAL = 15
+# Events kept for clients that reconnect with Last-Event-ID
+REPLAY_SIZE = 200
+# A client this far behind is dropped; its EventSource reconnects and gets a fresh snapshot
+SUBSCRIBER_QUEUE_SIZE = 500
+
+
+def format_sse(event: str, data, event_id: Optional[int] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, default=str)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class AuctionEventBus:
+    """Fans auction events out to every connected stream.
+
+    Events are published while holding auction_lock, so subscribing under the same lock and taking a
+    snapshot there means a client sees every change exactly once.
+
+    With a multi-process shared state, events go through its log instead: every worker, the publishing
+    one included, relays them to its own streams from there, so ids are the same on all of them.
+    """
+
+    def __init__(self, shared=None):
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._subscribers = set()
+        self._recent = deque(maxlen=REPLAY_SIZE)
+        self._shared = shared if shared is not None and shared.multi_process else None
+        self._relay_thread = None
+
+    @property
+    def last_id(self) -> int:
+        return self._last_id
+
+    def publish(self, event: str, data: dict):
+        if self._shared is not None:
+            self._start_relay()
+            self._shared.append_event(event, data)
+            return
+        with self._lock:
+            self._deliver(self._last_id + 1, format_sse(event, data, self._last_id + 1))
+
+    def _deliver(self, event_id: int, message: str):
+        """Hand a message to every subscriber. Needs _lock"""
+        self._last_id = event_id
+        self._recent.append((event_id, message))
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Too far behind to catch up; end its stream so it reconnects
+                self._subscribers.discard(subscriber)
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait(None)
+
+    def poll(self):
+        """Relay the shared log's events we haven't delivered yet"""
+        if self._shared is None:
+            return
+        with self._lock:
+            for event_id, event, data in self._shared.events_after(self._last_id):
+                self._deliver(event_id, format_sse(event, data, event_id))
+
+    def _relay_loop(self):
+        while True:
+            time.sleep(SHARED_EVENT_POLL_INTERVAL)
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Error relaying auction events: {e}")
+
+    def _start_relay(self):
+        if self._relay_thread is not None:
+            return
+        with self._lock:
+            if self._relay_thread is None:
+                # Start from the end of the log; older events are only for streams that reconnect
+                self._last_id = self._shared.last_event_id()
+                self._relay_thread = threading.Thread(target=self._relay_loop, daemon=True)
+                self._relay_thread.start()
+
+    def subscribe(self, last_event_id: Optional[int] = None) -> Tuple[queue.Queue, Optional[List[str]]]:
+        """A queue of future events, plus the ones missed since last_event_id (None if they're gone)"""
+        subscriber = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        if self._shared is not None:
+            # Under auction_lock nobody can publish, so after this the snapshot and our last id agree
+            self._start_relay()
+            self.poll()
+        with self._lock:
+            missed = None
+            if last_event_id is not None and last_event_id <= self._last_id:
+                if not self._recent or self._recent[0][0] <= last_event_id + 1:
+                    missed = [message for event_id, message in self._recent if event_id > last_event_id]
+            self._subscribers.add(subscriber)
+        return subscriber, missed
+
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, subscriber: queue.Queue, first: List[str]) -> Iterator[str]:
+        """SSE text for one subscriber: the first messages, then everything published after subscribing"""
+        try:
+            yield from first
+            while True:
+                try:
+                    message = subscriber.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    yield ': heartbeat\n\n'
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+_bus = AuctionEventBus(get_shared_state())
+
+
+def get_auction_events() -> AuctionEventBus:
+    return _bus
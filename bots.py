@@ -1,8 +1,8 @@
-import json
 import random
 from typing import Any, Dict, List
 
-from config import CASE_FILE_MAPPING, CASE_TYPES, client, STICKER_CAPSULE_FILE_MAPPING
+from catalog import get_catalog
+from config import client
 from cases_prices_and_floats import generate_float_for_wear
 
 images_bots_avatars = {
@@ -24,53 +24,9 @@ def generate_bot_players(num_bots: int, mode_limits: dict) -> List[Dict[str, Any
         "Nova-Lyn", "FelixHaven19", "Aria.Stella85", "Lucien_Kai", "Mira-Eclipse"
     ]
     
-    # Load all case data and sticker data
-    all_items = []  # Combined list for both skins and stickers
-    
-    # Load skins from each case
-    for case_type in CASE_TYPES:
-        try:
-            file_name = CASE_FILE_MAPPING.get(case_type)
-            if not file_name:
-                continue
-            with open(f'cases/{file_name}.json', 'r') as f:
-                case_data = json.load(f)
-                # Add all skins to the pool
-                for grade, items in case_data['skins'].items():
-                    for item in items:
-                        all_items.append({
-                            'weapon': item['weapon'],
-                            'name': item['name'],
-                            'prices': item['prices'],
-                            'case_type': case_type,
-                            'case_file': file_name,
-                            'image': item.get('image', f"{item['weapon'].lower().replace(' ', '')}_{item['name'].lower().replace(' ', '_')}.png"),
-                            'rarity': grade.upper(),
-                            'is_sticker': False
-                        })
-        except Exception as e:
-            print(f"Error loading case {case_type}: {e}")
-            continue
-    
-    # Load stickers from each capsule
-    for capsule_type, file_name in STICKER_CAPSULE_FILE_MAPPING.items():
-        try:
-            with open(f'stickers/{file_name}.json', 'r') as f:
-                capsule_data = json.load(f)
-                # Add all stickers to the pool
-                for grade, stickers in capsule_data['stickers'].items():
-                    for sticker in stickers:
-                        all_items.append({
-                            'name': sticker['name'],
-                            'price': float(sticker['price']),
-                            'case_type': capsule_type,
-                            'image': sticker['image'],
-                            'rarity': grade.upper(),
-                            'is_sticker': True
-                        })
-        except Exception as e:
-            print(f"Error loading sticker capsule {capsule_type}: {e}")
-            continue
+    # Combined pool of catalog skins and stickers (shared entries, never mutated here)
+    catalog = get_catalog()
+    all_items = list(catalog.iter_skins()) + list(catalog.iter_stickers())
     
     bots = []
     used_names = set()
@@ -132,7 +88,7 @@ def generate_bot_players(num_bots: int, mode_limits: dict) -> List[Dict[str, Any
                             'price': price,
                             'case_type': item['case_type'],
                             'case_file': item['case_file'],
-                            'image': item.get('image', f"{item['weapon'].lower().replace(' ', '')}_{item['name'].lower().replace(' ', '_')}.png"),
+                            'image': item['image'],
                             'float_value': generate_float_for_wear(wear),
                             'is_sticker': False
                         })
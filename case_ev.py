@@ -0,0 +1,187 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from cases_prices_and_floats import (BS_FLOAT_MULTIPLIERS, FN_FLOAT_MULTIPLIERS, WEAR_CODES, WEAR_RANGES,
+                                     get_bulk_table, load_case)
+from catalog import Catalog, get_catalog
+from config import (CASE_FILE_MAPPING, SOUVENIR_CASE_FILE_MAPPING, SOUVENIR_CHANCE,
+                    SOUVENIR_PACKAGE_RARITY_WEIGHTS, SOUVENIR_WEAR_THRESHOLDS)
+from models import Case
+
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+
+def float_price_bands() -> Tuple[np.ndarray, np.ndarray]:
+    """Per wear code (rows follow WEAR_CODES): the chance of each adjust_price_by_float band and its multiplier"""
+    bands = []
+    for wear in WEAR_CODES:
+        low, high = WEAR_RANGES[wear]
+        width = high - low
+        wear_bands = []
+        if wear == 'FN':
+            # float < threshold, first match wins
+            covered = low
+            for threshold, multiplier in FN_FLOAT_MULTIPLIERS:
+                top = min(max(threshold, covered), high)
+                wear_bands.append(((top - covered) / width, multiplier))
+                covered = top
+            wear_bands.append(((high - covered) / width, 1.0))
+        elif wear == 'BS':
+            # float > threshold, first match wins
+            covered = high
+            for threshold, multiplier in BS_FLOAT_MULTIPLIERS:
+                bottom = max(min(threshold, covered), low)
+                wear_bands.append(((covered - bottom) / width, multiplier))
+                covered = bottom
+            wear_bands.append(((covered - low) / width, 1.0))
+        else:
+            wear_bands.append((1.0, 1.0))
+        bands.append(wear_bands)
+
+    size = max(len(wear_bands) for wear_bands in bands)
+    chances = np.zeros((len(WEAR_CODES), size))
+    multipliers = np.ones((len(WEAR_CODES), size))
+    for i, wear_bands in enumerate(bands):
+        for j, (chance, multiplier) in enumerate(wear_bands):
+            chances[i, j] = chance
+            multipliers[i, j] = multiplier
+    return chances, multipliers
+
+
+def _case_outcomes(case_index: int, case: Case) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Every (skin, wear, StatTrak, float band) outcome of a regular case as (case index, chance, value) arrays"""
+    table = get_bulk_table(case)
+    per_rarity = table['probabilities'] / table['counts']
+    skin_chance = np.repeat(per_rarity, table['counts'])                              # (skins,)
+
+    slots = np.arange(len(WEAR_CODES))
+    wear_codes = table['wear_matrix']                                                 # (skins, slots)
+    wear_chance = (slots < table['wear_counts'][:, None]) / table['wear_counts'][:, None]
+
+    st_chance = table['can_stattrak'] * case.special_chance
+    st_chance = np.stack([1 - st_chance, st_chance], axis=1)                          # (skins, 2)
+
+    band_chance, band_multiplier = float_price_bands()
+    base = np.take_along_axis(table['base_prices'], wear_codes[:, :, None], axis=1)    # (skins, slots, 2)
+
+    chance = (skin_chance[:, None, None, None] * wear_chance[:, :, None, None] *
+              st_chance[:, None, :, None] * band_chance[wear_codes][:, :, None, :])
+    value = base[:, :, :, None] * band_multiplier[wear_codes][:, :, None, :]
+    chance, value = chance.ravel(), value.ravel()
+    keep = chance > 0
+    return np.full(np.count_nonzero(keep), case_index), chance[keep], value[keep]
+
+
+def _souvenir_outcomes(case_index: int, case: dict) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Outcomes of open_souvenir_case: a rarity, a skin, a float from one valid wear mapped back to a wear,
+    then the souvenir or normal price for it. Rolling a rarity with no skins gives nothing"""
+    chances, values = [], []
+    total_weight = sum(SOUVENIR_PACKAGE_RARITY_WEIGHTS.values())
+    souvenir_chance = SOUVENIR_CHANCE / 100
+    for rarity, weight in SOUVENIR_PACKAGE_RARITY_WEIGHTS.items():
+        skins = case['skins'].get(rarity, [])
+        if not skins:
+            chances.append(weight / total_weight)
+            values.append(0.0)
+            continue
+        for skin in skins:
+            valid_wears = skin['valid_wears']
+            for rolled in valid_wears:
+                low, high = WEAR_RANGES[rolled]
+                base = weight / total_weight / len(skins) / len(valid_wears)
+                # The first valid wear whose cutoff the float is under; anything above all of them is BS
+                covered = low
+                landed = {}
+                for wear in valid_wears:
+                    top = min(max(SOUVENIR_WEAR_THRESHOLDS[wear], covered), high)
+                    landed[wear] = landed.get(wear, 0) + (top - covered) / (high - low)
+                    covered = top
+                landed['BS'] = landed.get('BS', 0) + (high - covered) / (high - low)
+                for wear, share in landed.items():
+                    if share <= 0:
+                        continue
+                    chances.append(base * share * souvenir_chance)
+                    values.append(float(skin['prices'].get(f'Souvenir_{wear}', 0)))
+                    chances.append(base * share * (1 - souvenir_chance))
+                    values.append(float(skin['prices'].get(wear, 0)))
+    return np.full(len(chances), case_index), np.array(chances), np.array(values)
+
+
+def compute_case_ev(catalog: Catalog) -> Dict[str, dict]:
+    """Exact EV, variance, percentiles and profit chance of opening one of each case"""
+    case_types, case_ids, chances, values = [], [], [], []
+    for case_type in list(CASE_FILE_MAPPING) + list(SOUVENIR_CASE_FILE_MAPPING):
+        case = catalog.get_case(case_type)
+        if case is None:
+            continue
+        if case['is_souvenir']:
+            outcomes = _souvenir_outcomes(len(case_types), case)
+        else:
+            compiled = load_case(case_type)
+            if not isinstance(compiled, Case) or compiled.rarity_table is None:
+                continue
+            outcomes = _case_outcomes(len(case_types), compiled)
+        case_types.append(case_type)
+        for column, part in zip((case_ids, chances, values), outcomes):
+            column.append(part)
+    if not case_types:
+        return {}
+
+    # From here on every case is handled at once
+    case_ids = np.concatenate(case_ids).astype(int)
+    chances = np.concatenate(chances)
+    values = np.concatenate(values)
+    n = len(case_types)
+    prices = np.array([catalog.get_case(case_type)['price'] for case_type in case_types])
+
+    total = np.bincount(case_ids, chances, n)
+    ev = np.bincount(case_ids, chances * values, n) / total
+    variance = np.bincount(case_ids, chances * values ** 2, n) / total - ev ** 2
+    profit_chance = np.bincount(case_ids, chances * (values > prices[case_ids]), n) / total
+
+    # Percentiles: sort by (case, value), then find where each case's running chance crosses p.
+    # Adding the case index to the running chance keeps every case in its own [i, i + 1] band
+    order = np.lexsort((values, case_ids))
+    sorted_ids = case_ids[order]
+    running = np.cumsum(chances[order])
+    case_start = np.concatenate([[0.0], np.bincount(case_ids, chances, n).cumsum()[:-1]])
+    running = (running - case_start[sorted_ids]) / total[sorted_ids] + sorted_ids
+    percentiles = {}
+    for p in PERCENTILES:
+        positions = np.searchsorted(running, np.arange(n) + p / 100 - 1e-12)
+        percentiles[f'p{p}'] = values[order][np.minimum(positions, len(order) - 1)]
+
+    report = {}
+    for i, case_type in enumerate(case_types):
+        case = catalog.get_case(case_type)
+        report[case_type] = {
+            'case_type': case_type,
+            'name': case['name'],
+            'is_souvenir': case['is_souvenir'],
+            'price': case['price'],
+            'ev': round(float(ev[i]), 4),
+            'rtp': round(float(ev[i] / prices[i]), 4) if prices[i] > 0 else None,
+            'variance': round(float(max(variance[i], 0.0)), 4),
+            'std': round(float(max(variance[i], 0.0) ** 0.5), 4),
+            'profit_chance': round(float(profit_chance[i]), 6),
+            'percentiles': {name: round(float(column[i]), 4) for name, column in percentiles.items()}
+        }
+    return report
+
+
+_report: Optional[Dict[str, dict]] = None
+_report_catalog: Optional[Catalog] = None
+_report_lock = threading.Lock()
+
+
+def get_case_ev_report() -> Dict[str, dict]:
+    """compute_case_ev for the active catalog, recomputed only when the catalog reloads"""
+    global _report, _report_catalog
+    catalog = get_catalog()
+    with _report_lock:
+        if _report is None or _report_catalog is not catalog:
+            _report = compute_case_ev(catalog)
+            _report_catalog = catalog
+        return _report
@@ -1,26 +1,30 @@
-# Add this helper function near the top with other helpers
-import json
 import random
 from typing import Dict, Union
 
-from config import (CASE_FILE_MAPPING, SOUVENIR_CASE_FILE_MAPPING, 
-                  Rarity, SOUVENIR_CASE_DATA)
+import numpy as np
+
+from catalog import get_catalog
+from config import CASE_FILE_MAPPING, Rarity
 from models import Case
 
+WEAR_RANGES = {
+    'FN': (0.00, 0.07),
+    'MW': (0.07, 0.15),
+    'FT': (0.15, 0.38),
+    'WW': (0.38, 0.45),
+    'BS': (0.45, 1.00)
+}
+
+# (float threshold, price multiplier) pairs, checked in order
+FN_FLOAT_MULTIPLIERS = [(0.0009, 4.0), (0.001, 1.5), (0.006, 1.2), (0.015, 1.1)]  # float below threshold
+BS_FLOAT_MULTIPLIERS = [(0.97, 0.5), (0.93, 0.7), (0.90, 0.85)]                    # float above threshold
+
 def generate_float_for_wear(wear: str) -> float:
     """Generate a random float value based on wear condition"""
-    wear_ranges = {
-        'FN': (0.00, 0.07),
-        'MW': (0.07, 0.15),
-        'FT': (0.15, 0.38),
-        'WW': (0.38, 0.45),
-        'BS': (0.45, 1.00)
-    }
-    
-    if wear not in wear_ranges:
+    if wear not in WEAR_RANGES:
         return 0.0
         
-    min_float, max_float = wear_ranges[wear]
+    min_float, max_float = WEAR_RANGES[wear]
     return round(random.uniform(min_float, max_float), 8)
 
 
@@ -29,131 +33,79 @@ def adjust_price_by_float(price: float, wear: str, float_value: float) -> float:
     """Adjust item price based on float value"""
 
     if wear == 'FN':
-        if float_value < 0.0009:
-            return price * 4.0
-        elif float_value < 0.001:
-            return price * 1.5
-        elif float_value < 0.006:
-            return price * 1.2
-        elif float_value < 0.015:
-            return price * 1.1
-        else:
-            return price
+        for threshold, multiplier in FN_FLOAT_MULTIPLIERS:
+            if float_value < threshold:
+                return price * multiplier
+        return price
             
     elif wear == 'BS':
-        if float_value > 0.97:
-            return price * 0.5
-        elif float_value > 0.93:
-            return price * 0.7
-        elif float_value > 0.90:
-            return price * 0.85
-        else:
-            return price
+        for threshold, multiplier in BS_FLOAT_MULTIPLIERS:
+            if float_value > threshold:
+                return price * multiplier
+        return price
     
     return price
 
+def adjust_prices_by_float(prices: np.ndarray, wears: np.ndarray, float_values: np.ndarray) -> np.ndarray:
+    """Vectorized adjust_price_by_float over arrays of prices, wear codes and floats"""
+    conditions = []
+    multipliers = []
+    for threshold, multiplier in FN_FLOAT_MULTIPLIERS:
+        conditions.append((wears == 'FN') & (float_values < threshold))
+        multipliers.append(multiplier)
+    for threshold, multiplier in BS_FLOAT_MULTIPLIERS:
+        conditions.append((wears == 'BS') & (float_values > threshold))
+        multipliers.append(multiplier)
+    return prices * np.select(conditions, multipliers, default=1.0)
+
 def load_skin_price(skin_name: str, case_type: str, wear: str, float_value: float, is_stattrak: bool = False, is_souvenir: bool = False) -> float:
     """Load and adjust price for a skin based on case data and float value"""
     try:
-        # Get case file name
-        if case_type in SOUVENIR_CASE_FILE_MAPPING:
-            file_name = SOUVENIR_CASE_FILE_MAPPING[case_type]
-            file_path = f'souvenir/{file_name}.json'
-        else:
-            file_name = CASE_FILE_MAPPING.get(case_type)
-            file_path = f'cases/{file_name}.json'
-            
-        if not file_name:
-            return 0
-            
-        # Load case data
-        with open(file_path, 'r') as f:
-            case_data = json.load(f)
-            
-        # Find the skin in case data
         weapon, name = skin_name.split(' | ')
-        for grade, skins in case_data['skins'].items():
-            for skin in skins:
-                if skin['weapon'] == weapon and skin['name'] == name:
-                    # Get the correct price key based on StatTrak/Souvenir
-                    price_key = f'Souvenir_{wear}' if is_souvenir else (f'ST_{wear}' if is_stattrak else wear)
-                    if price_key not in skin['prices']:
-                        return 0
-                        
-                    # Get base price
-                    base_price = float(skin['prices'][price_key])
-                    
-                    # Adjust price based on float value
-                    adjusted_price = adjust_price_by_float(base_price, wear, float_value)
-                    
-                    # If it's StatTrak/Souvenir, we need to ensure we're using the correct price as base
-                    if is_stattrak or is_souvenir:
-                        # Calculate the adjustment multiplier from the base adjustment
-                        adjustment_multiplier = adjusted_price / base_price
-                        # Apply the same multiplier to the special price
-                        return base_price * adjustment_multiplier
-                    
-                    return adjusted_price
-                    
-        return 0
+        
+        # Get the correct price key based on StatTrak/Souvenir
+        price_key = f'Souvenir_{wear}' if is_souvenir else (f'ST_{wear}' if is_stattrak else wear)
+        base_price = get_catalog().get_price(case_type, weapon, name, price_key)
+        if base_price is None:
+            return 0
+        
+        # StatTrak/Souvenir prices get the same float adjustment as the plain wear
+        return adjust_price_by_float(base_price, wear, float_value)
     except Exception as e:
         print(f"Error loading skin price: {e}")
         return 0
 
 def load_case(case_type: str) -> Union[Case, Dict, None]:
     """
-    Load case data from JSON file. Returns either a Case object for opening cases,
+    Load case data from the catalog. Returns either a Case object for opening cases,
     or a dictionary with basic case info for the shop display.
     """
     try:
+        catalog = get_catalog()
+
         # If we just need basic case info for the shop
         if case_type == 'all':
-            cases = {}
-            # Regular cases
-            for case_key, file_name in CASE_FILE_MAPPING.items():
-                try:
-                    with open(f'cases/{file_name}.json', 'r') as f:
-                        case_data = json.load(f)
-                        cases[case_key] = {
-                            'name': case_data['name'],
-                            'image': case_data['image'],
-                            'price': case_data['price'],
-                            'is_souvenir': False
-                        }
-                except Exception as e:
-                    print(f"Error loading {file_name}: {e}")
+            return {
+                case_key: {
+                    'name': case['name'],
+                    'image': case['image'],
+                    'price': case['price'],
+                    'is_souvenir': case['is_souvenir']
+                }
+                for case_key, case in catalog.cases.items()
+            }
             
-            # Souvenir cases
-            for case_key, file_name in SOUVENIR_CASE_FILE_MAPPING.items():
-                try:
-                    with open(f'souvenir/{file_name}.json', 'r') as f:
-                        case_data = json.load(f)
-                        cases[case_key] = {
-                            'name': case_data['name'],
-                            'image': case_data['image'],
-                            'price': case_data['price'],
-                            'is_souvenir': True
-                        }
-                except Exception as e:
-                    print(f"Error loading souvenir {file_name}: {e}")
-            return cases
+        # Opening cases reuses the compiled drop table until the catalog reloads
+        compiled = catalog.compiled_cases.get(case_type)
+        if compiled:
+            return compiled
             
         # For opening specific cases
-        is_souvenir = case_type in SOUVENIR_CASE_FILE_MAPPING
-        if is_souvenir:
-            file_name = SOUVENIR_CASE_FILE_MAPPING[case_type]
-            file_path = f'souvenir/{file_name}.json'
-        else:
-            file_name = CASE_FILE_MAPPING.get(case_type)
-            file_path = f'cases/{file_name}.json'
-            
-        if not file_name:
+        case = catalog.get_case(case_type)
+        if not case:
             print(f"Invalid case type: {case_type}")
             return None
             
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            
         # For opening cases, create a Case object with full skin data
         contents = {
             Rarity.CONTRABAND: [],
@@ -177,12 +129,14 @@ def load_case(case_type: str) -> Union[Case, Dict, None]:
             'grey': Rarity.GREY
         }
         
-        for grade, items in data['skins'].items():
+        for grade, items in case['skins'].items():
             rarity = grade_map[grade]
             for item in items:
-                contents[rarity].append((item['weapon'], item['name']))
+                contents[rarity].append((item['weapon'], item['name'], item['valid_wears']))
         
-        return Case(data['name'], contents, file_name, is_souvenir)
+        compiled = Case(case['name'], contents, case['file_name'], case['is_souvenir'])
+        catalog.compiled_cases[case_type] = compiled
+        return compiled
         
     except Exception as e:
         print(f"Error loading case {case_type}: {e}")
@@ -191,16 +145,91 @@ def load_case(case_type: str) -> Union[Case, Dict, None]:
 def get_case_prices(case_type: str = None) -> Union[float, Dict[str, float]]:
     """Get price for a single case or all case prices if no case_type provided"""
     if case_type is not None:
-        try:
-            file_name = CASE_FILE_MAPPING.get(case_type)
-            if not file_name:
-                print(f"Unknown case type: {case_type}")
-                return 0
-                
-            with open(f'cases/{file_name}.json', 'r') as f:
-                data = json.load(f)
-                return data.get('price', 0)
-        except Exception:
+        case = get_catalog().get_case(case_type)
+        if not case or case['is_souvenir']:
+            print(f"Unknown case type: {case_type}")
             return 0
+        return case['price']
     else:
-        return {case_type: get_case_prices(case_type) for case_type in CASE_FILE_MAPPING.keys()}
\ No newline at end of file
+        return {case_type: get_case_prices(case_type) for case_type in CASE_FILE_MAPPING.keys()}
+
+WEAR_CODES = np.array(['FN', 'MW', 'FT', 'WW', 'BS'])
+
+def _build_bulk_table(case: Case) -> dict:
+    """Flatten a case's drop table into NumPy arrays for open_many"""
+    catalog = get_catalog()
+    wear_index = {code: i for i, code in enumerate(WEAR_CODES)}
+    
+    weights = np.array(case.drop_weights, dtype=float)
+    offsets, counts = [], []
+    rarities, weapons, names = [], [], []
+    wear_matrix, wear_counts, can_stattrak, base_prices = [], [], [], []
+    
+    for rarity, skins in zip(case.drop_rarities, case.drop_skins):
+        offsets.append(len(weapons))
+        counts.append(len(skins))
+        for weapon, skin_name, wears, can_be_stattrak in skins:
+            rarities.append(rarity.name)
+            weapons.append(weapon)
+            names.append(skin_name)
+            codes = [wear_index[w.name] for w in wears]
+            wear_matrix.append(codes + [codes[0]] * (len(WEAR_CODES) - len(codes)))
+            wear_counts.append(len(codes))
+            can_stattrak.append(can_be_stattrak)
+            # [wear][0] is the normal price, [wear][1] the StatTrak price
+            base_prices.append([[catalog.get_base_price(case.file_name, weapon, skin_name, code, st)
+                                 for st in (False, True)] for code in WEAR_CODES])
+    
+    return {
+        'probabilities': weights / weights.sum(),
+        'offsets': np.array(offsets),
+        'counts': np.array(counts),
+        'rarity': np.array(rarities, dtype=object),
+        'weapon': np.array(weapons, dtype=object),
+        'name': np.array(names, dtype=object),
+        'wear_matrix': np.array(wear_matrix),
+        'wear_counts': np.array(wear_counts),
+        'can_stattrak': np.array(can_stattrak, dtype=bool),
+        'base_prices': np.array(base_prices, dtype=float),
+        'float_min': np.array([WEAR_RANGES[w][0] for w in WEAR_CODES]),
+        'float_max': np.array([WEAR_RANGES[w][1] for w in WEAR_CODES])
+    }
+
+def get_bulk_table(case: Case) -> dict:
+    """The case's NumPy drop table, built on first use"""
+    if case.bulk_table is None:
+        case.bulk_table = _build_bulk_table(case)
+    return case.bulk_table
+
+def open_many(case_type: str, n: int, rng: np.random.Generator = None) -> Union[Dict[str, np.ndarray], None]:
+    """
+    Open n cases in one batch. Returns a dict of equal-length arrays
+    (rarity, weapon, name, wear, stattrak, float_value, base_price, price) or None for unknown cases.
+    """
+    case = load_case(case_type)
+    if not isinstance(case, Case) or case.rarity_table is None:
+        return None
+    table = get_bulk_table(case)
+    rng = rng or np.random.default_rng()
+    
+    # Rarity, then a uniform skin within it, then one of that skin's valid wears
+    rarity_idx = rng.choice(len(table['probabilities']), size=n, p=table['probabilities'])
+    skin_idx = table['offsets'][rarity_idx] + (rng.random(n) * table['counts'][rarity_idx]).astype(int)
+    wear_slot = (rng.random(n) * table['wear_counts'][skin_idx]).astype(int)
+    wear_idx = table['wear_matrix'][skin_idx, wear_slot]
+    stattrak = table['can_stattrak'][skin_idx] & (rng.random(n) < case.special_chance)
+    
+    float_values = np.round(rng.uniform(table['float_min'][wear_idx], table['float_max'][wear_idx]), 8)
+    wears = WEAR_CODES[wear_idx]
+    base_prices = table['base_prices'][skin_idx, wear_idx, stattrak.astype(int)]
+    
+    return {
+        'rarity': table['rarity'][skin_idx],
+        'weapon': table['weapon'][skin_idx],
+        'name': table['name'][skin_idx],
+        'wear': wears,
+        'stattrak': stattrak,
+        'float_value': float_values,
+        'base_price': base_prices,
+        'price': adjust_prices_by_float(base_prices, wears, float_values)
+    }
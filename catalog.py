@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from config import (CASE_FILE_MAPPING, CATALOG_RELOAD_INTERVAL, SOUVENIR_CASE_FILE_MAPPING,
+                    STICKER_CAPSULE_FILE_MAPPING)
+
+
+def default_image_name(weapon: str, name: str) -> str:
+    """Image file name used when a skin entry doesn't specify one"""
+    return f"{weapon.lower().replace(' ', '')}_{name.lower().replace(' ', '_')}.png"
+
+
+class Catalog:
+    """In-memory copy of every case, souvenir package and sticker capsule file.
+
+    Entries are shared between requests, so callers must copy them before mutating.
+    """
+
+    def __init__(self):
+        self.cases = {}           # case_type -> case info with its skins grouped by grade
+        self.skins = {}           # (case_type, weapon, name) -> skin entry
+        self.rarity_buckets = {}  # rarity ('GOLD', 'RED', ...) -> skin entries from regular cases
+        self.capsules = {}        # capsule_type -> capsule info with its stickers grouped by grade
+        self.stickers = {}        # (capsule_type, name) -> sticker entry
+        self.prices = {}          # (case_type, weapon, name, price_key) -> base price
+        self.case_types_by_file = {}  # case file name -> case_type
+        self.compiled_cases = {}  # case_type -> models.Case with its drop table, filled by load_case
+        self.file_mtimes = {}     # file path -> mtime when it was loaded
+
+    @classmethod
+    def from_files(cls) -> 'Catalog':
+        """Parse all case, souvenir and sticker files"""
+        catalog = cls()
+        for case_type, file_name in CASE_FILE_MAPPING.items():
+            try:
+                catalog._add_case(case_type, file_name, 'cases', False)
+            except Exception as e:
+                print(f"Error loading case {case_type}: {e}")
+        for case_type, file_name in SOUVENIR_CASE_FILE_MAPPING.items():
+            try:
+                catalog._add_case(case_type, file_name, 'souvenir', True)
+            except Exception as e:
+                print(f"Error loading souvenir case {case_type}: {e}")
+        for capsule_type, file_name in STICKER_CAPSULE_FILE_MAPPING.items():
+            try:
+                catalog._add_capsule(capsule_type, file_name)
+            except Exception as e:
+                print(f"Error loading sticker capsule {capsule_type}: {e}")
+        return catalog
+
+    def _load_json(self, path: str) -> dict:
+        mtime = os.path.getmtime(path)
+        with open(path, 'r') as f:
+            data = json.load(f)
+        self.file_mtimes[path] = mtime
+        return data
+
+    def _add_case(self, case_type: str, file_name: str, folder: str, is_souvenir: bool):
+        data = self._load_json(f'{folder}/{file_name}.json')
+
+        skins_by_grade = {}
+        for grade, items in data['skins'].items():
+            entries = []
+            for item in items:
+                entry = dict(item)
+                entry.setdefault('image', default_image_name(item['weapon'], item['name']))
+                entry.update({
+                    'grade': grade,
+                    'rarity': grade.upper(),
+                    'case_type': case_type,
+                    'case_file': file_name,
+                    'is_souvenir_case': is_souvenir,
+                    'is_sticker': False
+                })
+                entries.append(entry)
+
+                # Keep the first match, like the old linear scans did
+                if (case_type, item['weapon'], item['name']) not in self.skins:
+                    self.skins[(case_type, item['weapon'], item['name'])] = entry
+                    for price_key, price in item['prices'].items():
+                        self.prices[(case_type, item['weapon'], item['name'], price_key)] = float(price)
+                if not is_souvenir:
+                    self.rarity_buckets.setdefault(entry['rarity'], []).append(entry)
+            skins_by_grade[grade] = entries
+
+        self.case_types_by_file[file_name] = case_type
+        self.cases[case_type] = {
+            'name': data['name'],
+            'image': data['image'],
+            'price': float(data.get('price', 0)),
+            'type': case_type,
+            'file_name': file_name,
+            'is_souvenir': is_souvenir,
+            'skins': skins_by_grade
+        }
+
+    def _add_capsule(self, capsule_type: str, file_name: str):
+        data = self._load_json(f'stickers/{file_name}.json')
+
+        stickers_by_grade = {}
+        for grade, items in data['stickers'].items():
+            entries = []
+            for item in items:
+                entry = dict(item)
+                entry.update({
+                    'price': float(item['price']),
+                    'grade': grade,
+                    'rarity': grade.upper(),
+                    'case_type': capsule_type,
+                    'case_file': file_name,
+                    'is_sticker': True
+                })
+                entries.append(entry)
+                self.stickers.setdefault((capsule_type, item['name']), entry)
+            stickers_by_grade[grade] = entries
+
+        self.capsules[capsule_type] = {
+            'name': data['name'],
+            'image': data['image'],
+            'price': float(data.get('price', 0)),
+            'type': capsule_type,
+            'file_name': file_name,
+            'stickers': stickers_by_grade
+        }
+
+    def is_stale(self) -> bool:
+        """Check whether any loaded file changed on disk since it was parsed"""
+        for path, mtime in self.file_mtimes.items():
+            try:
+                if os.path.getmtime(path) != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def get_case(self, case_type: str) -> Optional[dict]:
+        return self.cases.get(case_type)
+
+    def get_skin(self, case_type: str, weapon: str, name: str) -> Optional[dict]:
+        return self.skins.get((case_type, weapon, name))
+
+    def resolve_case_type(self, case_type: str) -> Optional[str]:
+        """Accept either a case type or a case file name (older skins store the file name)"""
+        if case_type in self.cases:
+            return case_type
+        return self.case_types_by_file.get(case_type)
+
+    def get_price(self, case_type: str, weapon: str, name: str, price_key: str) -> Optional[float]:
+        """Base price for an exact price key like 'FN', 'ST_FN' or 'Souvenir_FN'"""
+        return self.prices.get((case_type, weapon, name, price_key))
+
+    def get_base_price(self, case_type: str, weapon: str, name: str, wear: str,
+                       stattrak: bool = False, souvenir: bool = False) -> float:
+        """Base price of a skin, falling back to the 'NO' key for vanilla knives. Returns 0 if unknown"""
+        case_type = self.resolve_case_type(case_type)
+        if case_type is None:
+            return 0
+        if (case_type, weapon, name, 'NO') in self.prices:
+            wear = 'NO'
+        if souvenir:
+            price_key = f'Souvenir_{wear}'
+        elif stattrak:
+            price_key = f'ST_{wear}'
+        else:
+            price_key = wear
+        return self.prices.get((case_type, weapon, name, price_key), 0)
+
+    def get_capsule(self, capsule_type: str) -> Optional[dict]:
+        return self.capsules.get(capsule_type)
+
+    def get_sticker(self, capsule_type: str, name: str) -> Optional[dict]:
+        return self.stickers.get((capsule_type, name))
+
+    def iter_skins(self, souvenir: bool = False) -> Iterator[dict]:
+        """Yield skin entries from regular cases, or from souvenir packages if souvenir is set"""
+        for case in self.cases.values():
+            if case['is_souvenir'] != souvenir:
+                continue
+            for entries in case['skins'].values():
+                yield from entries
+
+    def iter_stickers(self) -> Iterator[dict]:
+        for capsule in self.capsules.values():
+            for entries in capsule['stickers'].values():
+                yield from entries
+
+    def cases_in_price_range(self, min_price: float, max_price: float) -> List[Tuple[str, dict]]:
+        """Regular cases whose price lies within [min_price, max_price]"""
+        return [(case_type, case) for case_type, case in self.cases.items()
+                if not case['is_souvenir'] and min_price <= case['price'] <= max_price]
+
+
+_catalog: Optional[Catalog] = None
+_catalog_lock = threading.Lock()
+_last_stale_check = 0.0
+
+
+def load_catalog() -> Catalog:
+    """(Re)load the catalog from disk and make it the active one"""
+    global _catalog, _last_stale_check
+    catalog = Catalog.from_files()
+    with _catalog_lock:
+        _catalog = catalog
+        _last_stale_check = time.time()
+    return catalog
+
+
+def get_catalog() -> Catalog:
+    """Return the active catalog, reloading it if its files changed on disk"""
+    global _catalog, _last_stale_check
+    with _catalog_lock:
+        now = time.time()
+        if _catalog is None:
+            _catalog = Catalog.from_files()
+            _last_stale_check = now
+        elif now - _last_stale_check >= CATALOG_RELOAD_INTERVAL:
+            _last_stale_check = now
+            if _catalog.is_stale():
+                print("Catalog files changed on disk, reloading")
+                _catalog = Catalog.from_files()
+        return _catalog
@@ -0,0 +1,244 @@
+import atexit
+import threading
+import time
+from typing import Dict, Optional
+
+from achievements import update_click_achievements
+from config import (CLICK_BURST_SECONDS, CLICK_COMBO_TIMEOUT, CLICK_FLUSH_INTERVAL, CLICK_MAX_MANUAL_RATE,
+                    RANK_EXP, RANKS)
+from user_data import current_user, get_user_fields, load_user_data, save_user_data
+
+
+def click_base_value(upgrades: dict) -> float:
+    """Value of one plain click: 0.01 at level 1, +50% per click_value level"""
+    return 0.01 * (1.5 ** (upgrades.get('click_value', 1) - 1))
+
+
+def max_click_multiplier(upgrades: dict) -> float:
+    # Same formula as the store's maxMultiplier
+    return 1.5 + 0.5 * (upgrades.get('max_multiplier', 1) - 1)
+
+
+def clicks_per_combo_step(upgrades: dict) -> int:
+    """Manual clicks needed for each +0.1 of combo multiplier (the store's clicksToCombo)"""
+    return max(1, 21 - upgrades.get('combo_speed', 1))
+
+
+def auto_clicks_per_second(upgrades: dict) -> float:
+    # Same rate as workers/autoClicker.js
+    level = upgrades.get('auto_clicker', 0)
+    return level * 0.1 if level <= 9 else level - 9
+
+
+class _ClickCounter:
+    """One user's clicks since the last flush, plus what's needed to check the next batch"""
+
+    def __init__(self, now: float):
+        self.clicks = 0
+        self.value = 0.0
+        self.upgrades = None
+        self.upgrades_time = 0.0
+        # Rate limits: clicks we'd still believe, topped up over time
+        self.manual_allowance = CLICK_MAX_MANUAL_RATE * CLICK_BURST_SECONDS
+        self.auto_allowance = None
+        self.allowance_time = now
+        # Manual clicks in the current combo and when the last one came in
+        self.streak = 0
+        self.last_manual = 0.0
+        # Achievements completed by a flush, until a click response hands them out
+        self.achievements = []
+        self.level_up = False
+
+
+class ClickAccumulator:
+    """Counts clicks in memory and writes balance, stats and achievements in one save per flush"""
+
+    def __init__(self, flush_interval: float = CLICK_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._counters: Dict[str, _ClickCounter] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _counter(self, user: str, now: float) -> _ClickCounter:
+        counter = self._counters.get(user)
+        if counter is None:
+            counter = self._counters[user] = _ClickCounter(now)
+        # Upgrades only change through purchases, so re-reading them every flush interval is plenty
+        if counter.upgrades is None or now - counter.upgrades_time >= self.flush_interval:
+            counter.upgrades = get_user_fields('upgrades', user=user)['upgrades'] or {}
+            counter.upgrades_time = now
+        return counter
+
+    def add(self, normal: int = 0, critical: int = 0, auto_normal: int = 0, auto_critical: int = 0,
+            multiplier: float = 1.0, user: Optional[str] = None, now: Optional[float] = None) -> dict:
+        """Count a batch of clicks for user (default: the current user). Clicks beyond what their upgrades
+        allow are dropped.
+
+        Returns how many clicks were accepted, the multiplier used and the value they earned.
+        """
+        now = time.monotonic() if now is None else now
+        user = user or current_user()
+        normal, critical, auto_normal, auto_critical = (max(0, int(n)) for n in
+                                                        (normal, critical, auto_normal, auto_critical))
+        submitted = normal + critical + auto_normal + auto_critical
+        with self._lock:
+            counter = self._counter(user, now)
+            upgrades = counter.upgrades
+
+            elapsed = max(0.0, now - counter.allowance_time)
+            counter.allowance_time = now
+            auto_rate = auto_clicks_per_second(upgrades)
+            # The extra click of headroom lets slow auto clickers through despite timer jitter
+            auto_cap = auto_rate * CLICK_BURST_SECONDS + 1 if auto_rate else 0
+            if counter.auto_allowance is None:
+                counter.auto_allowance = auto_cap
+            counter.auto_allowance = min(auto_cap, counter.auto_allowance + auto_rate * elapsed)
+            counter.manual_allowance = min(CLICK_MAX_MANUAL_RATE * CLICK_BURST_SECONDS,
+                                           counter.manual_allowance + CLICK_MAX_MANUAL_RATE * elapsed)
+
+            # No critical strike upgrade means no crits
+            if not upgrades.get('critical_strike', 0):
+                normal, critical = normal + critical, 0
+                auto_normal, auto_critical = auto_normal + auto_critical, 0
+
+            # Over the limit, drop crits first
+            normal, critical = self._allow(normal, critical, counter.manual_allowance)
+            counter.manual_allowance -= normal + critical
+            auto_normal, auto_critical = self._allow(auto_normal, auto_critical, counter.auto_allowance)
+            counter.auto_allowance -= auto_normal + auto_critical
+
+            # The combo can't be higher than the manual clicks in this streak could have built
+            manual = normal + critical
+            if now - counter.last_manual > CLICK_COMBO_TIMEOUT:
+                counter.streak = 0
+            if manual:
+                counter.streak += manual
+                counter.last_manual = now
+            combo_cap = min(max_click_multiplier(upgrades),
+                            1 + 0.1 * (counter.streak // clicks_per_combo_step(upgrades)))
+            multiplier = round(min(max(float(multiplier), 1.0), combo_cap), 1)
+
+            # Auto clicks don't use the multiplier; crits are worth 4x
+            base = click_base_value(upgrades)
+            value = base * multiplier * (normal + 4 * critical) + base * (auto_normal + 4 * auto_critical)
+            accepted = manual + auto_normal + auto_critical
+            counter.clicks += accepted
+            counter.value += value
+
+            achievement = counter.achievements.pop(0) if counter.achievements else None
+            level_up, counter.level_up = counter.level_up, False
+            pending_value = counter.value
+
+        self.start()
+        return {
+            'accepted_clicks': accepted,
+            'rejected_clicks': submitted - accepted,
+            'multiplier': multiplier,
+            'value': value,
+            'pending_value': pending_value,
+            'achievement': achievement,
+            'level_up': level_up
+        }
+
+    @staticmethod
+    def _allow(normal: int, critical: int, allowance: float):
+        allowed = max(0, int(allowance))
+        if normal + critical <= allowed:
+            return normal, critical
+        critical = max(0, allowed - normal)
+        return min(normal, allowed), critical
+
+    def pending(self, user: Optional[str] = None) -> float:
+        """Value counted but not yet added to the user's balance"""
+        with self._lock:
+            counter = self._counters.get(user or current_user())
+            return counter.value if counter else 0.0
+
+    def has_pending(self, user: Optional[str] = None) -> bool:
+        """Whether user (or anyone, if not given) has clicks waiting to be flushed"""
+        with self._lock:
+            if user is not None:
+                counter = self._counters.get(user)
+                return bool(counter and counter.clicks)
+            return any(counter.clicks for counter in self._counters.values())
+
+    def flush(self, user: Optional[str] = None):
+        """Add counted clicks to balances and stats and update click achievements, for user or everyone"""
+        with self._flush_lock:
+            for user in [user] if user is not None else list(self._counters):
+                with self._lock:
+                    counter = self._counters.get(user)
+                    if counter is None:
+                        continue
+                    clicks, value = counter.clicks, counter.value
+                    counter.clicks, counter.value = 0, 0.0
+                if not clicks:
+                    # Counters of players who stopped clicking go, so they don't pile up; by then their
+                    # allowance would have refilled and their combo expired anyway
+                    with self._lock:
+                        idle = time.monotonic() - counter.allowance_time
+                        if (not counter.clicks and not counter.achievements and not counter.level_up and
+                                idle > max(CLICK_BURST_SECONDS, CLICK_COMBO_TIMEOUT)):
+                            self._counters.pop(user, None)
+                    continue
+                try:
+                    user_data = load_user_data(user)
+                    rank = user_data.get('rank', 0)
+
+                    user_data['balance'] = round(user_data['balance'] + value, 3)
+                    stats = user_data['stats']
+                    stats['total_clicks'] = stats.get('total_clicks', 0) + clicks
+                    stats['total_earnings'] = round(stats.get('total_earnings', 0) + value, 3)
+                    new_achievements = update_click_achievements(user_data)
+                    save_user_data(user_data, user)
+                except Exception as e:
+                    print(f"Error flushing clicks: {e}")
+                    with self._lock:
+                        counter.clicks += clicks
+                        counter.value += value
+                    continue
+
+                with self._lock:
+                    counter.achievements.extend(new_achievements)
+                    counter.level_up = counter.level_up or user_data.get('rank', 0) > rank
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        """Start the background flush thread if it isn't running yet"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+
+_accumulator = ClickAccumulator()
+# Registered after user_data's, so it runs first and its last save still gets written out
+atexit.register(_accumulator.stop)
+
+
+def get_click_accumulator() -> ClickAccumulator:
+    return _accumulator
+
+
+def rank_info(user_data: dict) -> dict:
+    """The exp/rank fields click responses carry"""
+    rank = user_data.get('rank', 0)
+    return {
+        'exp': user_data.get('exp', 0),
+        'rank': rank,
+        'rankName': RANKS[rank],
+        'nextRankExp': RANK_EXP[rank] if rank < len(RANK_EXP) else None
+    }
@@ -13,6 +13,73 @@ load_dotenv()
 # Featured skins refresh interval
 REFRESH_INTERVAL = 3600 
 AUCTION_FILE = 'data/auction_data.json'
+USER_DATA_FILE = 'data/user_inventory.json'  # latest snapshot of the user data
+USER_JOURNAL_FILE = 'data/user_journal.jsonl'  # events since that snapshot
+
+# How often (seconds) pending user data changes are appended to the journal
+USER_DATA_FLUSH_INTERVAL = 2
+# Compact the journal into a new snapshot after this many events or seconds
+USER_JOURNAL_COMPACT_EVENTS = 1000
+USER_SNAPSHOT_INTERVAL = 300
+# Recent user data versions kept so a save based on an older one can be merged instead of rejected
+USER_REVISION_HISTORY = 64
+
+# With MULTI_USER=1 every browser session gets its own player; otherwise everyone plays as LOCAL_USER,
+# whose data stays in the files above. Other players get their own directory under USER_DATA_DIR
+MULTI_USER = os.getenv('MULTI_USER', '0') == '1'
+LOCAL_USER = 'local'
+# Signs the session cookie, which holds the player id; MULTI_USER refuses to start without it
+SECRET_KEY = os.getenv('SECRET_KEY')
+USER_DATA_DIR = 'data/users'
+# Players kept in memory; the least recently used ones are dropped once their changes are written
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '1000'))
+
+# With SHARED_STATE=1 the auction, featured skins and mines games live in SHARED_STATE_DB instead of
+# process memory, so several worker processes (e.g. gunicorn -w 4) all see the same ones
+SHARED_STATE = os.getenv('SHARED_STATE', '0') == '1'
+SHARED_STATE_DB = 'data/shared_state.db'
+# One worker at a time runs the auction's bots and closes auctions; its lease lasts this many seconds
+# and is renewed every third of that, so another worker takes over this long after it dies
+LEADER_LEASE_SECONDS = 15
+# How often each worker picks up auction events the others published, for its streams
+SHARED_EVENT_POLL_INTERVAL = 0.25
+
+# Mines games nobody touched for this many seconds are dropped (the bet is lost, as if walked away
+# from), and beyond this many games in flight the least recently played go first
+MINES_SESSION_TTL = 6 * 3600
+MINES_MAX_SESSIONS = 10000
+
+# Where user data, trades, auction and loadouts are kept: 'json' (files under data/) or 'sqlite'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'json')
+SQLITE_DB_FILE = 'data/case_clicker.db'
+
+# How often (seconds) the catalog checks whether case/sticker files changed on disk
+CATALOG_RELOAD_INTERVAL = 5
+
+# Clicks are counted in memory and written to the user data at most once per CLICK_FLUSH_INTERVAL seconds
+CLICK_FLUSH_INTERVAL = 1
+# Most manual clicks per second we believe, and how many seconds' worth of clicks a batch may catch up on
+CLICK_MAX_MANUAL_RATE = 25
+CLICK_BURST_SECONDS = 5
+# The combo streak resets after this many seconds without a manual click
+CLICK_COMBO_TIMEOUT = 3
+
+# Upgrade rewards: how far (fraction of the target) a combination may miss, and how long
+# (seconds) the combination search may run before settling for the best it has found
+UPGRADE_TOLERANCE = 0.05
+UPGRADE_SEARCH_BUDGET = 0.05
+# Upgrade success chance (percent) for each multiplier
+UPGRADE_CHANCES = {
+    2: 46,
+    3: 30.67,
+    5: 18.4,
+    10: 9.2,
+    100: 0.92
+}
+
+# Crash points are rolled in the browser (CrashView.vue); keep these in sync with it
+CRASH_HOUSE_EDGE = 0.08
+CRASH_INSTANT_PROBABILITY = 0.01
 
 # Initialize OpenAI client with API key from environment
 api_key = os.getenv('OPENAI_API_KEY')
@@ -585,4 +652,9 @@ SOUVENIR_DROP_CHANCES = {
 }
 
 # Add souvenir chance
-SOUVENIR_CHANCE = 10  # 10% chance for souvenir items
\ No newline at end of file
+SOUVENIR_CHANCE = 10  # 10% chance for souvenir items
+
+# Opening a souvenir package (open_souvenir_case): rarity weights, and the float cutoffs
+# used to turn a rolled float back into one of the skin's valid wears
+SOUVENIR_PACKAGE_RARITY_WEIGHTS = {'purple': 5, 'blue': 20, 'light_blue': 75}
+SOUVENIR_WEAR_THRESHOLDS = {'FN': 0.07, 'MW': 0.15, 'FT': 0.37, 'WW': 0.44, 'BS': 1.0}
\ No newline at end of file
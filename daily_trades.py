@@ -1,9 +1,9 @@
 from datetime import datetime
-import json
 import random
 import traceback
 
-from config import CASE_FILE_MAPPING, STICKER_CAPSULE_FILE_MAPPING
+from catalog import get_catalog
+from storage import get_storage
 
 # Define wear ranges for float value generation
 WEAR_RANGES = {
@@ -21,58 +21,26 @@ def generate_float_value(wear):
     min_float, max_float = WEAR_RANGES[wear]
     return round(random.uniform(min_float, max_float), 8)
 
-def load_daily_trades():
-    """Load daily trades from JSON file"""
-    try:
-        with open('data/daily_trades.json', 'r') as f:
-            data = json.load(f)
-            if 'completed_trades' not in data:
-                data['completed_trades'] = []
-            return data
-    except FileNotFoundError:
+def load_daily_trades(user=None):
+    """Load a player's daily trades from the storage backend"""
+    data = get_storage().load_document('daily_trades', user)
+    if data is None:
         return {'date': datetime.now().strftime('%Y-%m-%d'), 'trades': [], 'completed_trades': []}
+    if 'completed_trades' not in data:
+        data['completed_trades'] = []
+    return data
 
-def save_daily_trades(trades_data):
-    """Save daily trades to JSON file"""
-    with open('data/daily_trades.json', 'w') as f:
-        json.dump(trades_data, f, indent=2)
+def save_daily_trades(trades_data, user=None):
+    """Save a player's daily trades to the storage backend"""
+    get_storage().save_document('daily_trades', trades_data, user)
 
 def generate_daily_trades():
     """Generate 10 random trades for the day"""
     try:
-        # Load all skins from case files
-        all_skins = []
-        for case_type, file_name in CASE_FILE_MAPPING.items():
-            try:
-                with open(f'cases/{file_name}.json', 'r') as f:
-                    case_data = json.load(f)
-                    for grade, skins in case_data['skins'].items():
-                        for skin in skins:
-                            skin['case_type'] = case_type
-                            skin['case_file'] = file_name
-                            skin['rarity'] = grade.upper()
-                            all_skins.append(skin)
-            except Exception as e:
-                print(f"Error loading case {case_type}: {e}")
-                continue
-            
-        # Load sticker data
-        sticker_data = {}
-        for capsule_type, file_name in STICKER_CAPSULE_FILE_MAPPING.items():
-            try:
-                with open(f'stickers/{file_name}.json', 'r') as f:
-                    capsule_data = json.load(f)
-                    for rarity, stickers in capsule_data['stickers'].items():
-                        for sticker in stickers:
-                            sticker['case_type'] = capsule_type
-                            sticker['rarity'] = rarity.upper()
-                            sticker_data[f"{sticker['name']}_{capsule_type}"] = sticker
-            except Exception as e:
-                print(f"Error loading sticker capsule {capsule_type}: {e}")
-                continue
-
-        # Convert sticker data to list
-        all_stickers = list(sticker_data.values())
+        # Skin and sticker pools come from the shared catalog; entries are only read here
+        catalog = get_catalog()
+        all_skins = list(catalog.iter_skins())
+        all_stickers = list(catalog.iter_stickers())
 
         bot_names = [
             {"name": "_Astrid47", "avatar": "bot1.png"},
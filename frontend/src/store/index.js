@@ -398,7 +398,8 @@ const methods = {
                     normal_clicks: normalClicks,
                     critical_clicks: criticalClicks,
                     auto_normal_clicks: autoNormalClicks,
-                    auto_critical_clicks: autoCriticalClicks
+                    auto_critical_clicks: autoCriticalClicks,
+                    multiplier: state.clicker.currentMultiplier
                 })
             })
             
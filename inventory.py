@@ -0,0 +1,274 @@
+import base64
+import heapq
+import json
+import threading
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+# Sort fields accepted by InventoryIndex.query; items missing the field sort as 0
+SORT_FIELDS = {
+    'price': 'price',
+    'timestamp': 'timestamp',
+    'float': 'float_value'
+}
+
+
+def new_item_id() -> str:
+    return uuid.uuid4().hex
+
+
+def ensure_item_ids(inventory: list) -> bool:
+    """Give every item without one a stable id. Returns True if any were added"""
+    added = False
+    for item in inventory:
+        if not item.get('id'):
+            item['id'] = new_item_id()
+            added = True
+    return added
+
+
+def item_rarity(item: dict) -> Optional[str]:
+    """Rarity in the catalog's upper-case form (older drops stored 'light_blue', 'purple', ...)"""
+    rarity = item.get('rarity')
+    return rarity.upper() if rarity else None
+
+
+def encode_cursor(sort_key: tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(sort_key)).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Inverse of encode_cursor. Raises ValueError for anything a client made up"""
+    try:
+        value, item_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (float(value), str(item_id))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def item_count(item: dict) -> int:
+    """How many items an inventory entry stands for; cases of one type stack under a quantity"""
+    return int(item.get('quantity', 1)) if item.get('is_case') else 1
+
+
+def item_value(item: dict) -> float:
+    return float(item.get('price') or 0) * item_count(item)
+
+
+def item_key(item: dict) -> tuple:
+    """What makes two items interchangeable for trades, jackpots and loadouts"""
+    if item.get('is_case'):
+        return ('case', item.get('type'))
+    if item.get('is_sticker'):
+        return ('sticker', item.get('name'), item.get('case_type'))
+    return ('skin', item.get('weapon'), item.get('name'), item.get('wear'), bool(item.get('stattrak')))
+
+
+class InventoryIndex:
+    """Secondary indexes over one version of the inventory, kept up to date as items are added and removed.
+
+    Items are shared with the in-memory user data, so they must not be modified.
+    """
+
+    def __init__(self, inventory: list):
+        self._lock = threading.RLock()
+        self.items = inventory     # the ordered list this index describes
+        self.by_id = {}            # id -> item
+        self.by_key = {}           # item_key -> {id: None}, in insertion order
+        self.by_case_type = {}     # case_type -> {id: None}
+        self.by_rarity = {}        # upper-case rarity -> {id: None}
+        self.favorites = {}        # {id: None}
+        self.cases = {}            # {id: None}
+        self.sellable = {}         # {id: None} for items sell_all would sell (not cases, not favorites)
+        # Running [count, value] totals, updated on every add and remove
+        self.totals = {'all': [0, 0.0], 'sellable': [0, 0.0], 'favorites': [0, 0.0], 'cases': [0, 0.0]}
+        self.rarity_totals = {}     # upper-case rarity -> [count, value]
+        self.case_type_totals = {}  # case_type -> [count, value]
+        self._positions = {}       # id -> position in items, None when it needs rebuilding
+        for position, item in enumerate(inventory):
+            self._add(item)
+            self._positions[item['id']] = position
+
+    def _add(self, item: dict):
+        item_id = item['id']
+        self.by_id[item_id] = item
+        self.by_key.setdefault(item_key(item), {})[item_id] = None
+        self.by_case_type.setdefault(item.get('case_type') or item.get('type'), {})[item_id] = None
+        self.by_rarity.setdefault(item_rarity(item), {})[item_id] = None
+        if item.get('favorite'):
+            self.favorites[item_id] = None
+        if item.get('is_case'):
+            self.cases[item_id] = None
+        elif not item.get('favorite'):
+            self.sellable[item_id] = None
+        self._count(item, 1)
+
+    def _remove(self, item: dict):
+        item_id = item['id']
+        self.by_id.pop(item_id, None)
+        for index, key in ((self.by_key, item_key(item)),
+                           (self.by_case_type, item.get('case_type') or item.get('type')),
+                           (self.by_rarity, item_rarity(item))):
+            ids = index.get(key)
+            if ids is not None:
+                ids.pop(item_id, None)
+                if not ids:
+                    del index[key]
+        self.favorites.pop(item_id, None)
+        self.cases.pop(item_id, None)
+        self.sellable.pop(item_id, None)
+        self._count(item, -1)
+
+    def _count(self, item: dict, sign: int):
+        count, value = sign * item_count(item), sign * item_value(item)
+        partitions = [self.totals['all']]
+        if item.get('is_case'):
+            partitions.append(self.totals['cases'])
+        elif item.get('favorite'):
+            partitions.append(self.totals['favorites'])
+        else:
+            partitions.append(self.totals['sellable'])
+        groups = ((self.rarity_totals, item_rarity(item)),
+                  (self.case_type_totals, item.get('case_type') or item.get('type')))
+        for grouped, key in groups:
+            partitions.append(grouped.setdefault(key, [0, 0.0]))
+        for totals in partitions:
+            totals[0] += count
+            # Reset emptied partitions so float rounding can't leave a stray -0.0000001 behind
+            totals[1] = totals[1] + value if totals[0] else 0.0
+        for grouped, key in groups:
+            if not grouped[key][0]:
+                del grouped[key]
+
+    def apply_changes(self, inventory: list, start: int, removed: List[dict], added: List[dict]):
+        """Move to a new inventory version where removed items at start were replaced by added ones"""
+        with self._lock:
+            for item in removed:
+                self._remove(item)
+            for item in added:
+                self._add(item)
+            self.items = inventory
+
+            if self._positions is not None and len(removed) == len(added):
+                # Appends and in-place edits (favorites, case quantities) don't move anything else
+                for item in removed:
+                    self._positions.pop(item['id'], None)
+                for offset, item in enumerate(added):
+                    self._positions[item['id']] = start + offset
+            else:
+                self._positions = None
+
+    def position_of(self, item_id: str) -> Optional[int]:
+        with self._lock:
+            if self._positions is None:
+                self._positions = {item['id']: position for position, item in enumerate(self.items)}
+            return self._positions.get(item_id)
+
+    def get(self, item_id: str) -> Optional[dict]:
+        return self.by_id.get(item_id)
+
+    def find(self, template: dict) -> Optional[dict]:
+        """The item with template's id, or else the first one interchangeable with it"""
+        with self._lock:
+            if template.get('id') in self.by_id:
+                return self.by_id[template['id']]
+            ids = self.by_key.get(item_key(template))
+            return self.by_id[next(iter(ids))] if ids else None
+
+    def ids_for_key(self, key: tuple) -> List[str]:
+        with self._lock:
+            return list(self.by_key.get(key, ()))
+
+    def ids_for_case_type(self, case_type: str) -> List[str]:
+        with self._lock:
+            return list(self.by_case_type.get(case_type, ()))
+
+    def favorite_ids(self) -> List[str]:
+        with self._lock:
+            return list(self.favorites)
+
+    def case_ids(self) -> List[str]:
+        with self._lock:
+            return list(self.cases)
+
+    def query(self, rarity: Optional[str] = None, case_type: Optional[str] = None,
+              stattrak: Optional[bool] = None, sticker: Optional[bool] = None,
+              favorite: Optional[bool] = None, min_price: Optional[float] = None,
+              max_price: Optional[float] = None, sort: str = 'timestamp', descending: bool = True,
+              cursor: Optional[str] = None, limit: Optional[int] = 50) -> Tuple[List[dict], Optional[str]]:
+        """One page of items matching the filters, plus the cursor for the next page (None on the last one).
+
+        Pages are ordered by (sort field, id), so a cursor stays valid while items are added or sold.
+        A limit of None returns every match.
+        """
+        if sort not in SORT_FIELDS:
+            raise ValueError(f'Invalid sort field: {sort}')
+        field = SORT_FIELDS[sort]
+        after = decode_cursor(cursor) if cursor else None
+
+        with self._lock:
+            # Start from the narrowest secondary index that applies
+            candidates = [ids for ids in (
+                self.by_rarity.get(rarity.upper(), {}) if rarity else None,
+                self.by_case_type.get(case_type, {}) if case_type else None,
+                self.favorites if favorite else None
+            ) if ids is not None]
+            ids = min(candidates, key=len) if candidates else self.by_id
+            items = [self.by_id[item_id] for item_id in ids]
+
+        def matches(item):
+            if rarity and item_rarity(item) != rarity.upper():
+                return False
+            if case_type and (item.get('case_type') or item.get('type')) != case_type:
+                return False
+            if stattrak is not None and bool(item.get('stattrak')) != stattrak:
+                return False
+            if sticker is not None and bool(item.get('is_sticker')) != sticker:
+                return False
+            if favorite is not None and bool(item.get('favorite')) != favorite:
+                return False
+            price = float(item.get('price') or 0)
+            if min_price is not None and price < min_price:
+                return False
+            if max_price is not None and price > max_price:
+                return False
+            return True
+
+        def sort_key(item):
+            value = float(item.get(field) or 0)
+            return (-value if descending else value, item['id'])
+
+        keyed = ((sort_key(item), item) for item in items if matches(item))
+        if after is not None:
+            keyed = (pair for pair in keyed if pair[0] > after)
+        if limit is None:
+            return [item for _, item in sorted(keyed, key=lambda pair: pair[0])], None
+
+        # Only the page (plus one item to know whether there's more) needs ordering
+        page = heapq.nsmallest(limit + 1, keyed, key=lambda pair: pair[0])
+        next_cursor = encode_cursor(page[limit - 1][0]) if len(page) > limit else None
+        return [item for _, item in page[:limit]], next_cursor
+
+    def summary(self) -> dict:
+        """Item counts and values overall, per partition, per rarity and per case type"""
+        def rounded(totals):
+            return {'count': totals[0], 'value': round(totals[1], 2)}
+        with self._lock:
+            summary = {name: rounded(totals) for name, totals in self.totals.items()}
+            summary['by_rarity'] = {rarity: rounded(totals) for rarity, totals in self.rarity_totals.items()
+                                    if rarity is not None}
+            summary['by_case_type'] = {case_type: rounded(totals)
+                                       for case_type, totals in self.case_type_totals.items()
+                                       if case_type is not None}
+            return summary
+
+    def sellable_partition(self) -> Tuple[List[str], List[str], int, float]:
+        """Ids of kept cases and kept favorites, plus the count and value of everything else"""
+        with self._lock:
+            count, value = self.totals['sellable']
+            favorite_ids = [item_id for item_id in self.favorites if item_id not in self.cases]
+            return list(self.cases), favorite_ids, count, value
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return {'items': len(self.by_id), 'favorites': len(self.favorites), 'cases': len(self.cases)}
@@ -0,0 +1,81 @@
+"""Checks the running inventory totals against the inventory they describe.
+
+    python inventory_check.py [--buys 3] [--quantity 2]
+
+Buys a case and then a souvenir case --buys times each, so every buy after the first grows a
+stacked entry, and after each one compares /api/inventory/summary with the expected stack and
+with a summary built from scratch. Runs in a temporary directory with a copy of the catalog, so
+the real data/ files are never touched. Exits non-zero on a mismatch.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from auction_clock_check import CATALOG_DIRS
+
+
+def check_buys(app, buys: int, quantity: int) -> list:
+    """Buy a case and a souvenir case repeatedly, comparing the totals after each buy. Returns the mismatches"""
+    from inventory import InventoryIndex
+    from user_data import load_user_data, save_user_data
+
+    user_data = load_user_data()
+    user_data['balance'] = 1_000_000_000.0
+    save_user_data(user_data)
+
+    purchases = [('/buy_case', next(iter(app.get_case_prices()))),
+                 ('/buy_souvenir_case', next(iter(app.SOUVENIR_CASE_TYPES)))]
+    problems = []
+    client = app.app.test_client()
+    for route, case_type in purchases:
+        for buy in range(1, buys + 1):
+            response = client.post(route, json={'case_type': case_type, 'quantity': quantity}).get_json()
+            if not response.get('success'):
+                return problems + [f"{case_type} buy {buy} failed: {response}"]
+            summary = client.get('/api/inventory/summary').get_json()
+            inventory = load_user_data()['inventory']
+            stack = next(item for item in inventory if item.get('is_case') and item.get('type') == case_type)
+            # Regular cases don't store a price, so they count but add no value
+            expected = {'count': buy * quantity, 'value': round(float(stack.get('price') or 0) * buy * quantity, 2)}
+            if summary['by_case_type'].get(case_type) != expected:
+                problems.append(f"{case_type} buy {buy}: {summary['by_case_type'].get(case_type)}, "
+                                f"expected {expected}")
+            rebuilt = InventoryIndex(inventory).summary()
+            if summary != rebuilt:
+                problems.append(f"{case_type} buy {buy}: running totals {summary} differ from rebuilt {rebuilt}")
+        print(f"{case_type}: {buys} buys of {quantity}, {summary['by_case_type'][case_type]}")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check inventory totals as cases stack up.')
+    parser.add_argument('--buys', type=int, default=3)
+    parser.add_argument('--quantity', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Data and catalog paths are relative to the working directory
+        for name in CATALOG_DIRS:
+            shutil.copytree(os.path.join(here, name), os.path.join(workdir, name))
+        os.makedirs(os.path.join(workdir, 'data'))
+        os.chdir(workdir)
+        try:
+            import app
+            problems = check_buys(app, args.buys, args.quantity)
+            app.cleanup_auction()
+        finally:
+            os.chdir(cwd)
+
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,79 +1,92 @@
 import random
 import math
+from functools import lru_cache
 from typing import List, Dict, Tuple
 
+HOUSE_EDGE = 0.05
+
+@lru_cache(maxsize=None)
+def multiplier_table(grid_size: int, num_mines: int) -> Tuple[float, ...]:
+    """Multiplier after 1, 2, ... safe reveals. Each step is rounded to 2 decimals, like the game always has"""
+    total_tiles = grid_size * grid_size
+    multiplier = 1.0
+    table = []
+    for k in range(total_tiles - num_mines):
+        # Odds of the next tile being safe with k tiles already revealed
+        factor = (total_tiles - k) / (total_tiles - k - num_mines)
+        factor = factor * (1 - HOUSE_EDGE)
+        multiplier = round(multiplier * factor, 2)
+        table.append(multiplier)
+    return tuple(table)
+
+def survival_chance(grid_size: int, num_mines: int, reveals: int) -> float:
+    """Chance that the first `reveals` tiles picked are all safe"""
+    total_tiles = grid_size * grid_size
+    return math.comb(total_tiles - num_mines, reveals) / math.comb(total_tiles, reveals)
+
+def expected_rtp(grid_size: int, num_mines: int, reveals: int) -> float:
+    """Exact return per unit bet when cashing out after `reveals` safe tiles"""
+    return survival_chance(grid_size, num_mines, reveals) * multiplier_table(grid_size, num_mines)[reveals - 1]
+
 class MinesGame:
+    """One round of mines. The mine layout and the revealed tiles are bitmasks over the board, with
+    bit x * grid_size + y standing for tile (x, y), so a game is a handful of ints"""
+    
+    __slots__ = ('grid_size', 'num_mines', 'bet_amount', 'mines', 'revealed_mask', 'game_over', 'won',
+                 'current_multiplier')
+    
     def __init__(self, grid_size: int, num_mines: int, bet_amount: float):
         self.grid_size = grid_size
         self.num_mines = num_mines
         self.bet_amount = bet_amount
-        self.grid = self._create_grid()
-        self.revealed = set()  # Set of revealed positions (x, y)
+        self.mines = self._place_mines()
+        self.revealed_mask = 0
         self.game_over = False
         self.won = False
         self.current_multiplier = 1.0  # Start with multiplier of 1
     
-    def _create_grid(self) -> List[List[bool]]:
-        """Creates a grid with randomly placed mines. True represents a mine."""
-        total_tiles = self.grid_size * self.grid_size
-        # Create a list of all positions
-        positions = [(x, y) for x in range(self.grid_size) for y in range(self.grid_size)]
-        # Randomly select positions for mines
-        mine_positions = random.sample(positions, self.num_mines)
-        
-        # Create the grid
-        grid = [[False] * self.grid_size for _ in range(self.grid_size)]
-        for x, y in mine_positions:
-            grid[x][y] = True
-            
-        return grid
+    def _place_mines(self) -> int:
+        """Randomly places the mines. Returns the layout as a bitmask."""
+        mask = 0
+        for tile in random.sample(range(self.grid_size * self.grid_size), self.num_mines):
+            mask |= 1 << tile
+        return mask
+    
+    @property
+    def grid(self) -> List[List[bool]]:
+        """The board as the frontend expects it: grid[x][y] is True for a mine"""
+        size = self.grid_size
+        return [[bool(self.mines >> (x * size + y) & 1) for y in range(size)] for x in range(size)]
+    
+    @property
+    def revealed(self) -> List[Tuple[int, int]]:
+        size = self.grid_size
+        return [divmod(tile, size) for tile in range(size * size) if self.revealed_mask >> tile & 1]
+    
+    @property
+    def revealed_count(self) -> int:
+        return bin(self.revealed_mask).count('1')
     
     def reveal(self, x: int, y: int) -> Dict:
         """Reveals a tile at position (x, y). Returns game state."""
         if self.game_over:
             return {"error": "Game is already over"}
             
-        if (x, y) in self.revealed:
+        if not (0 <= x < self.grid_size and 0 <= y < self.grid_size):
+            return {"error": "Tile is off the board"}
+            
+        bit = 1 << (x * self.grid_size + y)
+        if self.revealed_mask & bit:
             return {"error": "Tile already revealed"}
             
-        # Debug: Print initial state
-        print(f"\nDEBUG: Starting reveal at ({x}, {y})")
-        print(f"DEBUG: Current multiplier before calculation: {self.current_multiplier}")
+        # Multiplier for this reveal, including the tiles already revealed
+        self.current_multiplier = multiplier_table(self.grid_size, self.num_mines)[self.revealed_count]
         
-        # Update multiplier before adding new tile to revealed set
-        total_tiles = self.grid_size * self.grid_size
-        k = len(self.revealed)  # k is the number of previously revealed tiles
-        
-        # Calculate multiplier for this specific reveal
-        numerator = total_tiles - k
-        denominator = total_tiles - k - self.num_mines
-        
-        # Debug: Print calculation details
-        print(f"DEBUG: Grid size: {self.grid_size}x{self.grid_size}")
-        print(f"DEBUG: Total tiles: {total_tiles}")
-        print(f"DEBUG: Number of mines: {self.num_mines}")
-        print(f"DEBUG: Previously revealed tiles (k): {k}")
-        print(f"DEBUG: Numerator (total_tiles - k): {numerator}")
-        print(f"DEBUG: Denominator (total_tiles - k - num_mines): {denominator}")
-        
-        factor = numerator / denominator
-        print(f"DEBUG: Factor for this reveal (numerator/denominator): {factor}")
-        
-        # Apply 5% house edge
-        factor = factor * 0.95
-        print(f"DEBUG: Factor after house edge: {factor}")
-        
-        self.current_multiplier *= factor
-        print(f"DEBUG: New multiplier after multiplication: {self.current_multiplier}")
-        
-        self.current_multiplier = round(self.current_multiplier, 2)
-        print(f"DEBUG: Final multiplier after rounding: {self.current_multiplier}")
-        
-        # Now add to revealed set
-        self.revealed.add((x, y))
+        # Now mark it revealed
+        self.revealed_mask |= bit
         
         # Check if mine hit
-        if self.grid[x][y]:
+        if self.mines & bit:
             self.game_over = True
             return {
                 "status": "game_over",
@@ -84,11 +97,10 @@ class MinesGame:
             }
         
         potential_win = self.bet_amount * self.current_multiplier
-        print(f"DEBUG: Potential win: ${potential_win}")
         
         # Check if all safe tiles revealed (win condition)
         total_safe_tiles = self.grid_size * self.grid_size - self.num_mines
-        if len(self.revealed) == total_safe_tiles:
+        if self.revealed_count == total_safe_tiles:
             self.game_over = True
             self.won = True
             return {
@@ -102,7 +114,7 @@ class MinesGame:
         return {
             "status": "continue",
             "hit_mine": False,
-            "revealed": list(self.revealed),
+            "revealed": self.revealed,
             "multiplier": self.current_multiplier,
             "potential_win": potential_win
         }
@@ -112,20 +124,48 @@ class MinesGame:
         if self.game_over:
             return {"error": "Game is already over"}
             
-        if not self.revealed:
+        if not self.revealed_mask:
             return {"error": "Must reveal at least one tile to cash out"}
             
         self.game_over = True
         self.won = True
+        # Pay out from the table rather than whatever multiplier the game object carries around
+        self.current_multiplier = multiplier_table(self.grid_size, self.num_mines)[self.revealed_count - 1]
         
         return {
             "status": "cash_out",
             "multiplier": self.current_multiplier,
             "win_amount": self.bet_amount * self.current_multiplier,
-            "revealed": list(self.revealed),
+            "revealed": self.revealed,
             "grid": self.grid
         }
     
+    def to_dict(self) -> Dict:
+        """Everything needed to pick the game up again, as plain JSON types"""
+        return {
+            "grid_size": self.grid_size,
+            "num_mines": self.num_mines,
+            "bet_amount": self.bet_amount,
+            "mines": self.mines,
+            "revealed": self.revealed_mask,
+            "game_over": self.game_over,
+            "won": self.won,
+            "current_multiplier": self.current_multiplier
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'MinesGame':
+        game = cls.__new__(cls)
+        game.grid_size = data["grid_size"]
+        game.num_mines = data["num_mines"]
+        game.bet_amount = data["bet_amount"]
+        game.mines = data["mines"]
+        game.revealed_mask = data["revealed"]
+        game.game_over = data["game_over"]
+        game.won = data["won"]
+        game.current_multiplier = data["current_multiplier"]
+        return game
+    
     @staticmethod
     def validate_params(grid_size: int, num_mines: int, bet_amount: float) -> Tuple[bool, str]:
         """Validates game parameters."""
@@ -1,8 +1,8 @@
 from dataclasses import dataclass
 import random
 from typing import List, Union
-import json
 import time
+from catalog import get_catalog
 from config import Rarity, Wear
 
 @dataclass
@@ -16,26 +16,9 @@ class Skin:
     
     def get_price(self) -> float:
         try:
-            # Get the correct case file based on case_type
-            case_file = {
-                'csgo': 'weapon_case_1',
-                'esports': 'esports_2013',
-                'bravo': 'operation_bravo'
-            }.get(self.case_type, 'weapon_case_1')
-            
-            with open(f'cases/{case_file}.json', 'r') as f:
-                case_data = json.load(f)
-                
-            # Search through all rarity categories
-            for grade, skins in case_data['skins'].items():
-                for skin in skins:
-                    if skin['weapon'] == self.weapon and skin['name'] == self.name:
-                        prices = skin['prices']
-                        wear_key = 'NO' if 'NO' in prices else self.wear.name
-                        if self.stattrak:
-                            return prices.get(f"ST_{wear_key}", 0)
-                        return prices.get(wear_key, 0)
-            return 0
+            # case_type may hold either the case type or its file name
+            return get_catalog().get_base_price(self.case_type, self.weapon, self.name,
+                                                self.wear.name, self.stattrak)
         except Exception as e:
             print(f"Error getting price: {e}")
             return 0
@@ -82,12 +65,67 @@ class User:
             self.exp -= RANK_EXP[self.rank]
             self.rank += 1
 
+class AliasTable:
+    """Walker alias table for O(1) weighted sampling"""
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        self.n = n
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        scaled = [w * n / total for w in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s = small.pop()
+            l = large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(l)
+            else:
+                large.append(l)
+        # Whatever is left over is 1.0 up to rounding error
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self) -> int:
+        i = random.randrange(self.n)
+        return i if random.random() < self.prob[i] else self.alias[i]
+
+
 class Case:
     def __init__(self, name: str, contents: dict, file_name: str, is_souvenir: bool = False):
+        """contents maps Rarity -> list of (weapon, name, valid_wears) tuples"""
         self.name = name
         self.contents = contents
         self.file_name = file_name
         self.is_souvenir = is_souvenir
+        self.bulk_table = None  # NumPy version of the drop table, built lazily by open_many
+        self._compile_drop_table()
+
+    def _compile_drop_table(self):
+        """Build the rarity alias table and per-skin wear options once, so opening needs no I/O"""
+        self.drop_rarities = []
+        self.drop_skins = []
+        weights = []
+        for grade, chance in self.get_drop_chances().items():
+            rarity = Rarity[grade.upper()]
+            skins = []
+            for weapon, skin_name, valid_wears in self.contents.get(rarity, []):
+                wears = [Wear[w] for w in valid_wears if w in Wear.__members__]
+                # Vanilla knives only have a 'NO' wear; they drop as FT without StatTrak
+                skins.append((weapon, skin_name, wears or [Wear.FT], bool(wears)))
+            if skins and chance > 0:
+                self.drop_rarities.append(rarity)
+                self.drop_skins.append(skins)
+                weights.append(chance)
+        self.drop_weights = weights
+        self.rarity_table = AliasTable(weights) if weights else None
+        self.special_chance = self.get_special_chance() / 100
 
     def get_drop_chances(self) -> dict:
         """Get the drop chances based on case type"""
@@ -116,66 +154,25 @@ class Case:
         return "Souvenir" if self.is_souvenir else "StatTrak™"
 
     def open(self) -> Skin:
-        # Roll for rarity based on percentages
-        roll = random.random() * 100
+        if self.rarity_table is None:
+            return None
         
-        if roll < 0.26:  # 0.26% chance for Gold/Knives
-            chosen_rarity = Rarity.GOLD
-        elif roll < 0.26 + 0.90:  # 0.90% chance for Red
-            chosen_rarity = Rarity.RED
-        elif roll < 0.26 + 0.90 + 4.10:  # 4.10% chance for Pink
-            chosen_rarity = Rarity.PINK
-        elif roll < 0.26 + 0.90 + 4.10 + 20.08:  # 20.08% chance for Purple
-            chosen_rarity = Rarity.PURPLE
-        else:  # Remaining ~74.66% chance for Blue
-            chosen_rarity = Rarity.BLUE
+        # Roll for rarity using the case's drop chances
+        index = self.rarity_table.sample()
+        chosen_rarity = self.drop_rarities[index]
         
         # Select random skin from chosen rarity
-        possible_skins = self.contents.get(chosen_rarity, [])
-        if not possible_skins:
-            return None
+        weapon, skin_name, wears, can_be_stattrak = random.choice(self.drop_skins[index])
+        chosen_wear = random.choice(wears)
         
-        chosen_skin = random.choice(possible_skins)
-        
-        try:
-            # Load case data to get valid wears
-            with open(f'cases/{self.file_name}.json', 'r') as f:
-                case_data = json.load(f)
-                
-            # Find the skin in the case data
-            skin_data = None
-            for rarity in case_data['skins'].values():
-                for skin in rarity:
-                    if skin['weapon'] == chosen_skin[0] and skin['name'] == chosen_skin[1]:
-                        skin_data = skin
-                        break
-                if skin_data:
-                    break
-            
-            if skin_data:
-                valid_wears = skin_data['valid_wears']
-                chosen_wear = Wear[random.choice(valid_wears)]
-                
-                # On top of the normal roll there is a 10% chance to get a StatTrak™ skin
-                stattrak = random.random() < 0.10
-                
-                return Skin(
-                    chosen_skin[0], 
-                    chosen_skin[1], 
-                    chosen_rarity, 
-                    chosen_wear, 
-                    stattrak,
-                    self.file_name
-                )
-        except Exception as e:
-            print(f"Error in Case.open(): {e}")
+        # On top of the normal roll there is a 10% chance to get a StatTrak™ skin
+        stattrak = can_be_stattrak and random.random() < self.special_chance
         
-        # Fallback to FT wear if something goes wrong as FT is the most common wear
         return Skin(
-            chosen_skin[0],
-            chosen_skin[1],
+            weapon,
+            skin_name,
             chosen_rarity,
-            Wear.FT,
-            False,
+            chosen_wear,
+            stattrak,
             self.file_name
-        ) 
\ No newline at end of file
+        )
@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+class FakeClock:
+    """A clock that only moves when told to, for driving an EventScheduler by hand"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class ScheduledEvent:
+    __slots__ = ('when', 'name', 'callback', 'cancelled')
+
+    def __init__(self, when: float, name: str, callback: Callable[[], None]):
+        self.when = when
+        self.name = name
+        self.callback = callback
+        self.cancelled = False
+
+
+class EventScheduler:
+    """Runs callbacks at timestamps from a heap, on one thread that sleeps until the next one is due.
+
+    Events are named and there is at most one pending event per name, so scheduling 'auction_close'
+    again simply moves it. With a FakeClock, skip start() and call run_due() after advancing the clock.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._heap = []
+        self._pending: Dict[str, ScheduledEvent] = {}
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def schedule_at(self, when: float, name: str, callback: Callable[[], None]) -> ScheduledEvent:
+        """Run callback at clock time `when`, replacing any pending event with the same name"""
+        event = ScheduledEvent(when, name, callback)
+        with self._cond:
+            previous = self._pending.get(name)
+            if previous is not None:
+                previous.cancelled = True
+            self._pending[name] = event
+            heapq.heappush(self._heap, (when, next(self._seq), event))
+            # Wake the thread only if this is now the first thing due
+            if self._heap[0][2] is event:
+                self._cond.notify()
+        return event
+
+    def schedule_in(self, delay: float, name: str, callback: Callable[[], None]) -> ScheduledEvent:
+        return self.schedule_at(self.clock() + delay, name, callback)
+
+    def cancel(self, name: str) -> bool:
+        with self._cond:
+            event = self._pending.pop(name, None)
+            if event is None:
+                return False
+            event.cancelled = True
+            return True
+
+    def next_time(self, name: str) -> Optional[float]:
+        """When the pending event with this name will run, or None"""
+        with self._cond:
+            event = self._pending.get(name)
+            return event.when if event else None
+
+    def _pop_due(self, now: float) -> Optional[ScheduledEvent]:
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if not self._heap or self._heap[0][0] > now:
+            return None
+        event = heapq.heappop(self._heap)[2]
+        if self._pending.get(event.name) is event:
+            del self._pending[event.name]
+        return event
+
+    def _run(self, event: ScheduledEvent):
+        try:
+            event.callback()
+        except Exception as e:
+            print(f"Error in scheduled event {event.name}: {e}")
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """Run every event due by now (default: the clock), including ones they schedule. Returns how many ran"""
+        now = self.clock() if now is None else now
+        ran = 0
+        while True:
+            with self._cond:
+                event = self._pop_due(now)
+            if event is None:
+                return ran
+            self._run(event)
+            ran += 1
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    event = self._pop_due(self.clock())
+                    if event is not None:
+                        break
+                    # Sleep until the first event is due, or indefinitely when nothing is scheduled
+                    timeout = max(0.0, self._heap[0][0] - self.clock()) if self._heap else None
+                    self._cond.wait(timeout)
+            self._run(event)
+
+    def start(self):
+        """Start the scheduler thread if it isn't running yet"""
+        with self._cond:
+            if self._thread is None:
+                self._stopped = False
+                self._thread = threading.Thread(target=self._loop, daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._pending)
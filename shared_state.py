@@ -0,0 +1,371 @@
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+from config import SHARED_STATE, SHARED_STATE_DB
+from storage import get_storage
+
+# Auction events kept in the shared log for workers and reconnecting streams to catch up from
+SHARED_EVENT_HISTORY = 1000
+# LocalSessionStore writes its sessions out this many seconds after a change, so a burst of them is one write
+SESSION_SAVE_DELAY = 1
+
+
+class LocalSessionStore:
+    """Sessions in an in-memory LRU: each expires ttl seconds after it was last used, and the least
+    recently used go once there are more than max_size.
+
+    They're saved to the storage document of the same name SESSION_SAVE_DELAY seconds after a
+    change (and at exit), and read back on first use, so they survive restarts and crashes alike,
+    bar the last moment's changes. Values must be plain JSON types.
+    """
+
+    def __init__(self, name: str, ttl: float, max_size: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = {'expired': 0, 'evicted': 0}
+        self._sessions = OrderedDict()  # key -> (expires, value), least recently used first
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._save_timer = None
+        atexit.register(self.save)
+
+    def _load(self):
+        """Needs _lock"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            document = get_storage().load_document(self.name) or {}
+        except Exception as e:
+            print(f"Error loading {self.name}: {e}")
+            return
+        # Saved oldest first, so the LRU order comes back too
+        for key, (expires, value) in document.get('sessions', {}).items():
+            self._sessions[key] = (expires, value)
+        self._prune(time.time())
+
+    def _prune(self, now: float):
+        """Needs _lock. Every session gets the same ttl, so the expired ones are all at the front"""
+        while self._sessions:
+            expires = next(iter(self._sessions.values()))[0]
+            if expires > now:
+                break
+            self._sessions.popitem(last=False)
+            self.stats['expired'] += 1
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+            self.stats['evicted'] += 1
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            self._load()
+            session = self._sessions.pop(key, None)
+            if session is None:
+                return None
+            if session[0] <= now:
+                self.stats['expired'] += 1
+                return None
+            self._sessions[key] = (now + self.ttl, session[1])
+            return session[1]
+
+    def put(self, key: str, value):
+        now = time.time()
+        with self._lock:
+            self._load()
+            self._sessions.pop(key, None)
+            self._sessions[key] = (now + self.ttl, value)
+            self._prune(now)
+            self._schedule_save()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._load()
+            if self._sessions.pop(key, None) is not None:
+                self._schedule_save()
+
+    def _schedule_save(self):
+        """Needs _lock"""
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(SESSION_SAVE_DELAY, self._save_later)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def _save_later(self):
+        with self._lock:
+            self._save_timer = None
+        self.save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._prune(time.time())
+            return len(self._sessions)
+
+    def save(self):
+        # One write at a time, so an older copy can't land after a newer one
+        with self._save_lock:
+            with self._lock:
+                if not self._loaded or not self._dirty:
+                    return
+                self._prune(time.time())
+                sessions = {key: list(session) for key, session in self._sessions.items()}
+                self._dirty = False
+            try:
+                get_storage().save_document(self.name, {'sessions': sessions})
+            except Exception as e:
+                print(f"Error saving {self.name}: {e}")
+                with self._lock:
+                    self._schedule_save()
+
+
+class LocalState:
+    """State kept in this process's memory, for running as a single process (the default).
+
+    Values are stored as given, so don't change what get() returns; set() it again instead.
+    """
+
+    name = 'local'
+    multi_process = False
+
+    def __init__(self):
+        self._values = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def get(self, key: str, default=None):
+        return self._values.get(key, default)
+
+    def set(self, key: str, value):
+        self._values[key] = value
+
+    def delete(self, key: str):
+        self._values.pop(key, None)
+
+    def lock(self, name: str):
+        """A reentrant lock for everything guarded by name"""
+        with self._guard:
+            if name not in self._locks:
+                self._locks[name] = threading.RLock()
+            return self._locks[name]
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # The only process is always the leader
+        return True
+
+    def release_lease(self, name: str, owner: str):
+        pass
+
+    def sessions(self, name: str, ttl: float, max_size: int) -> LocalSessionStore:
+        return LocalSessionStore(name, ttl, max_size)
+
+
+class SqliteSessionStore:
+    """Sessions in the shared database, with the same expiry and size limit as LocalSessionStore.
+
+    Using a session pushes its expiry back, so the earliest expiries are also the least recently used.
+    """
+
+    def __init__(self, state: 'SqliteSharedState', name: str, ttl: float, max_size: int):
+        self._state = state
+        self.name = name
+        self.ttl = ttl
+        self.max_size = max_size
+        self.stats = {'expired': 0, 'evicted': 0}
+
+    def get(self, key: str):
+        now = time.time()
+        conn = self._state.conn
+        row = conn.execute('SELECT value, expires FROM sessions WHERE store = ? AND key = ?',
+                           (self.name, key)).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self.stats['expired'] += 1
+            return None
+        conn.execute('UPDATE sessions SET expires = ? WHERE store = ? AND key = ?', (now + self.ttl, self.name, key))
+        return json.loads(row[0])
+
+    def put(self, key: str, value):
+        now = time.time()
+        conn = self._state.conn
+        with self._state.lock(self.name):
+            conn.execute('INSERT OR REPLACE INTO sessions (store, key, value, expires) VALUES (?, ?, ?, ?)',
+                         (self.name, key, json.dumps(value), now + self.ttl))
+            self.stats['expired'] += conn.execute('DELETE FROM sessions WHERE store = ? AND expires <= ?',
+                                                  (self.name, now)).rowcount
+            excess = conn.execute('SELECT COUNT(*) FROM sessions WHERE store = ?',
+                                  (self.name,)).fetchone()[0] - self.max_size
+            if excess > 0:
+                conn.execute('DELETE FROM sessions WHERE store = ? AND key IN '
+                             '(SELECT key FROM sessions WHERE store = ? ORDER BY expires LIMIT ?)',
+                             (self.name, self.name, excess))
+                self.stats['evicted'] += excess
+
+    def delete(self, key: str):
+        self._state.conn.execute('DELETE FROM sessions WHERE store = ? AND key = ?', (self.name, key))
+
+    def __len__(self) -> int:
+        return self._state.conn.execute('SELECT COUNT(*) FROM sessions WHERE store = ? AND expires > ?',
+                                        (self.name, time.time())).fetchone()[0]
+
+    def save(self):
+        # Always stored already
+        pass
+
+
+class _StoreLock:
+    """Held by one thread in one process at a time: a thread lock in front of a write transaction"""
+
+    def __init__(self, state: 'SqliteSharedState'):
+        self._state = state
+
+    def __enter__(self):
+        self._state._begin()
+        return self
+
+    def __exit__(self, *exc):
+        self._state._end()
+
+
+class SqliteSharedState:
+    """State shared by every worker process through one SQLite database in WAL mode.
+
+    Values are stored as JSON. There is a single write lock for the whole store: lock() returns it
+    whatever the name, and it is reentrant, so code guarded by different names can nest freely.
+    """
+
+    name = 'sqlite'
+    multi_process = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            store TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            expires REAL NOT NULL,
+            PRIMARY KEY (store, key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (store, expires);
+    """
+
+    def __init__(self, path: str = SHARED_STATE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._thread_lock = threading.Lock()
+        self._store_lock = _StoreLock(self)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # One connection per thread, and never one inherited from the process we were forked from
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Autocommit, so the only transactions are the ones lock() opens
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+        return conn
+
+    def _begin(self):
+        conn = self.conn
+        if self._local.depth == 0:
+            # Threads of this process queue here instead of polling SQLite's busy handler
+            self._thread_lock.acquire()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+            except Exception:
+                self._thread_lock.release()
+                raise
+        self._local.depth += 1
+
+    def _end(self):
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            # Committed even after an error: whatever happened outside the store isn't undone either
+            try:
+                self.conn.execute('COMMIT')
+            finally:
+                self._thread_lock.release()
+
+    def lock(self, name: str) -> _StoreLock:
+        return self._store_lock
+
+    def get(self, key: str, default=None):
+        row = self.conn.execute('SELECT value FROM state WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, key: str, value):
+        self.conn.execute('INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                          (key, json.dumps(value, default=str)))
+
+    def delete(self, key: str):
+        self.conn.execute('DELETE FROM state WHERE key = ?', (key,))
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease on name for ttl seconds; False while another owner's lease is unexpired"""
+        now = time.time()
+        with self._store_lock:
+            row = self.conn.execute('SELECT owner, expires FROM leases WHERE name = ?', (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            self.conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires) VALUES (?, ?, ?)',
+                              (name, owner, now + ttl))
+            return True
+
+    def release_lease(self, name: str, owner: str):
+        self.conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+    def sessions(self, name: str, ttl: float, max_size: int) -> SqliteSessionStore:
+        return SqliteSessionStore(self, name, ttl, max_size)
+
+    def append_event(self, event: str, data: dict) -> int:
+        """Add an event to the shared log and return its id"""
+        with self._store_lock:
+            event_id = self.conn.execute('INSERT INTO events (event, data) VALUES (?, ?)',
+                                         (event, json.dumps(data, default=str))).lastrowid
+            if event_id % 100 == 0:
+                self.conn.execute('DELETE FROM events WHERE id <= ?', (event_id - SHARED_EVENT_HISTORY,))
+        return event_id
+
+    def events_after(self, event_id: int) -> List[Tuple[int, str, dict]]:
+        """(id, event, data) for every logged event after event_id, oldest first"""
+        rows = self.conn.execute('SELECT id, event, data FROM events WHERE id > ? ORDER BY id', (event_id,))
+        return [(row_id, event, json.loads(data)) for row_id, event, data in rows]
+
+    def last_event_id(self) -> int:
+        row = self.conn.execute('SELECT MAX(id) FROM events').fetchone()
+        return row[0] or 0
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """SqliteSharedState with SHARED_STATE=1, otherwise LocalState"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = SqliteSharedState() if SHARED_STATE else LocalState()
+        return _state
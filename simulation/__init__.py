@@ -0,0 +1,7 @@
+"""Batched Monte Carlo simulations of the casino games, for checking RTP and house edge.
+
+Run `python -m simulation --help` for the command line interface.
+"""
+from simulation.games import (SIMULATORS, ReturnStats, crash_points, simulate_blackjack, simulate_case_ev,
+                              simulate_coinflip, simulate_crash, simulate_mines, simulate_roulette,
+                              simulate_upgrade)
@@ -0,0 +1,86 @@
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from simulation.games import SIMULATORS
+
+# Blackjack plays real hands one at a time, so it gets far fewer rounds by default
+DEFAULT_ROUNDS = {'blackjack': 100_000}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m simulation',
+                                     description='Simulate casino games and report RTP / house edge.')
+    # Checked below rather than with choices=, which some Python versions apply to the empty list
+    parser.add_argument('games', nargs='*',
+                        help=f"games to simulate: all (the default), {', '.join(SIMULATORS)}")
+    parser.add_argument('--rounds', type=int, help='rounds per game variant (default: 1,000,000; 100,000 for blackjack)')
+    parser.add_argument('--batch-size', type=int, default=1_000_000, help='rounds per NumPy batch')
+    parser.add_argument('--seed', type=int, help='seed for reproducible runs')
+    parser.add_argument('--format', choices=['json', 'csv'], default='json')
+    parser.add_argument('--output', help='write results to this file instead of stdout')
+    parser.add_argument('--cases', help='comma separated case types for the case EV simulation (default: all)')
+    parser.add_argument('--mines', default='1,3,5,10,24', help='comma separated mine counts')
+    parser.add_argument('--grid-size', type=int, default=5)
+    parser.add_argument('--max-reveals', type=int, default=5)
+    args = parser.parse_args(argv)
+    unknown = [game for game in args.games if game != 'all' and game not in SIMULATORS]
+    if unknown:
+        parser.error(f"unknown game: {', '.join(unknown)} (choose from all, {', '.join(SIMULATORS)})")
+    return args
+
+
+def run(args) -> list:
+    rng = np.random.default_rng(args.seed)
+    if args.seed is not None:
+        random.seed(args.seed)  # blackjack and case floats use the random module
+
+    games = list(SIMULATORS) if not args.games or 'all' in args.games else args.games
+    rows = []
+    for game in games:
+        rounds = args.rounds or DEFAULT_ROUNDS.get(game, 1_000_000)
+        kwargs = {}
+        if game == 'case' and args.cases:
+            kwargs['case_types'] = args.cases.split(',')
+        elif game == 'mines':
+            kwargs.update(grid_size=args.grid_size, max_reveals=args.max_reveals,
+                          mines=[int(m) for m in args.mines.split(',')])
+
+        start = time.perf_counter()
+        rows.extend(SIMULATORS[game](rounds, args.batch_size, rng, **kwargs))
+        print(f"Simulated {game} ({rounds:,} rounds per variant) in {time.perf_counter() - start:.1f}s",
+              file=sys.stderr)
+    return rows
+
+
+def write_rows(rows: list, fmt: str, out):
+    if fmt == 'json':
+        json.dump(rows, out, indent=2)
+        out.write('\n')
+        return
+    # Rows from different games have different extra columns; keep them all, in first-seen order
+    fields = []
+    for row in rows:
+        fields.extend(key for key in row if key not in fields)
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rows = run(args)
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            write_rows(rows, args.format, f)
+    else:
+        write_rows(rows, args.format, sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
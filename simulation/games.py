@@ -0,0 +1,240 @@
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from blackjack import BlackjackGame
+from case_ev import get_case_ev_report
+from casino import roulette_payout
+from cases_prices_and_floats import open_many
+from catalog import get_catalog
+from config import CRASH_HOUSE_EDGE, CRASH_INSTANT_PROBABILITY, UPGRADE_CHANCES
+from mines import expected_rtp, multiplier_table
+
+ROULETTE_BETS = [str(n) for n in range(37)] + ['red', 'black', 'even', 'odd', '1-18', '19-36',
+                                              '1st12', '2nd12', '3rd12']
+BLACKJACK_STRATEGIES = ['dealer', 'basic', 'never_bust']
+
+
+class ReturnStats:
+    """Running totals of per-round returns (payout per 1 unit staked), fed one batch at a time"""
+
+    def __init__(self):
+        self.rounds = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.wins = 0
+
+    def add(self, returns: np.ndarray):
+        self.rounds += len(returns)
+        self.total += float(returns.sum())
+        self.total_sq += float(np.square(returns).sum())
+        self.wins += int(np.count_nonzero(returns > 1))
+
+    def row(self, **fields) -> dict:
+        mean = self.total / self.rounds if self.rounds else 0.0
+        std = max(self.total_sq / self.rounds - mean * mean, 0.0) ** 0.5 if self.rounds else 0.0
+        margin = 1.96 * std / self.rounds ** 0.5 if self.rounds else 0.0
+        return dict(fields, rounds=self.rounds, rtp=round(mean, 6), house_edge=round(1 - mean, 6),
+                    rtp_95_margin=round(margin, 6), std=round(std, 6),
+                    win_rate=round(self.wins / self.rounds, 6) if self.rounds else 0.0)
+
+
+def _batches(rounds: int, batch_size: int):
+    while rounds > 0:
+        n = min(rounds, batch_size)
+        rounds -= n
+        yield n
+
+
+def _run(rounds: int, batch_size: int, batch: Callable[[int], np.ndarray]) -> ReturnStats:
+    stats = ReturnStats()
+    for n in _batches(rounds, batch_size):
+        stats.add(batch(n))
+    return stats
+
+
+def crash_points(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Vectorized version of the crash point roll in CrashView.vue"""
+    r = rng.random(n)
+    multiplier = (0.95 / (1 - CRASH_HOUSE_EDGE)) / (r - CRASH_INSTANT_PROBABILITY + 0.02)
+    return np.where(r < CRASH_INSTANT_PROBABILITY, 1.0, np.maximum(1.0, multiplier))
+
+
+def simulate_crash(rounds: int, batch_size: int, rng: np.random.Generator,
+                   targets: Sequence[float] = (1.5, 2.0, 5.0, 10.0, 100.0)) -> List[dict]:
+    """Cash out at each target multiplier; also reports crash point percentiles"""
+    stats = {target: ReturnStats() for target in targets}
+    sample = None
+    for n in _batches(rounds, batch_size):
+        points = crash_points(n, rng)
+        if sample is None:
+            sample = points
+        for target in targets:
+            stats[target].add(np.where(points >= target, target, 0.0))
+
+    percentiles = {f'crash_p{p}': round(float(np.percentile(sample, p)), 4) for p in (1, 10, 50, 90, 99)}
+    return [stats[target].row(game='crash', variant=f'cashout_{target}x', **percentiles) for target in targets]
+
+
+def simulate_roulette(rounds: int, batch_size: int, rng: np.random.Generator,
+                      bets: Sequence[str] = ROULETTE_BETS) -> List[dict]:
+    """Every bet type against the same spins, using play_roulette's payouts"""
+    # Payout of each bet for each of the 37 results, so a batch is just a table lookup
+    table = np.array([[roulette_payout(bet, result) for result in range(37)] for bet in bets], dtype=float)
+    stats = [ReturnStats() for _ in bets]
+    for n in _batches(rounds, batch_size):
+        results = rng.integers(0, 37, n)
+        for i in range(len(bets)):
+            stats[i].add(table[i][results])
+    return [stats[i].row(game='roulette', variant=bet) for i, bet in enumerate(bets)]
+
+
+def simulate_coinflip(rounds: int, batch_size: int, rng: np.random.Generator) -> List[dict]:
+    stats = _run(rounds, batch_size, lambda n: np.where(rng.random(n) < 0.5, 2.0, 0.0))
+    return [stats.row(game='coinflip', variant='pick_side')]
+
+
+def simulate_mines(rounds: int, batch_size: int, rng: np.random.Generator, grid_size: int = 5,
+                   mines: Sequence[int] = (1, 3, 5, 10, 24), max_reveals: int = 5) -> List[dict]:
+    """Reveal k tiles then cash out, for every mine count and k up to max_reveals.
+
+    Rows also carry the closed-form RTP from mines.expected_rtp, which the empirical one should match.
+    """
+    total_tiles = grid_size * grid_size
+    rows = []
+    for num_mines in mines:
+        multipliers = multiplier_table(grid_size, num_mines)
+        for reveals in range(1, min(max_reveals, total_tiles - num_mines) + 1):
+            # The round survives if none of the revealed tiles hides a mine
+            def batch(n, num_mines=num_mines, reveals=reveals, payout=multipliers[reveals - 1]):
+                hits = rng.hypergeometric(num_mines, total_tiles - num_mines, reveals, n)
+                return np.where(hits == 0, payout, 0.0)
+            stats = _run(rounds, batch_size, batch)
+            rows.append(stats.row(game='mines', variant=f'{grid_size}x{grid_size}_{num_mines}mines_{reveals}reveals',
+                                  multiplier=multipliers[reveals - 1],
+                                  expected_rtp=round(expected_rtp(grid_size, num_mines, reveals), 6)))
+    return rows
+
+
+def _is_soft(hand) -> bool:
+    # An ace still counts as 11 if Hand.value didn't have to knock all of them down to 1
+    raw = sum(card.value for card in hand.cards)
+    aces = sum(1 for card in hand.cards if card.is_ace)
+    return aces > (raw - hand.value) // 10
+
+
+def _blackjack_action(strategy: str, hand, dealer_up: int, can_split: bool) -> str:
+    value = hand.value
+    soft = _is_soft(hand)
+    if strategy == 'never_bust':
+        return 'hit' if value < 12 else 'stand'
+    if strategy == 'dealer':
+        return 'hit' if value < 17 or (value == 17 and soft) else 'stand'
+
+    # 'basic': a short version of the usual basic strategy chart
+    if can_split and hand.can_split and hand.cards[0].rank in ('A', '8'):
+        return 'split'
+    if hand.can_double() and (value == 11 or (value == 10 and dealer_up < 10) or
+                              (value == 9 and 3 <= dealer_up <= 6)):
+        return 'double'
+    if soft:
+        return 'hit' if value < 18 or (value == 18 and dealer_up >= 9) else 'stand'
+    if value >= 17:
+        return 'stand'
+    if value >= 13:
+        return 'stand' if dealer_up <= 6 else 'hit'
+    if value == 12:
+        return 'stand' if 4 <= dealer_up <= 6 else 'hit'
+    return 'hit'
+
+
+def simulate_blackjack(rounds: int, batch_size: int, rng: np.random.Generator,
+                       strategies: Sequence[str] = BLACKJACK_STRATEGIES) -> List[dict]:
+    """Play whole hands on BlackjackGame itself, so its rules and payouts are what gets measured.
+
+    This one can't be vectorized; rounds run one by one and batch_size only sets how often stats are added up.
+    """
+    rows = []
+    for strategy in strategies:
+        game = BlackjackGame()
+        stats = ReturnStats()
+        for n in _batches(rounds, batch_size):
+            returns = np.empty(n)
+            for i in range(n):
+                game.start_game(1.0)
+                dealer_up = game.dealer_hand.cards[0].value
+                while not game.game_over:
+                    hand = game.player_hands[game.current_hand_index]
+                    if hand.is_blackjack:
+                        game.stand()
+                        continue
+                    action = _blackjack_action(strategy, hand, dealer_up, len(game.player_hands) < 4)
+                    if action == 'split':
+                        game.split()
+                    elif action == 'double':
+                        game.double_down()
+                        if not game.game_over and game.player_hands[game.current_hand_index] is hand:
+                            game.stand()
+                    elif action == 'hit':
+                        game.hit()
+                    else:
+                        game.stand()
+                staked = sum(hand.bet for hand in game.player_hands)
+                returns[i] = sum(game.calculate_payout(hand) for hand in game.player_hands) / staked
+            stats.add(returns)
+        rows.append(stats.row(game='blackjack', variant=strategy))
+    return rows
+
+
+def simulate_upgrade(rounds: int, batch_size: int, rng: np.random.Generator,
+                     chances: Optional[Dict[float, float]] = None) -> List[dict]:
+    """Success rolls for each multiplier; a win is worth multiplier x the stake (the reward search lands within tolerance)"""
+    chances = chances or UPGRADE_CHANCES
+    rows = []
+    for multiplier, chance in chances.items():
+        stats = _run(rounds, batch_size,
+                     lambda n, multiplier=multiplier, chance=chance: np.where(rng.random(n) < chance / 100,
+                                                                             float(multiplier), 0.0))
+        rows.append(stats.row(game='upgrade', variant=f'{multiplier}x', chance=chance))
+    return rows
+
+
+def simulate_case_ev(rounds: int, batch_size: int, rng: np.random.Generator,
+                     case_types: Optional[Sequence[str]] = None) -> List[dict]:
+    """Open each case with open_many and compare the drops' value to the case price.
+
+    Rows also carry the exact RTP from case_ev, which the empirical one should match.
+    """
+    catalog = get_catalog()
+    expected = get_case_ev_report()
+    if case_types is None:
+        case_types = [case_type for case_type, case in catalog.cases.items() if not case['is_souvenir']]
+    rows = []
+    for case_type in case_types:
+        case_price = catalog.get_case(case_type)['price']
+        if case_price <= 0:
+            continue
+        stats = ReturnStats()
+        sample = None
+        for n in _batches(rounds, batch_size):
+            prices = open_many(case_type, n, rng=rng)['price']
+            if sample is None:
+                sample = prices
+            stats.add(prices / case_price)
+        rows.append(stats.row(game='case', variant=case_type, case_price=case_price,
+                              expected_rtp=expected[case_type]['rtp'] if case_type in expected else None,
+                              ev=round(stats.total / stats.rounds * case_price, 4),
+                              drop_p50=round(float(np.percentile(sample, 50)), 4),
+                              drop_p99=round(float(np.percentile(sample, 99)), 4)))
+    return rows
+
+
+SIMULATORS = {
+    'crash': simulate_crash,
+    'roulette': simulate_roulette,
+    'coinflip': simulate_coinflip,
+    'mines': simulate_mines,
+    'blackjack': simulate_blackjack,
+    'upgrade': simulate_upgrade,
+    'case': simulate_case_ev
+}
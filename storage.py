@@ -0,0 +1,468 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, but os.replace still keeps every write atomic
+    fcntl = None
+
+from config import (AUCTION_FILE, LOCAL_USER, SQLITE_DB_FILE, STORAGE_BACKEND, USER_DATA_DIR, USER_DATA_FILE,
+                    USER_JOURNAL_FILE)
+
+# Documents other than the user data, and where the JSON backend keeps them (for LOCAL_USER)
+DOCUMENT_FILES = {
+    'daily_trades': 'data/daily_trades.json',
+    'auction': AUCTION_FILE,
+    'loadouts': 'data/user_loadouts.json',
+    'mines_sessions': 'data/mines_sessions.json'
+}
+# Documents every player has their own copy of; the rest are shared
+USER_DOCUMENTS = {'daily_trades', 'loadouts'}
+
+_USER_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def check_user_id(user: str) -> str:
+    """User ids end up in file names, so only allow plain ones"""
+    if not isinstance(user, str) or not _USER_ID_PATTERN.match(user):
+        raise ValueError(f"Invalid user id: {user!r}")
+    return user
+
+
+def user_files(user: str) -> Tuple[str, str]:
+    """(snapshot, journal) paths for a user; LOCAL_USER keeps the original files"""
+    if user == LOCAL_USER:
+        return USER_DATA_FILE, USER_JOURNAL_FILE
+    directory = os.path.join(USER_DATA_DIR, check_user_id(user))
+    return (os.path.join(directory, os.path.basename(USER_DATA_FILE)),
+            os.path.join(directory, os.path.basename(USER_JOURNAL_FILE)))
+
+
+def _document_key(name: str, user: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Which user's copy of a document to use: None for shared documents and LOCAL_USER's"""
+    if name not in DOCUMENT_FILES:
+        raise KeyError(name)
+    if name not in USER_DOCUMENTS or user in (None, LOCAL_USER):
+        return name, None
+    return name, check_user_id(user)
+
+
+def apply_user_event(state: dict, event: dict):
+    """Replay one user journal event onto state"""
+    event_type = event['type']
+    if event_type == 'balance_delta':
+        state['balance'] = event['balance']
+    elif event_type == 'item_added':
+        state.setdefault('inventory', []).insert(event['index'], event['item'])
+    elif event_type == 'item_removed':
+        state['inventory'].pop(event['index'])
+    elif event_type == 'stat_increment':
+        state.setdefault('stats', {})[event['stat']] = event['value']
+    elif event_type == 'achievement_completed':
+        state.setdefault('achievements', {}).setdefault('completed', []).append(event['id'])
+    elif event_type == 'set':
+        state[event['key']] = event['value']
+    elif event_type == 'delete':
+        state.pop(event['key'], None)
+    else:
+        raise ValueError(f"Unknown journal event type: {event_type}")
+
+
+def _file_signature(*paths: str) -> tuple:
+    """(mtime, size) of each path, or None for missing files"""
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+# flock only excludes other processes, so threads in this one also take a lock per path
+_thread_locks = {}
+_thread_locks_lock = threading.Lock()
+
+
+@contextmanager
+def interprocess_lock(path: str):
+    """Exclusive advisory lock on path + '.lock', held by one process (and thread) at a time"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _thread_locks_lock:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(path + '.lock', 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path: str, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temp name of our own, so concurrent writers never write into the same file
+    temp_file = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_file, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    # Atomic on both POSIX and Windows, so readers never see a half-written file
+    os.replace(temp_file, path)
+
+
+class JsonStorage:
+    """The original layout: a JSON snapshot plus an append-only journal, and one file per document"""
+
+    name = 'json'
+
+    def load_user_state(self, user: str = LOCAL_USER) -> Tuple[Optional[dict], int]:
+        """Return (data, last seq) from the snapshot with the journal replayed, or (None, 0) if empty"""
+        snapshot_file, journal_file = user_files(user)
+        data, seq = None, 0
+        if os.path.exists(snapshot_file):
+            with open(snapshot_file, 'r') as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("Invalid data structure")
+            seq = data.pop('_journal_seq', 0)
+
+        if not os.path.exists(journal_file):
+            return data, seq
+        with open(journal_file, 'r') as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    # A torn last line from a crash mid-append
+                    print("Warning: Skipping unreadable user journal entry")
+                    continue
+                if event['seq'] <= seq:
+                    continue
+                if data is None:
+                    data = {}
+                try:
+                    apply_user_event(data, event)
+                except Exception as e:
+                    print(f"Warning: Failed to replay user journal event {event['seq']}: {e}")
+                seq = event['seq']
+        return data, seq
+
+    def user_state_signature(self, user: str = LOCAL_USER) -> tuple:
+        """Changes whenever the snapshot or journal is written"""
+        return _file_signature(*user_files(user))
+
+    def write_user_events(self, events: List[dict], user: str = LOCAL_USER):
+        journal_file = user_files(user)[1]
+        os.makedirs(os.path.dirname(journal_file), exist_ok=True)
+        with open(journal_file, 'a') as f:
+            f.write(''.join(json.dumps(event) + '\n' for event in events))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_user_snapshot(self, state_json: str, seq: int, user: str = LOCAL_USER):
+        """Atomically replace the snapshot and empty the journal it now covers"""
+        snapshot_file, journal_file = user_files(user)
+        # Splice the seq into the already-serialized state instead of re-encoding it
+        snapshot = state_json[:-1] + (', ' if state_json != '{}' else '') + f'"_journal_seq": {seq}}}'
+        _atomic_write(snapshot_file, snapshot)
+        # Events up to seq are in the snapshot now; if we crash before this, replay skips them by seq
+        with open(journal_file, 'w'):
+            pass
+
+    def list_users(self) -> List[str]:
+        """Every user with stored data"""
+        users = [LOCAL_USER] if os.path.exists(USER_DATA_FILE) or os.path.exists(USER_JOURNAL_FILE) else []
+        if os.path.isdir(USER_DATA_DIR):
+            users.extend(sorted(user for user in os.listdir(USER_DATA_DIR)
+                                if _USER_ID_PATTERN.match(user) and user != LOCAL_USER))
+        return users
+
+    @staticmethod
+    def _document_path(name: str, user: Optional[str]) -> str:
+        name, owner = _document_key(name, user)
+        if owner is None:
+            return DOCUMENT_FILES[name]
+        return os.path.join(USER_DATA_DIR, owner, os.path.basename(DOCUMENT_FILES[name]))
+
+    def load_document(self, name: str, user: Optional[str] = None) -> Optional[dict]:
+        path = self._document_path(name, user)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save_document(self, name: str, data: dict, user: Optional[str] = None):
+        path = self._document_path(name, user)
+        text = json.dumps(data, indent=2, default=str)
+        # Writers in other processes take turns; readers never need the lock
+        with interprocess_lock(path):
+            _atomic_write(path, text)
+
+
+class SqliteStorage:
+    """Single SQLite database in WAL mode; inventory items get their own indexed table.
+
+    Every user's fields and items are a separate set of rows, keyed by the user column.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS user_fields (
+            user TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            PRIMARY KEY (user, key)
+        );
+        CREATE TABLE IF NOT EXISTS items (
+            user TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            weapon TEXT,
+            name TEXT,
+            rarity TEXT,
+            case_type TEXT,
+            price REAL,
+            is_case INTEGER NOT NULL DEFAULT 0,
+            is_sticker INTEGER NOT NULL DEFAULT 0,
+            favorite INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_items_position ON items (user, position);
+        CREATE INDEX IF NOT EXISTS idx_items_skin ON items (weapon, name);
+        CREATE INDEX IF NOT EXISTS idx_items_case_type ON items (case_type);
+        CREATE INDEX IF NOT EXISTS idx_items_rarity ON items (rarity);
+        CREATE INDEX IF NOT EXISTS idx_items_favorite ON items (favorite);
+        CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL);
+    """
+
+    def __init__(self, path: str = SQLITE_DB_FILE):
+        self.path = path
+        self._local = threading.local()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers run alongside the flusher's writes
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._migrate_single_user(conn)
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _migrate_single_user(conn):
+        """Databases from before multi-user support hold one user's rows without a user column"""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(user_fields)')]
+        if not columns or 'user' in columns:
+            return
+        with conn:
+            conn.execute('ALTER TABLE user_fields RENAME TO user_fields_single')
+            conn.execute('CREATE TABLE user_fields (user TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+                         'PRIMARY KEY (user, key))')
+            conn.execute('INSERT INTO user_fields (user, key, value) SELECT ?, key, value FROM user_fields_single',
+                         (LOCAL_USER,))
+            conn.execute('DROP TABLE user_fields_single')
+            conn.execute('DROP INDEX IF EXISTS idx_items_position')
+            conn.execute('ALTER TABLE items ADD COLUMN user TEXT NOT NULL DEFAULT %s' % repr(LOCAL_USER))
+            conn.execute("UPDATE meta SET key = ? WHERE key = 'user_seq'", (f'user_seq:{LOCAL_USER}',))
+
+    @staticmethod
+    def _item_row(user: str, position: int, item: dict) -> tuple:
+        try:
+            price = float(item.get('price', 0) or 0)
+        except (TypeError, ValueError):
+            price = 0.0
+        return (user, position, json.dumps(item), item.get('weapon'), item.get('name'), item.get('rarity'),
+                item.get('case_type') or item.get('type'), price, int(bool(item.get('is_case'))),
+                int(bool(item.get('is_sticker'))), int(bool(item.get('favorite'))))
+
+    def _insert_items(self, conn, rows: List[tuple]):
+        conn.executemany('INSERT INTO items (user, position, data, weapon, name, rarity, case_type, price, '
+                         'is_case, is_sticker, favorite) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def _get_field(self, conn, user: str, key: str, default=None):
+        row = conn.execute('SELECT value FROM user_fields WHERE user = ? AND key = ?', (user, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_field(self, conn, user: str, key: str, value):
+        conn.execute('INSERT OR REPLACE INTO user_fields (user, key, value) VALUES (?, ?, ?)',
+                     (user, key, json.dumps(value)))
+
+    def _get_seq(self, conn, user: str) -> int:
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (f'user_seq:{user}',)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _set_seq(self, conn, user: str, seq: int):
+        conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (f'user_seq:{user}', str(seq)))
+
+    def load_user_state(self, user: str = LOCAL_USER) -> Tuple[Optional[dict], int]:
+        conn = self.conn
+        rows = conn.execute('SELECT key, value FROM user_fields WHERE user = ?', (user,)).fetchall()
+        seq = self._get_seq(conn, user)
+        if not rows:
+            return None, seq
+        data = {key: json.loads(value) for key, value in rows}
+        data['inventory'] = [json.loads(row[0]) for row in
+                             conn.execute('SELECT data FROM items WHERE user = ? ORDER BY position', (user,))]
+        return data, seq
+
+    def user_state_signature(self, user: str = LOCAL_USER) -> tuple:
+        """Changes whenever this user's rows are written, by us or another process"""
+        return (self._get_seq(self.conn, user),)
+
+    def list_users(self) -> List[str]:
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT user FROM user_fields ORDER BY user')]
+
+    def write_user_events(self, events: List[dict], user: str = LOCAL_USER):
+        """Apply a batch of journal events in one transaction"""
+        conn = self.conn
+        with conn:
+            i = 0
+            while i < len(events):
+                event = events[i]
+                event_type = event['type']
+                if event_type == 'item_removed':
+                    # Consecutive removals at one index are a contiguous range (e.g. sell all)
+                    count = 1
+                    while (i + count < len(events) and events[i + count]['type'] == 'item_removed' and
+                           events[i + count]['index'] == event['index']):
+                        count += 1
+                    conn.execute('DELETE FROM items WHERE user = ? AND position >= ? AND position < ?',
+                                 (user, event['index'], event['index'] + count))
+                    conn.execute('UPDATE items SET position = position - ? WHERE user = ? AND position >= ?',
+                                 (count, user, event['index'] + count))
+                    i += count
+                    continue
+                if event_type == 'item_added':
+                    # Consecutive inserts at increasing indexes open one gap
+                    batch = [event]
+                    while (i + len(batch) < len(events) and events[i + len(batch)]['type'] == 'item_added' and
+                           events[i + len(batch)]['index'] == event['index'] + len(batch)):
+                        batch.append(events[i + len(batch)])
+                    conn.execute('UPDATE items SET position = position + ? WHERE user = ? AND position >= ?',
+                                 (len(batch), user, event['index']))
+                    self._insert_items(conn, [self._item_row(user, e['index'], e['item']) for e in batch])
+                    i += len(batch)
+                    continue
+
+                if event_type == 'balance_delta':
+                    self._set_field(conn, user, 'balance', event['balance'])
+                elif event_type == 'stat_increment':
+                    stats = self._get_field(conn, user, 'stats', {})
+                    stats[event['stat']] = event['value']
+                    self._set_field(conn, user, 'stats', stats)
+                elif event_type == 'achievement_completed':
+                    achievements = self._get_field(conn, user, 'achievements', {})
+                    achievements.setdefault('completed', []).append(event['id'])
+                    self._set_field(conn, user, 'achievements', achievements)
+                elif event_type == 'set':
+                    if event['key'] == 'inventory':
+                        conn.execute('DELETE FROM items WHERE user = ?', (user,))
+                        self._insert_items(conn, [self._item_row(user, n, item)
+                                                  for n, item in enumerate(event['value'])])
+                    else:
+                        self._set_field(conn, user, event['key'], event['value'])
+                elif event_type == 'delete':
+                    conn.execute('DELETE FROM user_fields WHERE user = ? AND key = ?', (user, event['key']))
+                else:
+                    raise ValueError(f"Unknown journal event type: {event_type}")
+                i += 1
+            if events:
+                self._set_seq(conn, user, events[-1]['seq'])
+
+    def write_user_snapshot(self, state_json: str, seq: int, user: str = LOCAL_USER):
+        """Rewrite the whole user state in one transaction"""
+        state = json.loads(state_json)
+        inventory = state.pop('inventory', [])
+        conn = self.conn
+        with conn:
+            conn.execute('DELETE FROM user_fields WHERE user = ?', (user,))
+            conn.executemany('INSERT INTO user_fields (user, key, value) VALUES (?, ?, ?)',
+                             [(user, key, json.dumps(value)) for key, value in state.items()])
+            conn.execute('DELETE FROM items WHERE user = ?', (user,))
+            self._insert_items(conn, [self._item_row(user, n, item) for n, item in enumerate(inventory)])
+            self._set_seq(conn, user, seq)
+
+    @staticmethod
+    def _document_name(name: str, user: Optional[str]) -> str:
+        name, owner = _document_key(name, user)
+        return name if owner is None else f'{name}:{owner}'
+
+    def load_document(self, name: str, user: Optional[str] = None) -> Optional[dict]:
+        row = self.conn.execute('SELECT data FROM documents WHERE name = ?',
+                                (self._document_name(name, user),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_document(self, name: str, data: dict, user: Optional[str] = None):
+        with self.conn:
+            self.conn.execute('INSERT OR REPLACE INTO documents (name, data, updated_at) VALUES (?, ?, ?)',
+                              (self._document_name(name, user), json.dumps(data, default=str), time.time()))
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the backend selected by STORAGE_BACKEND"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            if STORAGE_BACKEND == 'sqlite':
+                _storage = SqliteStorage()
+            elif STORAGE_BACKEND == 'json':
+                _storage = JsonStorage()
+            else:
+                raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+        return _storage
+
+
+def migrate_json_to_sqlite(db_path: str = SQLITE_DB_FILE, force: bool = False) -> bool:
+    """Copy the JSON files under data/ into a SQLite database. Returns False if it already has user data"""
+    source = JsonStorage()
+    target = SqliteStorage(db_path)
+
+    if target.list_users() and not force:
+        print(f"{db_path} already has user data, not migrating (use --force to overwrite)")
+        return False
+
+    users = source.list_users()
+    for user in users:
+        data, seq = source.load_user_state(user)
+        if data is not None:
+            target.write_user_snapshot(json.dumps(data), seq, user)
+            print(f"Migrated user data for {user} ({len(data.get('inventory', []))} items)")
+
+    for name in DOCUMENT_FILES:
+        for user in (users or [None]) if name in USER_DOCUMENTS else [None]:
+            try:
+                document = source.load_document(name, user)
+            except Exception as e:
+                print(f"Error reading {name}: {e}")
+                continue
+            if document is not None:
+                target.save_document(name, document, user)
+                print(f"Migrated {name}" + (f" for {user}" if user else ''))
+    return True
+
+
+if __name__ == '__main__':
+    # python storage.py [--force]  -- one-shot migration from data/*.json to SQLite
+    migrate_json_to_sqlite(force='--force' in sys.argv)
@@ -0,0 +1,178 @@
+import threading
+import time
+from bisect import bisect_right
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from cases_prices_and_floats import WEAR_CODES, adjust_price_by_float, generate_float_for_wear
+from catalog import Catalog, get_catalog
+from config import UPGRADE_SEARCH_BUDGET, UPGRADE_TOLERANCE
+
+# How many of the priciest items that still fit are tried at each step of the search
+SEARCH_BRANCHES = 4
+
+
+def find_upgrade_combination(prices: Sequence[float], target_value: float, max_items: int = 10,
+                             tolerance: float = UPGRADE_TOLERANCE,
+                             time_budget: float = UPGRADE_SEARCH_BUDGET) -> List[int]:
+    """Indices of up to max_items prices (sorted ascending, each used once) whose sum is closest to target_value.
+
+    A single item within tolerance * target_value is preferred. Otherwise sums may go over the target
+    by at most that much, and ties go to fewer items. If nothing reaches 90% of the target, the single
+    priciest item is returned instead, if it's worth more.
+    """
+    n = len(prices)
+    if n == 0 or target_value <= 0:
+        return []
+    slack = target_value * tolerance
+    deadline = time.perf_counter() + time_budget
+
+    # A single item within tolerance wins outright: the closest neighbour of the target
+    split = bisect_right(prices, target_value)
+    nearest = min((i for i in (split - 1, split) if 0 <= i < n and prices[i] > 0),
+                  key=lambda i: abs(prices[i] - target_value), default=None)
+    if nearest is not None and abs(prices[nearest] - target_value) <= slack:
+        return [nearest]
+
+    # Nothing can do better than the priciest items if even they don't add up to the target
+    top = list(range(n - 1, max(n - 1 - max_items, -1), -1))
+    if sum(prices[i] for i in top) <= target_value:
+        return top
+
+    best: List[int] = []
+    best_score = (target_value, 0)
+    chosen: List[int] = []
+    exact = max(0.005, target_value * 1e-6)
+
+    def search(remaining: float, hi: int) -> bool:
+        # Depth-first over prices[:hi], priciest first. Each step only looks below the previous
+        # pick, so every combination is visited once. Returns True to stop the whole search
+        nonlocal best, best_score
+        if time.perf_counter() > deadline:
+            return True
+        split = bisect_right(prices, remaining, 0, hi)
+        # The cheapest item over what's left (if within tolerance) finishes the combination,
+        # the few priciest under it leave room for more
+        candidates = list(range(split - 1, max(split - 1 - SEARCH_BRANCHES, -1), -1))
+        if split < hi and prices[split] <= remaining + slack:
+            candidates.insert(0, split)
+        for i in candidates:
+            price = prices[i]
+            if price <= 0:
+                break
+            chosen.append(i)
+            left = remaining - price
+            score = (abs(left), len(chosen))
+            if score < best_score:
+                best, best_score = chosen[:], score
+                if score[0] <= exact:
+                    return True
+            if left > 0 and len(chosen) < max_items and i > 0 and search(left, i):
+                return True
+            chosen.pop()
+        return False
+
+    search(target_value, n)
+
+    total = sum(prices[i] for i in best)
+    if total < target_value * 0.9 and prices[-1] > total:
+        return [n - 1]
+    return best
+
+
+
+class UpgradePool:
+    """Every upgrade reward (catalog skin x wear x StatTrak, plus stickers) as columns sorted by base price.
+
+    Floats aren't rolled here; make_item rolls one for the rows that are actually awarded.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.entries = []  # catalog skin and sticker entries the rows point into
+        entry_rows, wear_rows, stattrak_rows, price_rows = [], [], [], []
+
+        wear_index = {code: i for i, code in enumerate(WEAR_CODES)}
+        for skin in catalog.iter_skins():
+            entry = len(self.entries)
+            self.entries.append(skin)
+            for wear, price in skin['prices'].items():
+                if wear not in wear_index:
+                    continue  # 'NO', 'ST_*' and souvenir keys
+                entry_rows.append(entry)
+                wear_rows.append(wear_index[wear])
+                stattrak_rows.append(False)
+                price_rows.append(float(price))
+                if f'ST_{wear}' in skin['prices']:
+                    entry_rows.append(entry)
+                    wear_rows.append(wear_index[wear])
+                    stattrak_rows.append(True)
+                    price_rows.append(float(skin['prices'][f'ST_{wear}']))
+        for sticker in catalog.iter_stickers():
+            entry_rows.append(len(self.entries))
+            self.entries.append(sticker)
+            wear_rows.append(-1)
+            stattrak_rows.append(False)
+            price_rows.append(float(sticker['price']))
+
+        order = np.argsort(np.array(price_rows, dtype=float), kind='stable')
+        self.prices = np.array(price_rows, dtype=float)[order]
+        self.entry_index = np.array(entry_rows, dtype=np.int32)[order]
+        self.wears = np.array(wear_rows, dtype=np.int8)[order]       # index into WEAR_CODES, -1 for stickers
+        self.stattrak = np.array(stattrak_rows, dtype=bool)[order]
+        self.price_list = self.prices.tolist()  # bisect is much faster on a plain list
+
+    def __len__(self) -> int:
+        return len(self.price_list)
+
+    def find_combination(self, target_value: float, max_items: int = 10) -> List[int]:
+        return find_upgrade_combination(self.price_list, target_value, max_items)
+
+    def make_item(self, row: int) -> dict:
+        """Inventory item for a row, with its float rolled now"""
+        entry = self.entries[self.entry_index[row]]
+        base_price = self.price_list[row]
+        if entry['is_sticker']:
+            return {
+                'name': entry['name'],
+                'price': base_price,
+                'rarity': entry['rarity'],
+                'case_type': entry['case_type'],
+                'case_file': entry['case_file'],
+                'image': entry['image'],
+                'is_sticker': True,
+                'timestamp': time.time()
+            }
+
+        wear = str(WEAR_CODES[self.wears[row]])
+        float_value = generate_float_for_wear(wear)
+        return {
+            'weapon': entry['weapon'],
+            'name': entry['name'],
+            'wear': wear,
+            'price': adjust_price_by_float(base_price, wear, float_value),
+            'base_price': base_price,
+            'rarity': entry['rarity'],
+            'case_type': entry['case_type'],
+            'case_file': entry['case_file'],
+            'stattrak': bool(self.stattrak[row]),
+            'timestamp': time.time(),
+            'float_value': float_value,
+            'image': entry['image'],
+            'is_sticker': False
+        }
+
+
+_pool: Optional[UpgradePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_upgrade_pool() -> UpgradePool:
+    """The pool for the active catalog, rebuilt only when the catalog (and so its prices) reloads"""
+    global _pool
+    catalog = get_catalog()
+    with _pool_lock:
+        if _pool is None or _pool.catalog is not catalog:
+            _pool = UpgradePool(catalog)
+        return _pool
@@ -1,13 +1,70 @@
+import atexit
 import json
-import os
 import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Optional, Tuple
 
-from achievements import update_case_achievements, update_click_achievements, update_earnings_achievements
+from achievements import add_exp, update_all_achievements
+from config import (LOCAL_USER, RANK_EXP, USER_CACHE_SIZE, USER_DATA_FLUSH_INTERVAL, USER_JOURNAL_COMPACT_EVENTS,
+                    USER_REVISION_HISTORY, USER_SNAPSHOT_INTERVAL)
+from inventory import InventoryIndex, ensure_item_ids, item_key
 from models import Upgrades, User
+from shared_state import get_shared_state
+from storage import check_user_id, get_storage
 
-# Add this at the top with other globals
-file_lock = threading.Lock()
+# load_user_data stamps each copy with the version it was taken from; save_user_data checks it
+REVISION_KEY = '_revision'
+
+# The player the current request is acting for. The app sets it for every request; threads
+# of their own (like the click flusher) pass user= explicitly instead
+_current_user = ContextVar('current_user', default=LOCAL_USER)
+
+def current_user() -> str:
+    return _current_user.get()
+
+def set_current_user(user: str):
+    _current_user.set(check_user_id(user))
+
+class UserDataConflict(Exception):
+    """A save was based on user data that has since changed in a way it can't be merged with"""
+
+    def __init__(self, message: str, field: Optional[str] = None):
+        super().__init__(message)
+        self.field = field
+
+class _UserState:
+    """One player's in-memory data, locks and unwritten journal events"""
+
+    def __init__(self, user: str):
+        self.user = user
+        # state_lock guards the fields below; io_lock the player's files, so loads and
+        # saves never wait for a journal write
+        self.state_lock = threading.RLock()
+        self.io_lock = threading.RLock()
+        # state is only ever replaced, never mutated; state_json is the same data
+        # serialized so every load gets its own copy
+        self.state = None
+        self.state_json = None
+        self.revision = 0             # bumped by every save that changes something, and by reloads from disk
+        self.history = OrderedDict()  # revision -> state_json for the last USER_REVISION_HISTORY versions
+        self.seq = 0                  # seq of the newest journal event
+        self.pending_events = []      # events not yet appended to the journal
+        self.journal_events = 0       # events in the journal since the last snapshot
+        self.last_snapshot_time = 0.0
+        self.disk_signature = None    # storage signature as of our last read or write
+        self.index = None             # InventoryIndex over state['inventory']
+        self.pins = 0                 # callers using this entry right now; pinned entries are never evicted
+
+# Players in memory, least recently used first. Loaded on first use and dropped again
+# once more than USER_CACHE_SIZE are loaded and their changes are written
+_users = OrderedDict()
+_users_lock = threading.Lock()
+_load_stats = {'cache_hits': 0, 'disk_loads': 0, 'evictions': 0}
+_flusher_thread = None
+_flusher_stop = threading.Event()
 
 def create_user_from_dict(data: dict) -> User:
     upgrades_data = data.get('upgrades', {})
@@ -50,10 +107,9 @@ def create_user_from_dict(data: dict) -> User:
                 user.inventory.append(skin_dict)
     return user
 
-def load_user_data() -> dict:
-    """Load user data from JSON file with file locking."""
+def _default_user_data() -> dict:
     # Define complete default data structure
-    default_data = {
+    return {
         'balance': 1000.0,
         'inventory': [],
         'exp': 0,
@@ -84,165 +140,510 @@ def load_user_data() -> dict:
         },
         'case_progress': 0
     }
+
+def _merge_defaults(data: dict) -> dict:
+    """Fill in any structures missing from older save files"""
+    default_data = _default_user_data()
+    result = default_data.copy()
+    result.update(data)
     
-    file_path = 'data/user_inventory.json'
-    backup_path = file_path + '.bak'
+    # Ensure all required structures exist
+    if 'achievements' not in data:
+        update_all_achievements(result)
+        
+    for key, value in default_data['upgrades'].items():
+        result['upgrades'].setdefault(key, value)
     
-    # Use a timeout to prevent deadlocks
-    lock_acquired = file_lock.acquire(timeout=5)
-    if not lock_acquired:
-        print("Warning: Could not acquire file lock, returning default data")
-        return default_data.copy()
+    return result
+
+def _diff_events(old: dict, new: dict) -> list:
+    """Describe the change from old to new user data as a list of journal events"""
+    events = []
+    for key in new.keys() | old.keys():
+        if key not in new:
+            events.append({'type': 'delete', 'key': key})
+            continue
+        old_value, new_value = old.get(key), new[key]
+        if old_value == new_value:
+            continue
         
+        if key == 'balance' and isinstance(old_value, (int, float)) and isinstance(new_value, (int, float)):
+            events.append({'type': 'balance_delta', 'delta': new_value - old_value, 'balance': new_value})
+        elif key == 'inventory' and isinstance(old_value, list) and isinstance(new_value, list):
+            # Everything outside the common prefix and suffix was removed or added
+            prefix = 0
+            limit = min(len(old_value), len(new_value))
+            while prefix < limit and old_value[prefix] == new_value[prefix]:
+                prefix += 1
+            suffix = 0
+            while (suffix < limit - prefix and
+                   old_value[len(old_value) - 1 - suffix] == new_value[len(new_value) - 1 - suffix]):
+                suffix += 1
+            for item in old_value[prefix:len(old_value) - suffix]:
+                events.append({'type': 'item_removed', 'index': prefix, 'id': item.get('id')})
+            for offset, item in enumerate(new_value[prefix:len(new_value) - suffix]):
+                events.append({'type': 'item_added', 'index': prefix + offset, 'item': item})
+        elif key == 'stats' and isinstance(old_value, dict) and isinstance(new_value, dict):
+            for stat, value in new_value.items():
+                if old_value.get(stat) != value:
+                    delta = value - old_value.get(stat, 0) if isinstance(value, (int, float)) else None
+                    events.append({'type': 'stat_increment', 'stat': stat, 'delta': delta, 'value': value})
+            if old_value.keys() - new_value.keys():
+                events.append({'type': 'set', 'key': key, 'value': new_value})
+        elif (key == 'achievements' and isinstance(old_value, dict) and isinstance(new_value, dict) and
+              old_value.get('in_progress') == new_value.get('in_progress') and
+              new_value.get('completed', [])[:len(old_value.get('completed', []))] == old_value.get('completed', [])):
+            for achievement_id in new_value['completed'][len(old_value.get('completed', [])):]:
+                events.append({'type': 'achievement_completed', 'id': achievement_id})
+            if old_value.keys() != new_value.keys():
+                events.append({'type': 'set', 'key': key, 'value': new_value})
+        else:
+            events.append({'type': 'set', 'key': key, 'value': new_value})
+    return events
+
+_MISSING = object()
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _merge_number(field: str, base, current, mine):
+    """Concurrent changes to a counter add up"""
+    if not (_is_number(base) and _is_number(current) and _is_number(mine)):
+        raise UserDataConflict(f"Conflicting changes to {field}", field)
+    return current + (mine - base)
+
+def _merge_balance(field: str, base, current, mine):
+    """Concurrent earnings add up, but a spend is only merged if the balance still covers it.
+
+    Each side checked its own copy's balance before spending, so adding up two spends could overdraw.
+    """
+    merged = _merge_number(field, base, current, mine)
+    if mine < base and merged < 0:
+        raise UserDataConflict("Balance changed since it was loaded and no longer covers this", field)
+    return merged
+
+def _merge_fields(field: str, base: dict, current: dict, mine: dict, resolve=None) -> dict:
+    """Three-way merge of a dict key by key; resolve(key, base, current, mine) settles keys changed on both sides.
+
+    Both sides making the same change still counts as a conflict: two sales of one item both added its price.
+    """
+    merged = dict(current)
+    for key in base.keys() | current.keys() | mine.keys():
+        b, c, m = base.get(key, _MISSING), current.get(key, _MISSING), mine.get(key, _MISSING)
+        if m == b:
+            continue
+        if c == b:
+            value = m
+        elif resolve is not None and _MISSING not in (b, c, m):
+            value = resolve(f'{field}.{key}' if field else key, b, c, m)
+        else:
+            raise UserDataConflict(f"Conflicting changes to {field}.{key}" if field else
+                                   f"Conflicting changes to {key}", f'{field}.{key}' if field else key)
+        if value is _MISSING:
+            merged.pop(key, None)
+        else:
+            merged[key] = value
+    return merged
+
+def _merge_stat(field: str, base, current, mine):
+    if field.split('.')[-1].startswith('highest_') and _is_number(current) and _is_number(mine):
+        return max(current, mine)
+    return _merge_number(field, base, current, mine)
+
+def _merge_inventory(field: str, base: list, current: list, mine: list) -> list:
+    """Items are matched by id: ours are removed, changed or added unless the other side touched the same item"""
+    base_items = {item.get('id'): item for item in base}
+    current_items = {item.get('id'): item for item in current}
+    mine_items = {item.get('id'): item for item in mine}
+    touched = {item_id for item_id, item in base_items.items() if mine_items.get(item_id) != item}
+    for item_id in touched:
+        if current_items.get(item_id) != base_items[item_id]:
+            raise UserDataConflict("Conflicting changes to the same inventory item", field)
+    # A reorder (e.g. sorting) can't be replayed onto an inventory that changed too
+    kept = [item.get('id') for item in mine if item.get('id') in base_items and item.get('id') not in touched]
+    if kept != [item.get('id') for item in base if item.get('id') not in touched]:
+        raise UserDataConflict("Inventory was reordered while it changed", field)
+
+    merged = []
+    for item in current:
+        item_id = item.get('id')
+        if item_id not in touched:
+            merged.append(item)
+        elif item_id in mine_items:
+            merged.append(mine_items[item_id])
+    merged.extend(item for item in mine if item.get('id') not in base_items)
+    return merged
+
+def _merge_achievements(field: str, base: dict, current: dict, mine: dict) -> dict:
+    """Completions from both sides are kept (one tier can't be completed twice); progress is recomputed later"""
+    base_completed = base.get('completed', [])
+    current_completed = current.get('completed', [])
+    mine_completed = mine.get('completed', [])
+    if (current_completed[:len(base_completed)] != base_completed or
+            mine_completed[:len(base_completed)] != base_completed):
+        raise UserDataConflict("Conflicting changes to achievements", field)
+    new_mine = mine_completed[len(base_completed):]
+    if set(new_mine) & set(current_completed[len(base_completed):]):
+        raise UserDataConflict("The same achievement was completed twice", field)
+    completed = current_completed + new_mine
+
+    # in_progress entries are derived from stats, so where both sides changed one either copy will do
+    base_progress, mine_progress = base.get('in_progress', {}), mine.get('in_progress', {})
+    in_progress = dict(current.get('in_progress', {}))
+    for key in base_progress.keys() | mine_progress.keys():
+        if key not in mine_progress:
+            in_progress.pop(key, None)
+        elif mine_progress[key] != base_progress.get(key):
+            in_progress[key] = mine_progress[key]
+    return dict(current, completed=completed,
+                in_progress={key: value for key, value in in_progress.items() if key not in completed})
+
+def _total_exp(user_data: dict) -> float:
+    rank = int(user_data.get('rank', 0))
+    return sum(RANK_EXP[r] for r in range(min(rank, len(RANK_EXP)))) + float(user_data.get('exp', 0))
+
+# How a field changed by both sides is merged; fields without an entry conflict
+_MERGERS = {
+    'balance': _merge_balance,
+    'case_progress': _merge_number,
+    'stats': lambda field, b, c, m: _merge_fields(field, b, c, m, _merge_stat),
+    'upgrades': _merge_fields,
+    'inventory': _merge_inventory,
+    'achievements': _merge_achievements,
+}
+
+def _merge_top_level(field: str, base, current, mine):
+    if field not in _MERGERS:
+        raise UserDataConflict(f"Conflicting changes to {field}", field)
+    return _MERGERS[field](field, base, current, mine)
+
+def _rebase(base: dict, current: dict, mine: dict) -> dict:
+    """Apply the changes from base to mine on top of current, or raise UserDataConflict"""
+    without_exp = lambda data: {key: value for key, value in data.items() if key not in ('exp', 'rank')}
+    merged = _merge_fields('', without_exp(base), without_exp(current), without_exp(mine), _merge_top_level)
+
+    # EXP and rank go together: add up the EXP each side gained and rank up from there
+    merged['exp'], merged['rank'] = current.get('exp', 0), current.get('rank', 0)
+    base_exp = (base.get('exp', 0), base.get('rank', 0))
+    if (mine.get('exp', 0), mine.get('rank', 0)) != base_exp:
+        if (current.get('exp', 0), current.get('rank', 0)) == base_exp:
+            merged['exp'], merged['rank'] = mine.get('exp', 0), mine.get('rank', 0)
+        else:
+            merged['exp'], merged['rank'] = 0, 0
+            add_exp(merged, _total_exp(current) + _total_exp(mine) - _total_exp(base))
+
+    if current.get('achievements') != base.get('achievements') != mine.get('achievements'):
+        # Both sides moved achievements along; bring progress up to date with the merged stats
+        update_all_achievements(merged)
+    return merged
+
+def _load_user_data_from_disk(user: str):
+    """Recover user data from the storage backend. Returns (data, last seq, whether defaults were added)"""
     try:
-        # If file doesn't exist, create it with default data
-        if not os.path.exists(file_path):
-            # Create data directory if it doesn't exist
-            os.makedirs('data', exist_ok=True)
-            
+        data, seq = get_storage().load_user_state(user)
+        if data is None:
             # Initialize the first achievement
-            temp_data = default_data.copy()
-            update_earnings_achievements(temp_data, 0)
-            update_case_achievements(temp_data)
-            update_click_achievements(temp_data)  # Add this line
-            
-            # Save the initialized data
-            with open(file_path, 'w') as f:
-                json.dump(temp_data, f, indent=2)
-            return temp_data
-            
-        # Create backup of current file
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as f:
-                current_data = f.read()
-            with open(backup_path, 'w') as f:
-                f.write(current_data)
-        
-        # Try to load the file
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-            
-        if not isinstance(data, dict):
-            raise ValueError("Invalid data structure")
-            
-        # Deep copy the default data to ensure we don't modify it
-        result = default_data.copy()
-        
-        # Update with existing data
-        result.update(data)
-        
-        # Ensure all required structures exist
-        if 'achievements' not in result:
-            result['achievements'] = default_data['achievements'].copy()
-            update_earnings_achievements(result, 0)
-            update_case_achievements(result)
-            update_click_achievements(result)
-            
-        if 'stats' not in result:
-            result['stats'] = default_data['stats'].copy()
-            
-        if 'upgrades' not in result:
-            result['upgrades'] = default_data['upgrades'].copy()
-        else:
-            for key, value in default_data['upgrades'].items():
-                if key not in result['upgrades']:
-                    result['upgrades'][key] = value
-        
-        # Save any updates
-        with open(file_path, 'w') as f:
-            json.dump(result, f, indent=2)
-        
-        return result
-            
+            data = _default_user_data()
+            update_all_achievements(data)
+            return data, seq, True
+        stored = json.loads(json.dumps(data))
+        data = _merge_defaults(data)
+        return data, seq, data != stored
     except Exception as e:
-        print(f"Error loading user data: {e}")
-        try:
-            if os.path.exists(backup_path):
-                with open(backup_path, 'r') as f:
-                    data = json.load(f)
-                with open(file_path, 'w') as f:
-                    json.dump(data, f, indent=2)
-                return data
-        except:
-            pass
-        
-        return default_data.copy()
-    finally:
-        file_lock.release()
+        print(f"Error loading user data for {user}: {e}")
+        return _default_user_data(), 0, False
 
-def save_user_data(user_data: dict):
-    """Save user data to JSON file with file locking."""
-    temp_file = 'data/user_inventory.tmp'
-    final_file = 'data/user_inventory.json'
-    backup_file = final_file + '.bak'
-    
-    # Use a timeout to prevent deadlocks
-    lock_acquired = file_lock.acquire(timeout=5)  # 5 second timeout
-    if not lock_acquired:
-        print("Warning: Could not acquire file lock, skipping save")
-        return
-        
+def _evict_idle_users():
+    """Drop the least recently used players nobody is using and whose changes are written. Needs _users_lock"""
+    excess = len(_users) - USER_CACHE_SIZE
+    for user, entry in list(_users.items()):
+        if excess <= 0:
+            break
+        # Events only get added by someone who pinned the entry, so these stay written
+        if entry.pins or entry.pending_events:
+            continue
+        del _users[user]
+        excess -= 1
+        _load_stats['evictions'] += 1
+
+@contextmanager
+def _pinned(user: Optional[str] = None):
+    """The player's entry, kept from being evicted until the block ends"""
+    user = check_user_id(user or current_user())
+    with _users_lock:
+        entry = _users.get(user)
+        if entry is None:
+            entry = _users[user] = _UserState(user)
+        _users.move_to_end(user)
+        entry.pins += 1
+        _evict_idle_users()
     try:
-        # Create data directory if it doesn't exist
-        os.makedirs('data', exist_ok=True)
-        
-        # Create backup of current file if it exists
+        yield entry
+    finally:
+        with _users_lock:
+            entry.pins -= 1
+
+@contextmanager
+def _user_state(user: Optional[str] = None):
+    """The player's entry, loaded and with its state lock held.
+
+    With a multi-process shared state its lock is taken first (the same order save_user_data takes
+    them in), so another worker can't save between reading the stored data and its signature.
+    """
+    shared = get_shared_state()
+    with shared.lock('user_data') if shared.multi_process else nullcontext():
+        with _pinned(user) as entry:
+            with entry.state_lock:
+                _ensure_loaded(entry)
+                yield entry
+
+def _ensure_loaded(entry: _UserState):
+    """Load the player's in-memory state, and reload it if their stored data was changed by someone else"""
+    storage = get_storage()
+    if entry.state is not None:
+        # Skip the check while the flusher is writing; the files are ours then anyway
+        if entry.pending_events or not entry.io_lock.acquire(blocking=False):
+            _load_stats['cache_hits'] += 1
+            return
         try:
-            if os.path.exists(final_file):
-                with open(final_file, 'r') as src, open(backup_file, 'w') as dst:
-                    dst.write(src.read())
-        except Exception as e:
-            print(f"Warning: Failed to create backup: {e}")
-        
-        # Write to temporary file
-        with open(temp_file, 'w') as f:
-            json.dump(user_data, f, indent=2)
-            f.flush()
+            if storage.user_state_signature(entry.user) == entry.disk_signature:
+                _load_stats['cache_hits'] += 1
+                return
+            print(f"User data for {entry.user} changed on disk, reloading")
+        finally:
+            entry.io_lock.release()
+    
+    with entry.io_lock:
+        entry.state, entry.seq, needs_snapshot = _load_user_data_from_disk(entry.user)
+        # Older saves have items without ids
+        if ensure_item_ids(entry.state['inventory']):
+            needs_snapshot = True
+        entry.index = InventoryIndex(entry.state['inventory'])
+        entry.state_json = json.dumps(entry.state)
+        _load_stats['disk_loads'] += 1
+        # Copies taken before an outside change (like another worker's save) get merged onto it
+        entry.revision += 1
+        entry.history[entry.revision] = entry.state_json
+        # Only write if loading actually changed something (new file or missing defaults)
+        if needs_snapshot:
             try:
-                os.fsync(f.fileno())
+                storage.write_user_snapshot(entry.state_json, entry.seq, entry.user)
             except Exception as e:
-                print(f"Warning: Failed to fsync: {e}")
+                print(f"Error writing user data snapshot: {e}")
+        entry.disk_signature = storage.user_state_signature(entry.user)
+    entry.last_snapshot_time = time.time()
+
+def get_load_stats() -> dict:
+    """How many loads were served from memory vs. read from disk, and how many players were evicted"""
+    with _users_lock:
+        return dict(_load_stats, loaded_users=len(_users))
+
+def load_user_data(user: Optional[str] = None) -> dict:
+    """Return a private copy of the player's data (default: the current user); storage is only read when it changes.
+
+    The copy carries the revision it was taken from under REVISION_KEY, which save_user_data checks.
+    """
+    with _user_state(user) as entry:
+        state_json, revision = entry.state_json, entry.revision
+    user_data = json.loads(state_json)
+    user_data[REVISION_KEY] = revision
+    return user_data
+
+def get_user_revision(user: Optional[str] = None) -> int:
+    with _user_state(user) as entry:
+        return entry.revision
+
+def get_user_fields(*keys, user: Optional[str] = None) -> dict:
+    """Copies of just these top-level fields, without copying the whole user data"""
+    with _user_state(user) as entry:
+        state = entry.state
+    return {key: json.loads(json.dumps(state.get(key))) for key in keys}
+
+def save_user_data(user_data: dict, user: Optional[str] = None):
+    """Record the changes in user_data as journal events; the background flusher writes them later.
+
+    If someone else saved since user_data was loaded, its changes are merged onto theirs (see
+    _rebase); UserDataConflict is raised when they touched the same thing. Dicts without a
+    revision, like a freshly built default, simply replace the current data.
+
+    With a multi-process shared state the events are written straight away, under its lock, since
+    other workers only see what's stored.
+    """
+    shared = get_shared_state()
+    if not shared.multi_process:
+        _save_user_data(user_data, user)
+        return
+    with shared.lock('user_data'):
+        _save_user_data(user_data, user)
+        flush_user_data(user=user or current_user())
+
+def _save_user_data(user_data: dict, user: Optional[str]):
+    if isinstance(user_data.get('inventory'), list):
+        ensure_item_ids(user_data['inventory'])
+    base_revision = user_data.get(REVISION_KEY)
+    # Serialize now so later changes to the caller's dict don't leak into the saved state
+    new_state = {key: value for key, value in user_data.items() if key != REVISION_KEY}
+    state_json = json.dumps(new_state)
+    new_state = json.loads(state_json)
+    with _user_state(user) as entry:
+        caller_revision = None
+        if base_revision is not None and base_revision != entry.revision:
+            base_json = entry.history.get(base_revision)
+            if base_json is None:
+                raise UserDataConflict("User data changed since it was loaded and is too old to merge")
+            # The caller's copy stays unmerged, so remember it as the base for its next save
+            entry.revision += 1
+            entry.history[entry.revision] = state_json
+            caller_revision = entry.revision
+            new_state = _rebase(json.loads(base_json), entry.state, new_state)
+            state_json = json.dumps(new_state)
         
-        # Close any open handles to the files
-        try:
-            import gc
-            gc.collect()  # Force garbage collection
-        except Exception as e:
-            print(f"Warning: Failed to force garbage collection: {e}")
+        events = _diff_events(entry.state, new_state)
+        if events or caller_revision:
+            entry.revision += 1
+            entry.history[entry.revision] = state_json
+        while len(entry.history) > USER_REVISION_HISTORY:
+            entry.history.popitem(last=False)
+        for event in events:
+            entry.seq += 1
+            event['seq'] = entry.seq
+            entry.pending_events.append(event)
         
-        # Small delay to ensure file handles are released
-        time.sleep(0.1)
+        # Keep the inventory index in step with the same diff
+        index = entry.index
+        item_events = [event for event in events if event['type'] in ('item_removed', 'item_added')]
+        removed = [index.get(event['id']) for event in item_events if event['type'] == 'item_removed']
+        if (any(event['type'] == 'set' and event['key'] == 'inventory' for event in events) or
+                None in removed):
+            entry.index = InventoryIndex(new_state.get('inventory', []))
+        elif item_events:
+            index.apply_changes(new_state['inventory'], item_events[0]['index'], removed,
+                                [event['item'] for event in item_events if event['type'] == 'item_added'])
+        else:
+            index.items = new_state.get('inventory', [])
         
-        try:
-            if os.path.exists(final_file):
-                os.remove(final_file)
-            os.rename(temp_file, final_file)
-                
-        except Exception as e:
-            print(f"Error during file replacement: {e}")
-            if os.path.exists(backup_file):
-                try:
-                    if os.path.exists(final_file):
-                        os.remove(final_file)
-                    os.rename(backup_file, final_file)
-                except Exception as restore_error:
-                    print(f"Failed to restore from backup: {restore_error}")
-            raise
+        entry.state = new_state
+        entry.state_json = state_json
+        if base_revision is not None:
+            user_data[REVISION_KEY] = caller_revision or entry.revision
+    start_user_data_flusher()
+
+def get_inventory_index(user: Optional[str] = None) -> InventoryIndex:
+    """Index over the player's current inventory; its items are shared, so don't modify them"""
+    with _user_state(user) as entry:
+        return entry.index
+
+def find_inventory_item(inventory: list, item_id: str, user: Optional[str] = None) -> Optional[int]:
+    """Position of the item with this id in a freshly loaded inventory, or None"""
+    if not item_id:
+        return None
+    position = get_inventory_index(user).position_of(item_id)
+    if position is not None and position < len(inventory) and inventory[position].get('id') == item_id:
+        return position
+    # The caller's copy is from a different version than the index; fall back to a scan
+    return next((i for i, item in enumerate(inventory) if item.get('id') == item_id), None)
+
+def match_inventory_item(inventory: list, template: dict, exclude=(), user: Optional[str] = None) -> Optional[int]:
+    """Position of an item interchangeable with template (see item_key), skipping positions in exclude"""
+    if template.get('id'):
+        position = find_inventory_item(inventory, template['id'], user)
+        if position is not None and position not in exclude:
+            return position
+    for item_id in get_inventory_index(user).ids_for_key(item_key(template)):
+        position = find_inventory_item(inventory, item_id, user)
+        if position is not None and position not in exclude:
+            return position
+    return None
+
+def get_inventory_summary(user: Optional[str] = None) -> dict:
+    """Running inventory totals (see InventoryIndex.summary), without touching the item list"""
+    return get_inventory_index(user).summary()
+
+def partition_sellable(inventory: list, user: Optional[str] = None) -> Optional[Tuple[list, int, float]]:
+    """sell_all's split from the index: (kept items, cases first, sold count, sold value).
+
+    Returns None if the caller's inventory isn't the current version, so it can split it itself.
+    """
+    case_ids, favorite_ids, count, value = get_inventory_index(user).sellable_partition()
+    if len(inventory) != len(case_ids) + len(favorite_ids) + count:
+        return None
+    kept = []
+    for ids in (case_ids, favorite_ids):
+        positions = [find_inventory_item(inventory, item_id, user) for item_id in ids]
+        if None in positions:
+            return None
+        kept.extend(inventory[position] for position in sorted(positions))
+    return kept, count, value
+
+def _flush_entry(entry: _UserState, force_snapshot: bool = False):
+    with entry.state_lock:
+        if not entry.pending_events and not force_snapshot:
+            return
+        events = entry.pending_events[:]
+        del entry.pending_events[:]
+        state_json = entry.state_json
+        seq = entry.seq
+    if state_json is None:
+        return
+    
+    storage = get_storage()
+    try:
+        with entry.io_lock:
+            if events:
+                # Events from one save_user_data call always land in the same batch,
+                # so the SQLite backend applies each save as one transaction
+                storage.write_user_events(events, entry.user)
+                entry.journal_events += len(events)
             
+            due = (force_snapshot or entry.journal_events >= USER_JOURNAL_COMPACT_EVENTS or
+                   time.time() - entry.last_snapshot_time >= USER_SNAPSHOT_INTERVAL)
+            # With nothing of ours just written, a changed signature means someone else (another
+            # worker) wrote since we loaded, and snapshotting our copy would overwrite that
+            if due and (events or storage.user_state_signature(entry.user) == entry.disk_signature):
+                storage.write_user_snapshot(state_json, seq, entry.user)
+                entry.journal_events = 0
+                entry.last_snapshot_time = time.time()
+            entry.disk_signature = storage.user_state_signature(entry.user)
     except Exception as e:
-        print(f"Error saving user data: {e}")
-        if not os.path.exists(final_file) and os.path.exists(backup_file):
-            try:
-                os.rename(backup_file, final_file)
-            except Exception as restore_error:
-                print(f"Failed to restore from backup: {restore_error}")
-    finally:
-        # Clean up temporary files
-        try:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-        except Exception as e:
-            print(f"Warning: Failed to remove temporary file: {e}")
-        
-        # Always release the lock
-        file_lock.release()
\ No newline at end of file
+        print(f"Error saving user data for {entry.user}: {e}")
+        # Put the events back so the next flush retries them
+        with entry.state_lock:
+            entry.pending_events[:0] = events
+
+def flush_user_data(force_snapshot: bool = False, user: Optional[str] = None):
+    """Append pending events to the journal, compacting it into a snapshot when it gets long.
+
+    Flushes every loaded player unless user is given; force_snapshot only snapshots players with
+    journal entries to fold in.
+    """
+    with _users_lock:
+        users = [user] if user else [name for name, entry in _users.items()
+                                     if entry.pending_events or (force_snapshot and entry.journal_events)]
+    shared = get_shared_state()
+    for name in users:
+        with shared.lock('user_data') if shared.multi_process else nullcontext():
+            with _pinned(name) as entry:
+                _flush_entry(entry, force_snapshot)
+
+def _flusher_loop():
+    while not _flusher_stop.wait(USER_DATA_FLUSH_INTERVAL):
+        flush_user_data()
+
+def start_user_data_flusher():
+    """Start the background flusher thread if it isn't running yet"""
+    global _flusher_thread
+    if _flusher_thread is not None:
+        return
+    with _users_lock:
+        if _flusher_thread is None:
+            _flusher_thread = threading.Thread(target=_flusher_loop, daemon=True)
+            _flusher_thread.start()
+
+def stop_user_data_flusher():
+    """Stop the flusher and write a final snapshot for everyone with unsnapshotted changes"""
+    _flusher_stop.set()
+    if _flusher_thread is not None:
+        _flusher_thread.join(timeout=5)
+    flush_user_data(force_snapshot=True)
+
+atexit.register(stop_user_data_flusher)